@@ -0,0 +1,167 @@
+"""Semantic cache of agent answers for repeated questions.
+
+Many questions are near-identical rephrasings of each other ("điều kiện tốt
+nghiệp", "yêu cầu ngoại ngữ khoá 2022").  Each one normally runs the full
+ReAct loop with several LLM calls.  This cache embeds the normalised question
+and returns a previous :class:`ChatResponse` when a stored question is similar
+enough.
+
+Embeddings barely separate questions that differ only in a student ID, a
+cohort year or a program level, so a semantic match is accepted only when
+both questions carry the same :func:`question_signature`.
+
+Entries are scoped to the corpus version: once ingestion changes the indexed
+documents every cached answer is dropped.  The cache lives in process memory,
+is bounded to ``max_entries`` (least recently used entries are evicted first)
+and entries expire after ``ttl_seconds``.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, List, Sequence
+
+import numpy as np
+
+from ..config import settings
+from ..db.embedding_cache import normalise_text
+from ..metadata import fold_diacritics
+from ..metrics import REGISTRY
+from ..schemas import ChatResponse
+
+LOGGER = logging.getLogger(__name__)
+
+LOOKUPS = REGISTRY.counter(
+    "edupolicy_answer_cache_lookups_total", "Semantic answer cache lookups by result.", ["result"]
+)
+ENTRIES = REGISTRY.gauge("edupolicy_answer_cache_entries", "Answers held in the semantic answer cache.")
+
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_LEVEL_TERMS = ("sau dai hoc", "dai hoc", "cao hoc", "thac si", "tien si", "nghien cuu sinh")
+
+
+def normalise_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question used as cache key."""
+
+    return normalise_text(question).lower().rstrip(" ?.!")
+
+
+def question_signature(question: str) -> FrozenSet[str]:
+    """Numbers (student IDs, years, thresholds) and program-level terms in ``question``.
+
+    Two questions may share an answer only if their signatures are equal.
+    """
+
+    folded = fold_diacritics(normalise_text(question))
+    tokens = set(_NUMBER_RE.findall(folded))
+    for term in _LEVEL_TERMS:
+        if term in folded:
+            tokens.add(term)
+            # "sau dai hoc" must not also count as "dai hoc".
+            folded = folded.replace(term, " ")
+    return frozenset(tokens)
+
+
+class AnswerCache:
+    """Fixed-capacity store of ``(question vector, response)`` pairs.
+
+    Vectors sit in one preallocated matrix so a lookup is a single
+    matrix-vector product over the live slots.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int | None = None,
+        ttl_seconds: float | None = None,
+        threshold: float | None = None,
+    ) -> None:
+        self.max_entries = max_entries or settings.answer_cache_max_entries
+        self.ttl_seconds = ttl_seconds or settings.answer_cache_ttl_seconds
+        self.threshold = threshold or settings.answer_cache_threshold
+        self._lock = threading.Lock()
+        self._version = ""
+        self._vectors: np.ndarray | None = None
+        self._expires = np.zeros(self.max_entries, dtype=np.float64)
+        self._last_used = np.zeros(self.max_entries, dtype=np.float64)
+        self._responses: List[dict | None] = [None] * self.max_entries
+        self._keys: List[str | None] = [None] * self.max_entries
+        self._signatures: List[FrozenSet[str] | None] = [None] * self.max_entries
+        self._questions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return int(self._live(time.time()).sum())
+
+    # ------------------------------------------------------------------
+    def _reset(self, version: str) -> None:
+        if self._questions:
+            LOGGER.info("Corpus version changed; dropping %s cached answers", len(self._questions))
+        self._version = version
+        self._expires[:] = 0.0
+        self._last_used[:] = 0.0
+        self._responses = [None] * self.max_entries
+        self._keys = [None] * self.max_entries
+        self._signatures = [None] * self.max_entries
+        self._questions = {}
+        ENTRIES.set(0)
+
+    def _live(self, now: float) -> np.ndarray:
+        return self._expires > now
+
+    def lookup(self, question: str, vector: Sequence[float], *, version: str) -> ChatResponse | None:
+        """Return the cached response for the most similar live question
+        with the same :func:`question_signature`."""
+
+        now = time.time()
+        signature = question_signature(question)
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            slot = self._questions.get(normalise_question(question))
+            if slot is None or self._expires[slot] <= now:
+                slot = None
+                live = [idx for idx in np.flatnonzero(self._live(now)) if self._signatures[idx] == signature]
+                if live and self._vectors is not None:
+                    query = np.asarray(vector, dtype=np.float32)
+                    query = query / (np.linalg.norm(query) or 1.0)
+                    scores = self._vectors[live] @ query
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        slot = int(live[best])
+            if slot is None:
+                LOOKUPS.inc(result="miss")
+                return None
+            self._last_used[slot] = now
+            response = self._responses[slot]
+        LOOKUPS.inc(result="hit")
+        return ChatResponse(**response)
+
+    def store(self, question: str, vector: Sequence[float], response: ChatResponse, *, version: str) -> None:
+        now = time.time()
+        key = normalise_question(question)
+        embedding = np.asarray(vector, dtype=np.float32)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(embedding)), dtype=np.float32)
+            slot = self._questions.get(key)
+            if slot is None:
+                live = self._live(now)
+                # Free slots and expired entries have the smallest scores.
+                slot = int(np.argmin(np.where(live, self._last_used, -1.0)))
+                if self._keys[slot] is not None:
+                    del self._questions[self._keys[slot]]
+                self._keys[slot] = key
+                self._questions[key] = slot
+            self._signatures[slot] = question_signature(question)
+            self._vectors[slot] = embedding
+            self._expires[slot] = now + self.ttl_seconds
+            self._last_used[slot] = now
+            self._responses[slot] = response.dict()
+            ENTRIES.set(int(self._live(now).sum()))
@@ -2,17 +2,34 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import List
+from typing import Any, AsyncIterator, Dict, List
 
-from langchain.agents import AgentType, Tool, initialize_agent
-from langchain.schema import AIMessage, BaseMessage, HumanMessage
+from langchain.agents import AgentExecutor, AgentType, Tool, initialize_agent
+from langchain.schema import BaseMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 
 from ..config import settings
-from ..schemas import ChatResponse
-from ..utils import SessionMemory, build_tool_observation
+from ..metadata import RetrievalFilter
+from ..schemas import ChatResponse, ChatTimings
+from ..tracing import LLMUsageCallback, RequestTrace, request_trace, span, traced
+from ..utils import SessionMemory, aembed_query, build_tool_observation, embed_query, embed_texts
+from .answer_cache import AnswerCache, normalise_question
+from .history import HistoryManager
+from .parallel import (
+    PARALLEL_FORMAT_INSTRUCTIONS,
+    PARALLEL_SUFFIX,
+    ParallelStructuredChatOutputParser,
+    with_timeout,
+)
+from .router import AGENT_ROUTE, IntentRouter
+from .streaming import StreamingEventHandler
+from .tools.rag_tool import ERROR_PREFIXES as RAG_ERROR_PREFIXES
 from .tools.rag_tool import RAGTool
+from .tools.sql_tool import ERROR_PREFIXES as SQL_ERROR_PREFIXES
 from .tools.sql_tool import SQLTool
 from .tools.summarizer import Summarizer
 from .tools.web_tool import WebSearchTool
@@ -29,35 +46,89 @@ SYSTEM_PROMPT = (
     "Vietnamese."
 )
 
+AGENT_KWARGS: Dict[str, Any] = {
+    "system_message": SYSTEM_PROMPT,
+    "memory_prompts": [MessagesPlaceholder(variable_name="chat_history")],
+    "input_variables": ["input", "agent_scratchpad", "chat_history"],
+}
+
+FAST_PATH_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            SYSTEM_PROMPT
+            + " Answer the user's question using only the tool result provided below; "
+            "if it does not contain the answer, say so.",
+        ),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "Kết quả từ {tool}:\n{observation}\n\nCâu hỏi: {input}"),
+    ]
+)
+
+# Answers whose trace used these tools are never put in the answer cache.
+UNCACHEABLE_TOOL_PREFIXES = ("[sql_tool]", "[web_tool]")
+
+
+def _copy_model(llm: BaseChatModel, **update: Any) -> BaseChatModel:
+    """Copy of ``llm`` with ``update`` applied.
+
+    ``copy`` drops fields declared with ``exclude`` (callbacks, tags,
+    metadata, ...) although the model reads them on every call, so they are
+    carried over explicitly.
+    """
+
+    excluded = {name: getattr(llm, name) for name, field in llm.__fields__.items() if field.field_info.exclude}
+    return llm.copy(update={**excluded, **update})
+
 
 class AgentController:
-    """High level orchestrator for handling chat requests."""
+    """High level orchestrator for handling chat requests.
+
+    ``llm`` replaces the OpenRouter model; the offline benchmarks pass a
+    scripted chat model here.  Every LLM call made through the controller and
+    its tools is counted by :class:`LLMUsageCallback`.
+    """
 
-    def __init__(self) -> None:
-        if not settings.openrouter_api_key:
+    def __init__(self, llm: BaseChatModel | None = None) -> None:
+        if llm is None and not settings.openrouter_api_key:
             raise RuntimeError(
                 "OPENROUTER_API_KEY is required. Please set it in the environment or .env file."
             )
-        self.llm = ChatOpenAI(
-            model=settings.openrouter_model,
-            temperature=0.1,
-            openai_api_base=settings.openrouter_base_url,
-            openai_api_key=settings.openrouter_api_key,
-            default_headers={
-                "HTTP-Referer": "https://github.com/",
-                "X-Title": "EduPolicy Agent",
-            },
-            max_retries=3,
-        )
+        usage = LLMUsageCallback()
+        if llm is None:
+            self.llm = ChatOpenAI(
+                model=settings.openrouter_model,
+                temperature=0.1,
+                openai_api_base=settings.openrouter_base_url,
+                openai_api_key=settings.openrouter_api_key,
+                default_headers={
+                    "HTTP-Referer": "https://github.com/",
+                    "X-Title": "EduPolicy Agent",
+                },
+                max_retries=3,
+                callbacks=[usage],
+            )
+        else:
+            self.llm = _copy_model(llm, callbacks=[*(llm.callbacks or []), usage])
+        self.streaming_llm = _copy_model(self.llm, streaming=True)
         self.memory = SessionMemory()
         self.rag_tool = RAGTool()
         self.summarizer = Summarizer(self.llm)
+        self.history = HistoryManager(
+            self.memory, self.summarizer if settings.history_summary_enabled else None
+        )
+        self._background_tasks: set[asyncio.Task] = set()
+        self.answer_cache = AnswerCache() if settings.answer_cache_enabled else None
+        self.router = IntentRouter(embed_texts) if settings.fast_path_enabled else None
+        if self.router is not None:
+            self.router.warm_up()
         self.sql_tool = SQLTool(self.llm)
         self.web_tool = WebSearchTool()
         self.tools = [
             Tool(
                 name="rag_tool",
-                func=self._rag_tool_wrapper,
+                func=traced("tool.rag_tool", self._rag_tool_wrapper),
+                coroutine=with_timeout("rag_tool", traced("tool.rag_tool", self._arag_tool_wrapper)),
                 description=(
                     "Use this tool to retrieve information from the university regulations. "
                     "Input should be a natural language question or keywords."
@@ -65,7 +136,8 @@ class AgentController:
             ),
             Tool(
                 name="sql_tool",
-                func=self.sql_tool.query_sql,
+                func=traced("tool.sql_tool", self.sql_tool.query_sql),
+                coroutine=with_timeout("sql_tool", traced("tool.sql_tool", self.sql_tool.aquery_sql)),
                 description=(
                     "Use for questions about student records, warnings, GPA, statistics. "
                     "Input should be a clear question in Vietnamese."
@@ -73,7 +145,8 @@ class AgentController:
             ),
             Tool(
                 name="web_tool",
-                func=self.web_tool.search_web,
+                func=traced("tool.web_tool", self.web_tool.search_web),
+                coroutine=with_timeout("web_tool", traced("tool.web_tool", self.web_tool.asearch_web)),
                 description=(
                     "Use to search trusted web sources such as the Ministry of Education. "
                     "Provide a short search query."
@@ -81,43 +154,51 @@ class AgentController:
             ),
             Tool(
                 name="summarizer",
-                func=self.summarizer.summarise,
+                func=traced("tool.summarizer", self.summarizer.summarise),
+                coroutine=with_timeout("summarizer", traced("tool.summarizer", self.summarizer.asummarise)),
                 description="Use to summarise long pieces of text into concise Vietnamese.",
             ),
         ]
+        # Executors hold no per-conversation state (history is passed as input
+        # and callbacks per call), so one instance is shared by all requests.
+        self.agent_executor = self._create_agent_executor()
+        self.streaming_agent_executor = self._create_agent_executor(self.streaming_llm)
 
     # ------------------------------------------------------------------
     def _rag_tool_wrapper(self, query: str) -> str:
         context, _ = self.rag_tool.query_rag(query)
         return context
 
+    async def _arag_tool_wrapper(self, query: str) -> str:
+        context, _ = await self.rag_tool.aquery_rag(query)
+        return context
+
     # ------------------------------------------------------------------
     def _build_history(self, session_id: str) -> List[BaseMessage]:
-        history = self.memory.get_history(session_id)
-        messages: List[BaseMessage] = []
-        for item in history:
-            if item["role"] == "user":
-                messages.append(HumanMessage(content=item["content"]))
-            else:
-                messages.append(AIMessage(content=item["content"]))
-        return messages
+        with span("session.load"):
+            return self.history.build(session_id)
 
-    # ------------------------------------------------------------------
-    def chat(self, session_id: str, message: str) -> ChatResponse:
-        LOGGER.info("Handling chat message for session %s", session_id)
-        history_messages = self._build_history(session_id)
-        agent_executor = initialize_agent(
+    def _create_agent_executor(self, llm: BaseChatModel | None = None) -> AgentExecutor:
+        agent_kwargs = dict(AGENT_KWARGS)
+        if settings.agent_mode == "parallel":
+            # Several actions per step run concurrently on the async path.
+            agent_kwargs["format_instructions"] = PARALLEL_FORMAT_INSTRUCTIONS
+            agent_kwargs["suffix"] = PARALLEL_SUFFIX
+            agent_kwargs["output_parser"] = ParallelStructuredChatOutputParser()
+        elif settings.agent_mode != "react":
+            raise ValueError(f"Unknown agent mode {settings.agent_mode!r}; expected 'react' or 'parallel'")
+        return initialize_agent(
             tools=self.tools,
-            llm=self.llm,
+            llm=llm or self.llm,
             agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
             handle_parsing_errors=True,
-            verbose=False,
-            agent_kwargs={"system_message": SYSTEM_PROMPT},
-        )
-        result = agent_executor.invoke(
-            {"input": message, "chat_history": history_messages},
             return_intermediate_steps=True,
+            verbose=False,
+            agent_kwargs=agent_kwargs,
         )
+
+    @staticmethod
+    def _build_response(session_id: str, result: dict) -> ChatResponse:
         output = result.get("output", "")
         intermediate_steps = result.get("intermediate_steps", [])
 
@@ -128,9 +209,6 @@ class AgentController:
             obs_text = observation if isinstance(observation, str) else str(observation)
             tool_interactions.append(build_tool_observation(action.tool, obs_text))
 
-        self.memory.append(session_id, "user", message)
-        self.memory.append(session_id, "assistant", output)
-
         return ChatResponse(
             answer=output,
             session_id=session_id,
@@ -138,6 +216,341 @@ class AgentController:
             tool_interactions=tool_interactions,
         )
 
+    def _remember(self, session_id: str, message: str, answer: str) -> None:
+        with span("session.save"):
+            self.memory.append_many(session_id, [("user", message), ("assistant", answer)])
+
+    def _compact_history(self, session_id: str) -> None:
+        try:
+            with span("session.compact"):
+                self.history.compact(session_id)
+        except Exception:  # pragma: no cover - the answer was already produced
+            LOGGER.exception("Failed to update conversation summary for session %s", session_id)
+
+    def _schedule_compaction(self, session_id: str) -> None:
+        """Update the rolling summary without delaying the response."""
+
+        async def run() -> None:
+            try:
+                with span("session.compact"):
+                    await self.history.acompact(session_id)
+            except Exception:  # pragma: no cover - the answer was already produced
+                LOGGER.exception("Failed to update conversation summary for session %s", session_id)
+
+        task = asyncio.create_task(run())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    # ------------------------------------------------------------------
+    def _question_vector(self, message: str) -> List[float] | None:
+        if self.answer_cache is None and self.router is None:
+            return None
+        try:
+            with span("chat.embed_question"):
+                return embed_query(normalise_question(message))
+        except Exception:  # pragma: no cover - the cache is an optimisation only
+            LOGGER.exception("Unable to embed question for the answer cache")
+            return None
+
+    async def _aquestion_vector(self, message: str) -> List[float] | None:
+        if self.answer_cache is None and self.router is None:
+            return None
+        try:
+            with span("chat.embed_question"):
+                return await aembed_query(normalise_question(message))
+        except Exception:  # pragma: no cover - the cache is an optimisation only
+            LOGGER.exception("Unable to embed question for the answer cache")
+            return None
+
+    def _cached_answer(
+        self,
+        session_id: str,
+        message: str,
+        vector: List[float] | None,
+        history: List[BaseMessage],
+    ) -> ChatResponse | None:
+        # A question asked mid-conversation ("giải thích rõ hơn") may refer to
+        # earlier turns, so only the first question of a session is looked up.
+        if vector is None or self.answer_cache is None or history:
+            return None
+        with span("chat.answer_cache"):
+            cached = self.answer_cache.lookup(message, vector, version=self.rag_tool.corpus_version)
+        if cached is None:
+            return None
+        LOGGER.info("Answer cache hit for session %s", session_id)
+        return cached.copy(update={"session_id": session_id, "cached": True})
+
+    def _cache_answer(
+        self,
+        message: str,
+        vector: List[float] | None,
+        history: List[BaseMessage],
+        response: ChatResponse,
+    ) -> None:
+        # Answers given with earlier turns in the prompt may depend on them,
+        # so only context-free answers are reused for other sessions.
+        if self.answer_cache is None or vector is None or history:
+            return
+        if not response.answer or response.answer.startswith("Agent stopped"):
+            return
+        # Student records are personal and web results go stale; neither is
+        # reused for another asker.
+        if any(entry.startswith(UNCACHEABLE_TOOL_PREFIXES) for entry in response.tool_interactions):
+            return
+        self.answer_cache.store(message, vector, response, version=self.rag_tool.corpus_version)
+
+    # ------------------------------------------------------------------
+    def _route(self, vector: List[float] | None) -> str | None:
+        """Tool to call directly for this question, or ``None`` for the agent."""
+
+        if self.router is None or vector is None:
+            return None
+        try:
+            route = self.router.classify(vector).route
+        except Exception:  # pragma: no cover - fall back to the agent
+            LOGGER.exception("Intent routing failed")
+            return None
+        return None if route == AGENT_ROUTE else route
+
+    async def _aroute(self, vector: List[float] | None) -> str | None:
+        # Until the router's examples are embedded, classifying runs the model.
+        if self.router is not None and not self.router.ready:
+            return await asyncio.to_thread(self._route, vector)
+        return self._route(vector)
+
+    @staticmethod
+    def _tool_result(tool: str, observation: str) -> str | None:
+        """``observation``, or ``None`` when the tool reported a failure instead of a result."""
+
+        prefixes = RAG_ERROR_PREFIXES if tool == "rag_tool" else SQL_ERROR_PREFIXES
+        if observation.startswith(prefixes):
+            LOGGER.info("Fast path via %s got an error observation; falling back to the agent", tool)
+            return None
+        return observation
+
+    def _run_tool(self, tool: str, message: str) -> str | None:
+        with span(f"tool.{tool}"):
+            if tool == "rag_tool":
+                observation = self._rag_tool_wrapper(message)
+            else:
+                observation = self.sql_tool.query_sql(message)
+        return self._tool_result(tool, observation)
+
+    async def _arun_tool(self, tool: str, message: str) -> str | None:
+        with span(f"tool.{tool}"):
+            if tool == "rag_tool":
+                observation = await self._arag_tool_wrapper(message)
+            else:
+                observation = await self.sql_tool.aquery_sql(message)
+        return self._tool_result(tool, observation)
+
+    @staticmethod
+    def _fast_path_response(session_id: str, tool: str, message: str, observation: str, answer: str) -> ChatResponse:
+        return ChatResponse(
+            answer=answer.strip(),
+            session_id=session_id,
+            reasoning=[f"Suy nghĩ: sử dụng {tool} với đầu vào {message}"],
+            tool_interactions=[build_tool_observation(tool, observation)],
+        )
+
+    def _fast_path(self, session_id: str, message: str, history: List[BaseMessage], tool: str) -> ChatResponse | None:
+        """Call ``tool`` directly and answer with one LLM call; ``None`` on failure."""
+
+        try:
+            observation = self._run_tool(tool, message)
+            if observation is None:
+                return None
+            answer = (FAST_PATH_PROMPT | self.llm).invoke(
+                {"tool": tool, "observation": observation, "input": message, "chat_history": history}
+            )
+        except Exception:  # pragma: no cover - fall back to the agent
+            LOGGER.exception("Fast path via %s failed; falling back to the agent", tool)
+            return None
+        return self._fast_path_response(session_id, tool, message, observation, answer.content)
+
+    async def _afast_path(
+        self,
+        session_id: str,
+        message: str,
+        history: List[BaseMessage],
+        tool: str,
+        *,
+        queue: "asyncio.Queue[Dict[str, Any]] | None" = None,
+    ) -> ChatResponse | None:
+        """Async :meth:`_fast_path`; with ``queue`` set, emits the same events
+        as :class:`StreamingEventHandler` while running.
+
+        A failure after answer tokens were streamed is raised rather than
+        retried by the agent, which would stream a second answer.
+        """
+
+        streamed = False
+        try:
+            if queue is not None:
+                await queue.put({"event": "tool_start", "data": {"tool": tool, "input": message}})
+            observation = await self._arun_tool(tool, message)
+            if observation is None:
+                return None
+            if queue is not None:
+                await queue.put(
+                    {"event": "tool_end", "data": {"tool": tool, "observation": build_tool_observation(tool, observation)}}
+                )
+            payload = {"tool": tool, "observation": observation, "input": message, "chat_history": history}
+            if queue is None:
+                answer = (await (FAST_PATH_PROMPT | self.llm).ainvoke(payload)).content
+            else:
+                parts: List[str] = []
+                async for chunk in (FAST_PATH_PROMPT | self.streaming_llm).astream(payload):
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        streamed = True
+                        await queue.put({"event": "token", "data": {"text": chunk.content}})
+                answer = "".join(parts)
+        except Exception:  # pragma: no cover - fall back to the agent
+            if streamed:
+                raise
+            LOGGER.exception("Fast path via %s failed; falling back to the agent", tool)
+            return None
+        return self._fast_path_response(session_id, tool, message, observation, answer)
+
     # ------------------------------------------------------------------
-    def rag_query(self, query: str, top_k: int | None = None) -> tuple[str, List[str]]:
-        return self.rag_tool.query_rag(query, top_k=top_k)
+    @staticmethod
+    def _with_timings(response: ChatResponse, trace: RequestTrace) -> ChatResponse:
+        return response.copy(update={"timings": ChatTimings(**trace.breakdown())})
+
+    def chat(self, session_id: str, message: str, *, include_timings: bool = False) -> ChatResponse:
+        """Answer ``message``; with ``include_timings`` the response carries
+        the per-stage timing breakdown of this request."""
+
+        LOGGER.info("Handling chat message for session %s", session_id)
+        with request_trace() as trace:
+            response = self._respond(session_id, message)
+        return self._with_timings(response, trace) if include_timings else response
+
+    def _respond(self, session_id: str, message: str) -> ChatResponse:
+        vector = self._question_vector(message)
+        history_messages = self._build_history(session_id)
+        cached = self._cached_answer(session_id, message, vector, history_messages)
+        if cached is not None:
+            self._remember(session_id, message, cached.answer)
+            self._compact_history(session_id)
+            return cached
+        route = self._route(vector)
+        response = None
+        if route:
+            with span("chat.fast_path"):
+                response = self._fast_path(session_id, message, history_messages, route)
+        if response is None:
+            with span("chat.agent"):
+                result = self.agent_executor.invoke(
+                    {"input": message, "chat_history": history_messages},
+                    return_intermediate_steps=True,
+                )
+            response = self._build_response(session_id, result)
+        self._cache_answer(message, vector, history_messages, response)
+        self._remember(session_id, message, response.answer)
+        self._compact_history(session_id)
+        return response
+
+    async def achat(self, session_id: str, message: str, *, include_timings: bool = False) -> ChatResponse:
+        """Async variant of :meth:`chat` that keeps the event loop free.
+
+        LLM calls and tools run through their async implementations; session
+        storage I/O is offloaded to a worker thread.
+        """
+
+        LOGGER.info("Handling chat message for session %s", session_id)
+        with request_trace() as trace:
+            response = await self._arespond(session_id, message)
+        return self._with_timings(response, trace) if include_timings else response
+
+    async def _arespond(
+        self,
+        session_id: str,
+        message: str,
+        *,
+        queue: "asyncio.Queue[Dict[str, Any]] | None" = None,
+    ) -> ChatResponse:
+        """Shared body of :meth:`achat` and :meth:`astream_chat`; with ``queue``
+        set, tool and token events are published while the answer is produced."""
+
+        vector = await self._aquestion_vector(message)
+        history_messages = await asyncio.to_thread(self._build_history, session_id)
+        cached = self._cached_answer(session_id, message, vector, history_messages)
+        if cached is not None:
+            await asyncio.to_thread(self._remember, session_id, message, cached.answer)
+            self._schedule_compaction(session_id)
+            return cached
+        route = await self._aroute(vector)
+        response = None
+        if route:
+            with span("chat.fast_path"):
+                response = await self._afast_path(session_id, message, history_messages, route, queue=queue)
+        if response is None:
+            executor, config = self.agent_executor, None
+            if queue is not None:
+                executor, config = self.streaming_agent_executor, {"callbacks": [StreamingEventHandler(queue)]}
+            with span("chat.agent"):
+                result = await executor.ainvoke(
+                    {"input": message, "chat_history": history_messages},
+                    config=config,
+                    return_intermediate_steps=True,
+                )
+            response = self._build_response(session_id, result)
+        self._cache_answer(message, vector, history_messages, response)
+        await asyncio.to_thread(self._remember, session_id, message, response.answer)
+        self._schedule_compaction(session_id)
+        return response
+
+    async def astream_chat(
+        self, session_id: str, message: str, *, include_timings: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run the agent and yield step events followed by the final response.
+
+        Yields ``tool_start``/``tool_end`` events as tools run, ``token``
+        events carrying the final answer as it is generated, then a single
+        ``final`` event with the serialised :class:`ChatResponse` (or an
+        ``error`` event).
+        """
+
+        LOGGER.info("Streaming chat message for session %s", session_id)
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+        async def run() -> None:
+            try:
+                with request_trace() as trace:
+                    response = await self._arespond(session_id, message, queue=queue)
+                if include_timings:
+                    response = self._with_timings(response, trace)
+                await queue.put({"event": "final", "data": response.dict()})
+            except Exception as exc:  # pragma: no cover - surfaced to the client as an event
+                LOGGER.exception("Streaming agent execution failed")
+                await queue.put({"event": "error", "data": {"detail": str(exc)}})
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in ("final", "error"):
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+
+    # ------------------------------------------------------------------
+    def rag_query(
+        self,
+        query: str,
+        top_k: int | None = None,
+        filters: RetrievalFilter | None = None,
+    ) -> tuple[str, List[str]]:
+        return self.rag_tool.query_rag(query, top_k=top_k, filters=filters)
+
+    async def arag_query(
+        self,
+        query: str,
+        top_k: int | None = None,
+        filters: RetrievalFilter | None = None,
+    ) -> tuple[str, List[str]]:
+        return await self.rag_tool.aquery_rag(query, top_k=top_k, filters=filters)
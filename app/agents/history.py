@@ -0,0 +1,150 @@
+"""Token-budgeted conversation history for the agent prompt.
+
+Only the most recent turns are passed to the agent verbatim.  Older turns are
+folded into a rolling summary that is stored next to the session, so prompt
+size stays flat however long a conversation runs.  The summary is advanced
+incrementally after each answer, covering only the messages that just slid out
+of the verbatim window, and never on the request path.  A backlog of
+unsummarised messages (a long imported session, or compaction falling behind)
+is folded in oldest first, in chunks that fit the token budget.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import List, Sequence, Tuple
+
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from ..config import settings
+from ..utils import SessionMemory, estimate_tokens
+from .tools.summarizer import Summarizer
+
+LOGGER = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Tóm tắt các lượt trao đổi trước: "
+
+Message = Tuple[int, str, str]
+
+
+class HistoryManager:
+    """Build the ``chat_history`` messages for a session."""
+
+    def __init__(
+        self,
+        memory: SessionMemory,
+        summarizer: Summarizer | None,
+        *,
+        max_turns: int | None = None,
+        token_budget: int | None = None,
+    ) -> None:
+        self.memory = memory
+        self.summarizer = summarizer
+        self.max_turns = max_turns or settings.history_max_turns
+        self.token_budget = token_budget or settings.history_token_budget
+
+    # ------------------------------------------------------------------
+    def _window_start(self, messages: Sequence[Message], summary: str) -> int:
+        """Index of the oldest message kept verbatim.
+
+        Whole turns (a user message and the replies that follow it) are kept,
+        newest first, while they fit ``max_turns`` and the token budget left
+        after the summary.
+        """
+
+        budget = self.token_budget - (estimate_tokens(summary) if summary else 0)
+        start = len(messages)
+        turns = 0
+        used = 0
+        index = len(messages)
+        while index > 0 and turns < self.max_turns:
+            turn_start = index - 1
+            while turn_start > 0 and messages[turn_start][1] != "user":
+                turn_start -= 1
+            cost = sum(estimate_tokens(content) for _, _, content in messages[turn_start:index])
+            if used + cost > budget:
+                break
+            used += cost
+            turns += 1
+            start = index = turn_start
+        return start
+
+    def build(self, session_id: str) -> List[BaseMessage]:
+        summary, covered = self.memory.get_summary(session_id)
+        messages = self.memory.get_messages(session_id, after_id=covered, limit=settings.session_history_limit)
+        # Messages between the summary and the window are skipped until the
+        # background compaction folds them in.
+        window = messages[self._window_start(messages, summary) :]
+        history: List[BaseMessage] = []
+        if summary:
+            history.append(SystemMessage(content=SUMMARY_PREFIX + summary))
+        for _, role, content in window:
+            if role == "user":
+                history.append(HumanMessage(content=content))
+            else:
+                history.append(AIMessage(content=content))
+        return history
+
+    # ------------------------------------------------------------------
+    def _evicted(self, session_id: str) -> Tuple[str, int, List[Message]]:
+        """The summary, the id it covers, and the next chunk of messages to fold into it.
+
+        Only the newest ``session_history_limit`` messages can be in the
+        verbatim window, so the window is located among those; the chunk is
+        then read oldest first and cut at the window or the token budget.
+        """
+
+        summary, covered = self.memory.get_summary(session_id)
+        recent = self.memory.get_messages(session_id, after_id=covered, limit=settings.session_history_limit)
+        if not recent:
+            return summary, covered, []
+        start = self._window_start(recent, summary)
+        window_id = recent[start][0] if start < len(recent) else recent[-1][0] + 1
+        chunk: List[Message] = []
+        used = 0
+        for message in self.memory.get_messages(
+            session_id, after_id=covered, limit=settings.session_history_limit, oldest=True
+        ):
+            cost = estimate_tokens(message[2])
+            if message[0] >= window_id or (chunk and used + cost > self.token_budget):
+                break
+            chunk.append(message)
+            used += cost
+        return summary, covered, chunk
+
+    @staticmethod
+    def _transcript(messages: Sequence[Message]) -> str:
+        labels = {"user": "Người dùng", "assistant": "Trợ lý"}
+        return "\n".join(f"{labels.get(role, role)}: {content}" for _, role, content in messages)
+
+    def compact(self, session_id: str) -> None:
+        """Fold messages that left the verbatim window into the summary.
+
+        Concurrent compactions of one session are harmless: the summary is
+        only written if nobody advanced it in the meantime.
+        """
+
+        if self.summarizer is None:
+            return
+        while True:
+            summary, covered, evicted = self._evicted(session_id)
+            if not evicted:
+                return
+            updated = self.summarizer.summarise_conversation(summary, self._transcript(evicted))
+            if not self.memory.set_summary(session_id, updated, evicted[-1][0], previous=covered):
+                return
+
+    async def acompact(self, session_id: str) -> None:
+        if self.summarizer is None:
+            return
+        while True:
+            summary, covered, evicted = await asyncio.to_thread(self._evicted, session_id)
+            if not evicted:
+                return
+            updated = await self.summarizer.asummarise_conversation(summary, self._transcript(evicted))
+            stored = await asyncio.to_thread(
+                self.memory.set_summary, session_id, updated, evicted[-1][0], previous=covered
+            )
+            if not stored:
+                return
@@ -0,0 +1,118 @@
+"""Parallel tool calls for the structured chat agent.
+
+In ``parallel`` agent mode the model may answer a step with a JSON list of
+independent actions instead of a single one.  :class:`AgentExecutor` already
+runs every action of a step concurrently on its async path, so a question that
+needs both ``rag_tool`` and ``web_tool`` waits for the slower of the two
+rather than their sum plus an extra LLM turn.  Each observation is recorded as
+its own intermediate step, so traces and streaming events are unchanged.
+
+Tool coroutines are wrapped with per-tool timeouts so one slow source cannot
+hold the whole step hostage.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+from typing import Awaitable, Callable, List, Union
+
+from langchain.agents.structured_chat.output_parser import StructuredChatOutputParser
+from langchain.agents.structured_chat.prompt import FORMAT_INSTRUCTIONS
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.exceptions import OutputParserException
+
+from ..config import settings
+
+LOGGER = logging.getLogger(__name__)
+
+TIMEOUT_MESSAGE = "Công cụ {tool} không phản hồi trong {seconds:g} giây; bỏ qua kết quả này."
+
+PARALLEL_FORMAT_INSTRUCTIONS = (
+    FORMAT_INSTRUCTIONS.replace(
+        "Provide only ONE action per $JSON_BLOB",
+        "Provide only ONE action per $JSON_BLOB unless the calls are independent (see below)",
+    )
+    + """
+
+When several tool calls are independent of each other (none needs the result \
+of another), return them together as a JSON list in a single $JSON_BLOB; they \
+run in parallel and each result is returned as its own Observation:
+
+```
+[
+  {{{{"action": $TOOL_NAME, "action_input": $INPUT}}}},
+  {{{{"action": $OTHER_TOOL_NAME, "action_input": $OTHER_INPUT}}}}
+]
+```
+
+Never put "Final Answer" in a list."""
+)
+
+PARALLEL_SUFFIX = (
+    "Begin! Reminder to ALWAYS respond with a valid json blob of a single action, or a list of "
+    "independent tool actions. Use tools if necessary. Respond directly if appropriate. Format is "
+    "Action:```$JSON_BLOB```then Observation:.\nThought:"
+)
+
+
+# The model writes "Action:" before the blob; ``_action_log`` adds its own.
+_TRAILING_ACTION_RE = re.compile(r"\s*Action:\s*$")
+
+
+def _action_log(action: dict) -> str:
+    return "Action:\n```\n" + json.dumps(action, ensure_ascii=False, indent=2) + "\n```"
+
+
+class ParallelStructuredChatOutputParser(StructuredChatOutputParser):
+    """Structured chat parser that also accepts a list of actions.
+
+    Each returned action carries a log showing only its own JSON blob, so the
+    scratchpad pairs every observation with the call that produced it.
+    """
+
+    def parse(self, text: str) -> Union[AgentAction, List[AgentAction], AgentFinish]:
+        match = self.pattern.search(text)
+        if match is None:
+            return super().parse(text)
+        try:
+            response = json.loads(match.group(1).strip(), strict=False)
+        except json.JSONDecodeError as exc:
+            raise OutputParserException(f"Could not parse LLM output: {text}") from exc
+        if not isinstance(response, list):
+            return super().parse(text)
+        calls = [item for item in response if isinstance(item, dict) and item.get("action") != "Final Answer"]
+        if not calls:
+            return super().parse(text)
+        if len(calls) < len(response):
+            LOGGER.warning("Ignoring final answer mixed with tool calls: %s", response)
+        preamble = _TRAILING_ACTION_RE.sub("", text[: match.start()]).rstrip()
+        actions = []
+        for index, call in enumerate(calls):
+            log = _action_log(call)
+            if index == 0 and preamble:
+                log = f"{preamble}\n{log}"
+            actions.append(AgentAction(call["action"], call.get("action_input", {}), log))
+        return actions if len(actions) > 1 else actions[0]
+
+
+def tool_timeout(name: str) -> float:
+    """Timeout in seconds for ``name``, honouring per-tool overrides."""
+
+    return settings.tool_timeouts.get(name, settings.tool_timeout_seconds)
+
+
+def with_timeout(name: str, coroutine: Callable[[str], Awaitable[str]]) -> Callable[[str], Awaitable[str]]:
+    """Wrap a tool coroutine so it returns a notice instead of hanging."""
+
+    async def run(tool_input: str) -> str:
+        seconds = tool_timeout(name)
+        try:
+            return await asyncio.wait_for(coroutine(tool_input), timeout=seconds)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Tool %s timed out after %ss", name, seconds)
+            return TIMEOUT_MESSAGE.format(tool=name, seconds=seconds)
+
+    return run
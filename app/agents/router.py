@@ -0,0 +1,135 @@
+"""Embedding-similarity intent router for single-tool questions.
+
+Most questions are plainly a regulation lookup or a student-records query.
+Running them through the ReAct agent costs at least two LLM round-trips (pick
+the tool, then answer).  The router compares the question embedding with
+example questions for each route and, when one route wins clearly, lets the
+controller call that tool directly and answer with a single LLM call.
+
+Questions that look like web searches, summarisation requests, small talk or
+anything combining several tools fall into the ``agent`` route, as does any
+question that does not clear both the similarity threshold and the margin
+over the runner-up.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from ..config import settings
+from ..metrics import REGISTRY
+
+LOGGER = logging.getLogger(__name__)
+
+DECISIONS = REGISTRY.counter("edupolicy_router_decisions_total", "Fast-path router decisions by route.", ["route"])
+
+AGENT_ROUTE = "agent"
+
+ROUTE_EXAMPLES: Dict[str, Sequence[str]] = {
+    "rag_tool": (
+        "Điều kiện để được xét tốt nghiệp là gì?",
+        "Chuẩn ngoại ngữ đầu ra cho sinh viên khoá 2022 là bao nhiêu?",
+        "Sinh viên bị cảnh báo học vụ khi nào?",
+        "Quy định về thời gian tối đa hoàn thành chương trình đào tạo",
+        "Nghiên cứu sinh phải công bố bao nhiêu bài báo theo quy chế tiến sĩ?",
+        "Hội đồng học vụ kết luận gì trong học kỳ 1 năm học 2023-2024?",
+        "Điều kiện làm khóa luận tốt nghiệp và thực tập",
+        "Học viên cao học được đăng ký tối đa bao nhiêu tín chỉ?",
+        "Quy định về học lại, thi lại và cải thiện điểm",
+        "Sinh viên bị buộc thôi học trong trường hợp nào?",
+    ),
+    "sql_tool": (
+        "Có bao nhiêu sinh viên bị cảnh báo học vụ trong học kỳ này?",
+        "GPA trung bình của sinh viên khoá 2021 là bao nhiêu?",
+        "Liệt kê 10 sinh viên có điểm trung bình cao nhất",
+        "Thống kê số sinh viên theo từng khoa",
+        "Sinh viên có mã số 2012345 đã tích lũy bao nhiêu tín chỉ?",
+        "Tỉ lệ sinh viên tốt nghiệp đúng hạn của ngành Khoa học máy tính",
+        "Đếm số sinh viên có GPA dưới 2.0",
+    ),
+    AGENT_ROUTE: (
+        "Tìm trên mạng quy định mới nhất của Bộ Giáo dục về tuyển sinh",
+        "Bộ GD&ĐT vừa ban hành thông tư gì về đào tạo đại học?",
+        "Tóm tắt giúp tôi đoạn văn bản sau",
+        "Xin chào, bạn là ai?",
+        "Cảm ơn bạn nhé",
+        "So sánh quy định cảnh báo học vụ với số sinh viên bị cảnh báo thực tế",
+        "Theo quy chế thì sinh viên có GPA dưới 2.0 bị xử lý thế nào và hiện có bao nhiêu bạn như vậy?",
+        "Giải thích lại câu trả lời trước",
+    ),
+}
+
+
+class RouteDecision(NamedTuple):
+    route: str
+    """``rag_tool``, ``sql_tool`` or ``agent``."""
+    score: float
+    margin: float
+
+
+class IntentRouter:
+    """Nearest-example classifier over question embeddings."""
+
+    def __init__(
+        self,
+        embed: Callable[[Sequence[str]], List[List[float]]],
+        *,
+        examples: Dict[str, Sequence[str]] | None = None,
+        threshold: float | None = None,
+        margin: float | None = None,
+    ) -> None:
+        self.embed = embed
+        self.examples = examples or ROUTE_EXAMPLES
+        self.threshold = settings.fast_path_threshold if threshold is None else threshold
+        self.margin = settings.fast_path_margin if margin is None else margin
+        self._labels: List[str] = []
+        self._matrix: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the example embeddings are built, so :meth:`classify` does not encode."""
+
+        return self._matrix is not None
+
+    def warm_up(self) -> None:
+        """Embed the examples on a background thread so no request pays for it."""
+
+        def run() -> None:
+            try:
+                self._example_matrix()
+            except Exception:  # pragma: no cover - retried on first use
+                LOGGER.exception("Unable to embed router examples")
+
+        threading.Thread(target=run, name="router-warm-up", daemon=True).start()
+
+    def _example_matrix(self) -> np.ndarray:
+        # Embedding the examples needs the model; built by ``warm_up`` or on first use.
+        with self._lock:
+            if self._matrix is None:
+                labels = [route for route, texts in self.examples.items() for _ in texts]
+                texts = [text for route_texts in self.examples.values() for text in route_texts]
+                matrix = np.asarray(self.embed(texts), dtype=np.float32)
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+                self._labels, self._matrix = labels, matrix
+            return self._matrix
+
+    def classify(self, vector: Sequence[float]) -> RouteDecision:
+        matrix = self._example_matrix()
+        query = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ (query / (np.linalg.norm(query) or 1.0))
+        best: Dict[str, float] = {}
+        for label, score in zip(self._labels, scores.tolist()):
+            best[label] = max(score, best.get(label, -1.0))
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        route, score = ranked[0]
+        margin = score - ranked[1][1] if len(ranked) > 1 else score
+        if score < self.threshold or margin < self.margin:
+            route = AGENT_ROUTE
+        DECISIONS.inc(route=route)
+        LOGGER.debug("Router chose %s (score %.3f, margin %.3f)", route, score, margin)
+        return RouteDecision(route=route, score=score, margin=margin)
@@ -0,0 +1,108 @@
+"""Incremental agent events for the streaming chat endpoint."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from ..utils import build_tool_observation
+
+_FINAL_ANSWER_RE = re.compile(r'"action"\s*:\s*"Final Answer"\s*,\s*"action_input"\s*:\s*"', re.S)
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class FinalAnswerExtractor:
+    """Pull the ``action_input`` string of a structured-chat final answer out
+    of a token stream as it arrives.
+
+    The structured chat agent wraps its answer in a JSON blob, so raw LLM
+    tokens cannot be forwarded to users as-is.  Tokens are buffered until the
+    ``"Final Answer"`` action is recognised; from then on the JSON string is
+    decoded incrementally and only complete characters are emitted.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.position: Optional[int] = None
+        self.finished = False
+
+    def feed(self, token: str) -> str:
+        self.buffer += token
+        if self.finished:
+            return ""
+        if self.position is None:
+            match = _FINAL_ANSWER_RE.search(self.buffer)
+            if not match:
+                return ""
+            self.position = match.end()
+        emitted: List[str] = []
+        buffer, index = self.buffer, self.position
+        while index < len(buffer):
+            char = buffer[index]
+            if char == '"':
+                self.finished = True
+                index += 1
+                break
+            if char != "\\":
+                emitted.append(char)
+                index += 1
+                continue
+            if index + 1 >= len(buffer):
+                break
+            code = buffer[index + 1]
+            if code == "u":
+                if index + 6 > len(buffer):
+                    break
+                emitted.append(chr(int(buffer[index + 2 : index + 6], 16)))
+                index += 6
+            else:
+                emitted.append(_ESCAPES.get(code, code))
+                index += 2
+        self.position = index
+        return "".join(emitted)
+
+
+class StreamingEventHandler(AsyncCallbackHandler):
+    """Translate LangChain callbacks into events on an ``asyncio.Queue``.
+
+    Event payloads are plain dicts ``{"event": name, "data": {...}}`` with
+    names ``tool_start``, ``tool_end`` and ``token``.
+    """
+
+    def __init__(self, queue: "asyncio.Queue[Dict[str, Any]]") -> None:
+        self.queue = queue
+        self._extractor = FinalAnswerExtractor()
+        self._tool_names: Dict[Any, str] = {}
+
+    async def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self._extractor = FinalAnswerExtractor()
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, **kwargs: Any) -> None:
+        self._extractor = FinalAnswerExtractor()
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        text = self._extractor.feed(token)
+        if text:
+            await self.queue.put({"event": "token", "data": {"text": text}})
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: Any = None, **kwargs: Any) -> None:
+        name = serialized.get("name", "tool")
+        self._tool_names[run_id] = name
+        await self.queue.put({"event": "tool_start", "data": {"tool": name, "input": input_str}})
+
+    async def on_tool_end(self, output: Any, *, run_id: Any = None, **kwargs: Any) -> None:
+        name = self._tool_names.pop(run_id, "tool")
+        observation = output if isinstance(output, str) else str(output)
+        await self.queue.put(
+            {"event": "tool_end", "data": {"tool": name, "observation": build_tool_observation(name, observation)}}
+        )
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serialise an event dict as a Server-Sent Events frame."""
+
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
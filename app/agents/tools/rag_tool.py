@@ -1,69 +1,215 @@
-"""Retrieval augmented generation (RAG) tool backed by Milvus."""
+"""Retrieval augmented generation (RAG) tool backed by Milvus or the local vector index."""
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
 from typing import List, Tuple
 
 from ...config import settings
-from ...db.milvus_client import MilvusVectorStore
-from ...utils import chunk_text, embed_texts, load_pdf_text
+from ...context_packing import pack_context
+from ...db.bm25_index import BM25Index, bm25_index_path, reciprocal_rank_fusion
+from ...db.milvus_client import MilvusDocument
+from ...db.vector_store import VectorStore, create_vector_store
+from ...ingest import corpus_version, run_ingestion, start_background_ingestion
+from ...metadata import RetrievalFilter
+from ...reranker import Reranker
+from ...tracing import span
+from ...utils import aembed_query, embed_query
 
 LOGGER = logging.getLogger(__name__)
 
+UNAVAILABLE_MESSAGE = "Chuc nang RAG tam thoi khong kha dung vi khong ket noi duoc toi Milvus."
+ERROR_PREFIXES = (UNAVAILABLE_MESSAGE,)
+"""Beginnings of every observation that reports a failure instead of retrieved context."""
+
 
 class RAGTool:
     """Encapsulates RAG ingestion and retrieval logic."""
 
     def __init__(self) -> None:
-        self.vector_store: MilvusVectorStore | None = None
+        self.vector_store: VectorStore | None = None
+        self._sparse_index: BM25Index | None = None
+        self._sparse_mtime: float | None = None
+        self._sparse_lock = threading.Lock()
+        self._corpus_version: Tuple[Tuple[int, int], str] | None = None
+        self.reranker: Reranker | None = None
+        if settings.rerank_enabled:
+            self.reranker = Reranker()
+            self.reranker.warm_up()
         try:
-            self.vector_store = MilvusVectorStore()
+            self.vector_store = create_vector_store()
         except Exception:  # pragma: no cover - startup guard
             LOGGER.exception(
-                "Unable to initialise Milvus vector store; RAG tool will run in degraded mode."
+                "Unable to initialise the vector store; RAG tool will run in degraded mode."
             )
             return
-        if self.vector_store.is_empty:
-            LOGGER.info("Milvus collection empty; starting ingestion pipeline")
-            self._ingest_corpus()
 
     # ------------------------------------------------------------------
-    def _ingest_corpus(self) -> None:
+    def start_ingestion(self, *, background: bool = True) -> None:
+        """Synchronise the index with ``data/``, optionally in a worker thread."""
+
         if not self.vector_store:
             LOGGER.warning("Skipping ingestion because no vector store is available.")
             return
-        pdf_path = settings.data_dir / "regulations.pdf"
-        if not pdf_path.exists():
-            LOGGER.warning("Regulations PDF not found at %s. Skipping ingestion.", pdf_path)
-            return
-        text = load_pdf_text(pdf_path)
-        chunks = chunk_text(text)
-        if not chunks:
-            LOGGER.warning("No text chunks produced from %s", pdf_path)
-            return
-        embeddings = embed_texts([chunk.text for chunk in chunks])
-        self.vector_store.add_embeddings(
-            embeddings=embeddings,
-            chunks=[chunk.text for chunk in chunks],
-            metadatas=[chunk.metadata for chunk in chunks],
+        if background:
+            start_background_ingestion(self.vector_store)
+        else:
+            run_ingestion(self.vector_store)
+
+    @property
+    def index_ready(self) -> bool:
+        """Whether the vector store holds an index that can serve queries."""
+
+        if not self.vector_store:
+            return False
+        try:
+            return not self.vector_store.is_empty
+        except Exception:  # pragma: no cover - health checks must not raise
+            LOGGER.exception("Unable to inspect vector store state")
+            return False
+
+    @property
+    def corpus_version(self) -> str:
+        """Fingerprint of the indexed documents, recomputed when the manifest changes."""
+
+        if not self.vector_store:
+            return ""
+        path = self.vector_store.manifest_path
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return ""
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._corpus_version
+        if cached is None or cached[0] != key:
+            cached = self._corpus_version = (key, corpus_version(path))
+        return cached[1]
+
+    # ------------------------------------------------------------------
+    def _get_sparse_index(self) -> BM25Index | None:
+        """Return the BM25 index, reloading it after ingestion rewrites the file."""
+
+        path = bm25_index_path(self.vector_store.manifest_path)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        with self._sparse_lock:
+            if self._sparse_index is None or mtime != self._sparse_mtime:
+                self._sparse_index = BM25Index.load(path)
+                self._sparse_mtime = mtime
+            return self._sparse_index
+
+    def _search(
+        self,
+        query: str,
+        embedding: List[float],
+        *,
+        top_k: int,
+        filters: RetrievalFilter | None,
+    ) -> List[MilvusDocument]:
+        if not settings.hybrid_search:
+            with span("rag.vector_search"):
+                return self.vector_store.query(embedding, top_k=top_k, filters=filters)
+        candidates = max(top_k, settings.hybrid_candidates)
+        with span("rag.vector_search"):
+            dense = self.vector_store.query(embedding, top_k=candidates, filters=filters)
+        sparse_index = self._get_sparse_index()
+        if sparse_index is None:
+            return dense[:top_k]
+        with span("rag.sparse_search"):
+            sparse = sparse_index.search(query, top_k=candidates, filters=filters)
+        return reciprocal_rank_fusion([dense, sparse], k=settings.rrf_k)[:top_k]
+
+    def _fetch_k(self, top_k: int) -> int:
+        """Number of chunks to retrieve: the rerank candidates when reranking."""
+
+        return max(top_k, settings.rerank_candidates) if self.reranker else top_k
+
+    def retrieve(
+        self,
+        query: str,
+        *,
+        top_k: int,
+        filters: RetrievalFilter | None = None,
+    ) -> List[MilvusDocument]:
+        """Return the ``top_k`` best chunks, fusing dense and BM25 rankings.
+
+        ``filters`` are pushed down into both searches.  With reranking
+        enabled more candidates are retrieved and the cross-encoder picks the
+        final ``top_k``.
+        """
+
+        with span("rag.embed"):
+            embedding = embed_query(query)
+        documents = self._search(query, embedding, top_k=self._fetch_k(top_k), filters=filters)
+        if self.reranker is None:
+            return documents
+        return self.reranker.rerank(query, documents, top_k=top_k)
+
+    async def aretrieve(
+        self,
+        query: str,
+        *,
+        top_k: int,
+        filters: RetrievalFilter | None = None,
+    ) -> List[MilvusDocument]:
+        """Async :meth:`retrieve`; the blocking vector search runs in a worker thread."""
+
+        with span("rag.embed"):
+            embedding = await aembed_query(query)
+        documents = await asyncio.to_thread(
+            self._search, query, embedding, top_k=self._fetch_k(top_k), filters=filters
         )
-        LOGGER.info("Ingestion complete: %s chunks", len(chunks))
+        if self.reranker is None:
+            return documents
+        return await self.reranker.arerank(query, documents, top_k=top_k)
 
     # ------------------------------------------------------------------
-    def query_rag(self, query: str, *, top_k: int | None = None) -> Tuple[str, List[str]]:
-        """Perform semantic search and return concatenated context."""
+    @staticmethod
+    def _candidates(top_k: int) -> int:
+        """Chunks to retrieve for a ``top_k`` context, leaving room for merging."""
 
-        if not self.vector_store:
-            return (
-                "Chuc nang RAG tam thoi khong kha dung vi khong ket noi duoc toi Milvus.",
-                [],
-            )
-        top_k = top_k or settings.top_k
-        embedding = embed_texts([query])[0]
-        documents = self.vector_store.query(embedding, top_k=top_k)
+        return max(top_k, settings.context_candidates) if settings.context_packing_enabled else top_k
+
+    @staticmethod
+    def _format(documents: List[MilvusDocument], *, top_k: int) -> Tuple[str, List[str]]:
         if not documents:
             return "Khong tim thay thong tin phu hop trong co so quy dinh.", []
-        snippets = [doc.text for doc in documents]
+        if settings.context_packing_enabled:
+            return pack_context(documents, max_passages=top_k)
+        snippets = [doc.text for doc in documents[:top_k]]
         combined = "\n\n".join(snippets)
         return combined, snippets
+
+    def query_rag(
+        self,
+        query: str,
+        *,
+        top_k: int | None = None,
+        filters: RetrievalFilter | None = None,
+    ) -> Tuple[str, List[str]]:
+        """Perform semantic search and return concatenated context."""
+
+        if not self.vector_store:
+            return UNAVAILABLE_MESSAGE, []
+        top_k = top_k or settings.top_k
+        documents = self.retrieve(query, top_k=self._candidates(top_k), filters=filters)
+        return self._format(documents, top_k=top_k)
+
+    async def aquery_rag(
+        self,
+        query: str,
+        *,
+        top_k: int | None = None,
+        filters: RetrievalFilter | None = None,
+    ) -> Tuple[str, List[str]]:
+        """Async variant of :meth:`query_rag`."""
+
+        if not self.vector_store:
+            return UNAVAILABLE_MESSAGE, []
+        top_k = top_k or settings.top_k
+        documents = await self.aretrieve(query, top_k=self._candidates(top_k), filters=filters)
+        return self._format(documents, top_k=top_k)
@@ -1,17 +1,48 @@
-"""SQL tool enabling the agent to query structured records."""
+"""SQL tool enabling the agent to query structured records.
+
+Generated SQL that runs successfully is remembered in :class:`SQLPlanCache`,
+so repeated questions (and questions differing only in literals such as a
+student ID) execute without an LLM call.  The schema summary in the prompt is
+rendered once per database change instead of on every question.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import List
+import re
+from typing import Tuple
 
-from langchain.chains import create_sql_query_chain
+from langchain.chains.sql_database.prompt import SQL_PROMPTS
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.output_parsers import StrOutputParser
 
+from ...config import settings
 from ...db.sql_client import SQLiteClient
+from ...db.sql_engine import QueryResult, QueryTimeoutError, SQLGuardError
+from ...db.sql_plan_cache import SQLPlanCache
+from ...metrics import REGISTRY
+from ...tracing import span
 
 LOGGER = logging.getLogger(__name__)
 
+NOT_CONFIGURED_MESSAGE = (
+    "Cơ sở dữ liệu sinh viên chưa được cấu hình. Vui lòng cung cấp "
+    "tệp data/student_records.db trước khi sử dụng truy vấn SQL."
+)
+
+GENERATION_FAILED_PREFIX = "Không thể tạo truy vấn SQL từ câu hỏi."
+REJECTED_PREFIX = "Truy vấn SQL bị từ chối:"
+EXECUTION_FAILED_PREFIX = "Truy vấn SQL chạy thất bại:"
+ERROR_PREFIXES = (NOT_CONFIGURED_MESSAGE, GENERATION_FAILED_PREFIX, REJECTED_PREFIX, EXECUTION_FAILED_PREFIX)
+"""Beginnings of every observation that reports a failure instead of a query result."""
+
+PLAN_LOOKUPS = REGISTRY.counter(
+    "edupolicy_sql_plan_cache_lookups_total", "NL2SQL plan cache lookups by result.", ["result"]
+)
+
+_SQL_PREFIX_RE = re.compile(r"^\s*(?:```(?:sql)?|SQLQuery:)\s*", re.I)
+
 
 class SQLTool:
     """Translate natural language questions into SQL and execute them."""
@@ -20,42 +51,100 @@ class SQLTool:
         self.client = SQLiteClient()
         self.llm = llm
         self.query_chain = (
-            create_sql_query_chain(self.llm, self.client.db)
+            SQL_PROMPTS["sqlite"].partial(top_k="5")
+            | self.llm.bind(stop=["\nSQLResult:"])
+            | StrOutputParser()
             if self.client.db is not None
             else None
         )
+        self.plan_cache = SQLPlanCache() if settings.sql_plan_cache_enabled else None
+
+    # ------------------------------------------------------------------
+    def _chain_input(self, question: str) -> dict:
+        return {"input": question + "\nSQLQuery: ", "table_info": self.client.schema_summary()}
+
+    def _cached_plan(self, question: str) -> Tuple[str | None, str]:
+        """Return cached SQL for ``question`` and the schema version it is valid for."""
+
+        version = self.client.schema_version()
+        if self.plan_cache is None:
+            return None, version
+        sql_query, how = self.plan_cache.lookup(question, schema_version=version)
+        PLAN_LOOKUPS.inc(result=how)
+        if sql_query is not None:
+            LOGGER.debug("SQL plan cache %s hit for: %s", how, question)
+        return sql_query, version
+
+    def _run_and_remember(self, question: str, sql_query: str, version: str, *, cached: bool) -> str:
+        result, ok = self._execute(sql_query)
+        if ok and not cached and self.plan_cache is not None:
+            self.plan_cache.store(question, sql_query, schema_version=version)
+        return result
 
     def query_sql(self, question: str) -> str:
         LOGGER.info("SQLTool received question: %s", question)
         if not self.query_chain:
-            return (
-                "Cơ sở dữ liệu sinh viên chưa được cấu hình. Vui lòng cung cấp "
-                "tệp data/student_records.db trước khi sử dụng truy vấn SQL."
-            )
+            return NOT_CONFIGURED_MESSAGE
+        sql_query, version = self._cached_plan(question)
+        if sql_query is not None:
+            return self._run_and_remember(question, sql_query, version, cached=True)
+        try:
+            with span("sql.generate"):
+                sql_query = self._extract_sql(self.query_chain.invoke(self._chain_input(question)))
+        except Exception as exc:  # pragma: no cover - defensive handling
+            LOGGER.exception("LLM failed to craft SQL")
+            return f"{GENERATION_FAILED_PREFIX} Chi tiết: {exc}"
+        return self._run_and_remember(question, sql_query, version, cached=False)
+
+    async def aquery_sql(self, question: str) -> str:
+        """Async variant of :meth:`query_sql`; SQLite runs in a worker thread."""
+
+        LOGGER.info("SQLTool received question: %s", question)
+        if not self.query_chain:
+            return NOT_CONFIGURED_MESSAGE
+        sql_query, version = await asyncio.to_thread(self._cached_plan, question)
+        if sql_query is not None:
+            return await asyncio.to_thread(self._run_and_remember, question, sql_query, version, cached=True)
         try:
-            sql_query = self.query_chain.invoke({"question": question})
-            if isinstance(sql_query, dict):
-                sql_query = sql_query.get("result") or sql_query.get("query") or ""
-            if not isinstance(sql_query, str):
-                raise ValueError("Unexpected response type from SQL chain")
+            with span("sql.generate"):
+                chain_input = await asyncio.to_thread(self._chain_input, question)
+                sql_query = self._extract_sql(await self.query_chain.ainvoke(chain_input))
         except Exception as exc:  # pragma: no cover - defensive handling
             LOGGER.exception("LLM failed to craft SQL")
-            return f"Không thể tạo truy vấn SQL từ câu hỏi. Chi tiết: {exc}"
+            return f"{GENERATION_FAILED_PREFIX} Chi tiết: {exc}"
+        return await asyncio.to_thread(self._run_and_remember, question, sql_query, version, cached=False)
+
+    @staticmethod
+    def _extract_sql(sql_query: object) -> str:
+        if isinstance(sql_query, dict):
+            sql_query = sql_query.get("result") or sql_query.get("query") or ""
+        if not isinstance(sql_query, str):
+            raise ValueError("Unexpected response type from SQL chain")
+        return _SQL_PREFIX_RE.sub("", sql_query).replace("```", "").strip()
+
+    def _execute(self, sql_query: str) -> Tuple[str, bool]:
+        """Run ``sql_query``; returns the formatted result and whether it succeeded."""
+
         LOGGER.debug("Generated SQL: %s", sql_query)
         try:
-            rows = self.client.run_raw_query(sql_query)
+            with span("sql.execute"):
+                result = self.client.run_query(sql_query)
+        except (SQLGuardError, QueryTimeoutError) as exc:
+            LOGGER.warning("Rejected or interrupted SQL %r: %s", sql_query, exc)
+            return f"{REJECTED_PREFIX} {exc} Câu lệnh: {sql_query}", False
         except Exception as exc:  # pragma: no cover
             LOGGER.exception("SQL execution failed")
-            return f"Truy vấn SQL chạy thất bại: {exc}. Câu lệnh: {sql_query}"
-        if not rows:
-            return f"Không tìm thấy bản ghi phù hợp. SQL: {sql_query}"
-        formatted_rows = self._format_rows(rows)
-        return f"Kết quả truy vấn:\n{formatted_rows}\n\n(SQL: {sql_query})"
+            return f"{EXECUTION_FAILED_PREFIX} {exc}. Câu lệnh: {sql_query}", False
+        if not result.rows:
+            return f"Không tìm thấy bản ghi phù hợp. SQL: {sql_query}", True
+        formatted_rows = self._format_rows(result)
+        if result.truncated:
+            formatted_rows += f"\n(chỉ hiển thị {len(result.rows)} dòng đầu tiên)"
+        return f"Kết quả truy vấn:\n{formatted_rows}\n\n(SQL: {sql_query})", True
 
     @staticmethod
-    def _format_rows(rows: List[List]) -> str:
-        headers = ["col_" + str(i + 1) for i in range(len(rows[0]))]
-        lines = [" | ".join(headers)]
-        for row in rows:
+    def _format_rows(result: QueryResult) -> str:
+        lines = [" | ".join(result.columns)]
+        for row in result.rows:
             lines.append(" | ".join(str(item) for item in row))
         return "\n".join(lines)
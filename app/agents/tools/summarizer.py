@@ -13,6 +13,17 @@ Nội dung:
 """
 )
 
+CONVERSATION_SUMMARY_PROMPT = PromptTemplate.from_template(
+    """Bạn là trợ lý học thuật. Hãy cập nhật bản tóm tắt cuộc hội thoại giữa người dùng và trợ lý bằng các lượt trao đổi mới. Giữ lại các dữ kiện, mã số quy định, số liệu và câu hỏi còn bỏ ngỏ; viết tối đa 5 câu bằng tiếng Việt.
+
+Bản tóm tắt hiện tại:
+{summary}
+
+Các lượt trao đổi mới:
+{transcript}
+"""
+)
+
 
 class Summarizer:
     """Lightweight summariser used to condense long tool outputs."""
@@ -24,3 +35,18 @@ class Summarizer:
         if not content.strip():
             return ""
         return self.llm.invoke(SUMMARY_PROMPT.format(content=content)).content.strip()
+
+    async def asummarise(self, content: str) -> str:
+        if not content.strip():
+            return ""
+        return (await self.llm.ainvoke(SUMMARY_PROMPT.format(content=content))).content.strip()
+
+    def summarise_conversation(self, summary: str, transcript: str) -> str:
+        """Fold ``transcript`` into an existing rolling conversation summary."""
+
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(summary=summary or "(chưa có)", transcript=transcript)
+        return self.llm.invoke(prompt).content.strip()
+
+    async def asummarise_conversation(self, summary: str, transcript: str) -> str:
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(summary=summary or "(chưa có)", transcript=transcript)
+        return (await self.llm.ainvoke(prompt)).content.strip()
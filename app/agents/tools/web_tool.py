@@ -1,35 +1,211 @@
-"""Web search tool leveraging Tavily's API."""
+"""Web search tool leveraging Tavily's API.
+
+Searches go straight to Tavily's REST endpoint through pooled HTTP clients
+(``requests`` for the sync path, ``httpx`` for the async one) with explicit
+timeouts.  Results are cached for ``tavily_cache_ttl_seconds`` keyed on the
+normalised query and ``max_results``; concurrent identical searches share one
+in-flight request; and a circuit breaker fails fast while Tavily is down.
+
+``settings.tavily_base_url`` can point at the stub server in
+``benchmarks/tavily_stub.py`` for tests and benchmarks.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import List
+import time
+from typing import List, Tuple
 
-from tavily import TavilyClient
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
 
+from ...caching import AsyncSingleFlight, SingleFlight, TTLCache
 from ...config import settings
+from ...db.embedding_cache import normalise_text
+from ...metrics import REGISTRY
+from ...resilience import CircuitBreaker, CircuitOpenError
+from ...tracing import span
 
 LOGGER = logging.getLogger(__name__)
 
+NOT_CONFIGURED_MESSAGE = "Web search hiện chưa được cấu hình (thiếu Tavily API key)."
+UNAVAILABLE_MESSAGE = "Tavily tạm thời không khả dụng, vui lòng thử lại sau."
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "edupolicy_web_search_cache_lookups_total", "Web search result cache lookups by result.", ["result"]
+)
+SEARCH_LATENCY = REGISTRY.histogram(
+    "edupolicy_web_search_seconds", "Latency of Tavily search requests.", ["outcome"]
+)
+
+
+class WebSearchError(RuntimeError):
+    """Tavily returned an error or could not be reached."""
+
 
 class WebSearchTool:
-    """Simple wrapper for the Tavily search client."""
+    """Cached, pooled client for Tavily search."""
 
     def __init__(self) -> None:
         if not settings.tavily_api_key:
             LOGGER.warning("Tavily API key missing. Web search tool will be inactive until provided.")
-        self.client = TavilyClient(api_key=settings.tavily_api_key) if settings.tavily_api_key else None
+        self.configured = bool(settings.tavily_api_key)
+        self.url = settings.tavily_base_url.rstrip("/") + "/search"
+        self.headers = {"Authorization": f"Bearer {settings.tavily_api_key}", "Content-Type": "application/json"}
+        self.timeout = (settings.tavily_connect_timeout_seconds, settings.tavily_timeout_seconds)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.tavily_pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._async_client: Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient] | None = None
+        self.cache: TTLCache[dict] = TTLCache(
+            max_entries=settings.tavily_cache_max_entries, ttl_seconds=settings.tavily_cache_ttl_seconds
+        )
+        self._inflight: SingleFlight[dict] = SingleFlight()
+        self._ainflight: AsyncSingleFlight[dict] = AsyncSingleFlight()
+        self.breaker = CircuitBreaker(
+            "tavily",
+            failure_threshold=settings.tavily_breaker_failures,
+            reset_seconds=settings.tavily_breaker_reset_seconds,
+        )
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _key(query: str, max_results: int) -> Tuple[str, int]:
+        return normalise_text(query).lower(), max_results
+
+    def _payload(self, query: str, max_results: int) -> dict:
+        return {"query": query, "max_results": max_results}
+
+    def _client(self) -> httpx.AsyncClient:
+        # httpx connection pools are bound to the event loop that created them.
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client[0] is not loop:
+            client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(settings.tavily_timeout_seconds, connect=settings.tavily_connect_timeout_seconds),
+                limits=httpx.Limits(max_connections=settings.tavily_pool_size),
+            )
+            self._async_client = (loop, client)
+        return self._async_client[1]
+
+    def _record(self, started: float, *, ok: bool) -> None:
+        SEARCH_LATENCY.observe(time.perf_counter() - started, outcome="ok" if ok else "error")
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _fetch(self, query: str, max_results: int) -> dict:
+        self.breaker.check()
+        started = time.perf_counter()
+        try:
+            with span("web.search"):
+                response = self.session.post(self.url, json=self._payload(query, max_results), timeout=self.timeout)
+        except requests.RequestException as exc:
+            self._record(started, ok=False)
+            raise WebSearchError(f"Không thể kết nối Tavily: {exc}") from exc
+        return self._handle(started, response.status_code, response.text, response.json)
+
+    async def _afetch(self, query: str, max_results: int) -> dict:
+        self.breaker.check()
+        started = time.perf_counter()
+        try:
+            with span("web.search"):
+                response = await self._client().post(self.url, json=self._payload(query, max_results))
+        except httpx.HTTPError as exc:
+            self._record(started, ok=False)
+            raise WebSearchError(f"Không thể kết nối Tavily: {exc}") from exc
+        return self._handle(started, response.status_code, response.text, response.json)
+
+    def _handle(self, started: float, status: int, text: str, decode) -> dict:
+        # Rate limiting and server errors count against the breaker; other
+        # client errors (e.g. a bad API key) do not indicate an outage.
+        if status == 429 or status >= 500:
+            self._record(started, ok=False)
+            raise WebSearchError(f"Tavily trả về lỗi {status}: {text[:200]}")
+        if status >= 400:
+            self.breaker.record_success()
+            raise WebSearchError(f"Tavily từ chối yêu cầu ({status}): {text[:200]}")
+        try:
+            payload = decode()
+        except ValueError as exc:
+            self._record(started, ok=False)
+            raise WebSearchError("Tavily trả về dữ liệu không hợp lệ") from exc
+        self._record(started, ok=True)
+        return payload
+
+    # ------------------------------------------------------------------
+    def search(self, query: str, *, max_results: int | None = None) -> dict:
+        """Return Tavily's JSON response, raising :class:`WebSearchError` or
+        :class:`CircuitOpenError` on failure."""
+
+        max_results = max_results or settings.tavily_max_results
+        key = self._key(query, max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            CACHE_LOOKUPS.inc(result="hit")
+            return cached
+        CACHE_LOOKUPS.inc(result="miss")
+
+        def fetch() -> dict:
+            response = self._fetch(query, max_results)
+            self.cache.set(key, response)
+            return response
+
+        return self._inflight.do(key, fetch)
+
+    async def asearch(self, query: str, *, max_results: int | None = None) -> dict:
+        """Async variant of :meth:`search`."""
+
+        max_results = max_results or settings.tavily_max_results
+        key = self._key(query, max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            CACHE_LOOKUPS.inc(result="hit")
+            return cached
+        CACHE_LOOKUPS.inc(result="miss")
+
+        async def fetch() -> dict:
+            response = await self._afetch(query, max_results)
+            self.cache.set(key, response)
+            return response
+
+        return await self._ainflight.do(key, fetch)
 
     def search_web(self, query: str, *, max_results: int | None = None) -> str:
         LOGGER.info("Searching the web for: %s", query)
-        if not self.client:
-            return "Web search hiện chưa được cấu hình (thiếu Tavily API key)."
-        max_results = max_results or settings.tavily_max_results
+        if not self.configured:
+            return NOT_CONFIGURED_MESSAGE
+        try:
+            response = self.search(query, max_results=max_results)
+        except CircuitOpenError:
+            return UNAVAILABLE_MESSAGE
+        except WebSearchError as exc:
+            LOGGER.warning("Tavily search failed: %s", exc)
+            return str(exc)
+        return self.format_results(response)
+
+    async def asearch_web(self, query: str, *, max_results: int | None = None) -> str:
+        """Async variant of :meth:`search_web`."""
+
+        LOGGER.info("Searching the web for: %s", query)
+        if not self.configured:
+            return NOT_CONFIGURED_MESSAGE
         try:
-            response = self.client.search(query=query, max_results=max_results)
-        except Exception as exc:  # pragma: no cover - network failures
-            LOGGER.exception("Tavily search failed")
-            return f"Không thể truy vấn Tavily: {exc}"
+            response = await self.asearch(query, max_results=max_results)
+        except CircuitOpenError:
+            return UNAVAILABLE_MESSAGE
+        except WebSearchError as exc:
+            LOGGER.warning("Tavily search failed: %s", exc)
+            return str(exc)
+        return self.format_results(response)
+
+    @staticmethod
+    def format_results(response: dict) -> str:
         snippets: List[str] = []
         for result in response.get("results", []):
             title = result.get("title", "")
@@ -0,0 +1,221 @@
+"""Answer many chat questions at once, for evaluation runs and cache pre-warming.
+
+:func:`run_batch` drives :meth:`AgentController.achat` for a list of
+:class:`~app.schemas.BatchChatItem` with a fixed number of workers and yields
+a :class:`~app.schemas.BatchChatResult` as each item finishes.  Items run in
+one event loop and one controller, so they share its caches (embeddings,
+answers, SQL plans, web results) and concurrent query embeddings are
+coalesced by the embedding micro-batcher.  The questions themselves are
+embedded up front in a single encode call, so each item's answer-cache and
+routing lookup is a cache hit.
+
+Every item gets its own session unless it names one; items of the same
+session run one after another in input order.
+
+``/chat/batch`` streams these results as JSON lines.  The CLI runs a file of
+questions either in-process or against a running server:
+
+    python -m app.batch questions.txt --out results.jsonl --concurrency 16
+    python -m app.batch questions.jsonl --url http://localhost:8000
+
+Input lines are plain questions or JSON objects with ``message`` and optional
+``id`` and ``session_id``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Sequence, TextIO
+
+from .agents.answer_cache import normalise_question
+from .config import settings
+from .metrics import REGISTRY
+from .schemas import BatchChatItem, BatchChatResult
+from .tracing import span
+from .utils import embed_texts, get_embedding_cache
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle guard
+    from .agents.controller import AgentController
+
+LOGGER = logging.getLogger(__name__)
+
+BATCH_ITEMS = REGISTRY.counter("edupolicy_batch_items_total", "Batch chat items by outcome.", ["outcome"])
+
+
+async def _prewarm_questions(controller: "AgentController", items: Sequence[BatchChatItem]) -> None:
+    """Embed all questions in one call so per-item lookups hit the embedding cache."""
+
+    if get_embedding_cache() is None or (controller.answer_cache is None and controller.router is None):
+        return
+    questions = list(dict.fromkeys(normalise_question(item.message) for item in items))
+    try:
+        with span("batch.embed_questions"):
+            await asyncio.to_thread(embed_texts, questions, kind="query")
+    except Exception:  # pragma: no cover - items embed their own question on failure
+        LOGGER.exception("Unable to pre-embed batch questions")
+
+
+async def run_batch(
+    controller: "AgentController",
+    items: Sequence[BatchChatItem],
+    *,
+    concurrency: int | None = None,
+    include_timings: bool = True,
+) -> AsyncIterator[BatchChatResult]:
+    """Answer ``items`` with at most ``concurrency`` in flight, yielding results as they complete.
+
+    Results arrive in completion order; ``index`` refers to the input
+    position.  A failing item yields a result with ``error`` set and does not
+    affect the others.  Closing the iterator cancels the remaining work.
+    """
+
+    concurrency = min(concurrency or settings.batch_concurrency, settings.batch_max_concurrency)
+    prefix = f"batch-{uuid.uuid4().hex[:8]}"
+    await _prewarm_questions(controller, items)
+
+    pending: "asyncio.Queue[tuple[int, BatchChatItem]]" = asyncio.Queue()
+    for entry in enumerate(items):
+        pending.put_nowait(entry)
+    results: "asyncio.Queue[BatchChatResult]" = asyncio.Queue()
+    session_locks: Dict[str, asyncio.Lock] = {}
+
+    async def worker() -> None:
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            session_id = item.session_id or f"{prefix}-{index}"
+            # Items are taken in input order and asyncio locks are FIFO, so a
+            # shared session sees its messages in order.
+            async with session_locks.setdefault(session_id, asyncio.Lock()):
+                started = time.perf_counter()
+                result = BatchChatResult(index=index, id=item.id, session_id=session_id, elapsed_ms=0.0)
+                try:
+                    result.response = await controller.achat(
+                        session_id, item.message, include_timings=include_timings
+                    )
+                    BATCH_ITEMS.inc(outcome="ok")
+                except Exception as exc:
+                    LOGGER.exception("Batch item %s failed", index)
+                    result.error = str(exc) or type(exc).__name__
+                    BATCH_ITEMS.inc(outcome="error")
+                result.elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+            await results.put(result)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+# ----------------------------------------------------------------------
+def read_items(stream: TextIO) -> List[BatchChatItem]:
+    """Parse one question per line: plain text or a JSON object."""
+
+    items: List[BatchChatItem] = []
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            items.append(BatchChatItem(**json.loads(line)))
+        else:
+            items.append(BatchChatItem(message=line))
+    return items
+
+
+async def _run_local(items: List[BatchChatItem], args: argparse.Namespace) -> AsyncIterator[BatchChatResult]:
+    from .agents.controller import AgentController
+
+    controller = AgentController()
+    if settings.ingest_on_startup != "off":
+        await asyncio.to_thread(controller.rag_tool.start_ingestion, background=False)
+    async for result in run_batch(
+        controller, items, concurrency=args.concurrency, include_timings=not args.no_timings
+    ):
+        yield result
+
+
+async def _run_remote(items: List[BatchChatItem], args: argparse.Namespace) -> AsyncIterator[BatchChatResult]:
+    import httpx
+
+    url = args.url.rstrip("/") + "/chat/batch"
+    async with httpx.AsyncClient(timeout=None) as client:
+        for offset in range(0, len(items), settings.batch_max_items):
+            chunk = items[offset : offset + settings.batch_max_items]
+            payload = {
+                "items": [item.dict() for item in chunk],
+                "concurrency": args.concurrency,
+                "include_timings": not args.no_timings,
+            }
+            async with client.stream("POST", url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        result = BatchChatResult.parse_raw(line)
+                        result.index += offset
+                        yield result
+
+
+async def _main(items: List[BatchChatItem], args: argparse.Namespace, out: TextIO) -> List[BatchChatResult]:
+    results: List[BatchChatResult] = []
+    source = _run_remote(items, args) if args.url else _run_local(items, args)
+    async for result in source:
+        results.append(result)
+        out.write(result.json(ensure_ascii=False) + "\n")
+        out.flush()
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the agent, writing JSON lines.")
+    parser.add_argument("input", help="Questions file (text or JSONL), or '-' for stdin.")
+    parser.add_argument("--out", type=Path, default=None, help="Results file; defaults to stdout.")
+    parser.add_argument("--concurrency", type=int, default=None, help="Items answered at once.")
+    parser.add_argument("--url", default=None, help="Send the batch to a running API instead of in-process.")
+    parser.add_argument("--no-timings", action="store_true", help="Omit per-stage timings from the results.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if settings.enable_debug_logging else logging.WARNING)
+    if args.input == "-":
+        items = read_items(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as stream:
+            items = read_items(stream)
+    if not items:
+        print("No questions found.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        results = asyncio.run(_main(items, args, out))
+    finally:
+        if args.out:
+            out.close()
+    wall = time.perf_counter() - started
+    errors = sum(1 for result in results if result.error)
+    elapsed = sorted(result.elapsed_ms for result in results)
+    p50 = elapsed[len(elapsed) // 2] if elapsed else 0.0
+    p95 = elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))] if elapsed else 0.0
+    print(
+        f"{len(results)} items in {wall:.1f} s ({len(results) / wall:.2f}/s), {errors} errors;"
+        f" p50 {p50:.0f} ms, p95 {p95:.0f} ms",
+        file=sys.stderr,
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
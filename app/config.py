@@ -9,7 +9,7 @@ values.
 
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import BaseSettings, Field
 
@@ -37,24 +37,168 @@ class Settings(BaseSettings):
 
     # --- Embeddings -----------------------------------------------------
     embedding_model: str = Field(default="intfloat/e5-large-v2")
+    embedding_backend: str = Field(
+        default="torch",
+        description="Embedding execution backend: 'torch', 'onnx' or 'onnx-int8' (dynamic int8 quantisation).",
+    )
+    embedding_quantization: str = Field(
+        default="avx2",
+        description="ONNX Runtime int8 target for the 'onnx-int8' backend: arm64, avx2, avx512 or avx512_vnni.",
+    )
+    embedding_onnx_dir: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "embeddings" / "onnx"
+    )
     chunk_size: int = Field(default=750)
     chunk_overlap: int = Field(default=150)
     top_k: int = Field(default=4, description="Default number of RAG results to return.")
+    hybrid_search: bool = Field(default=True, description="Fuse BM25 and dense rankings with RRF.")
+    hybrid_candidates: int = Field(default=20, description="Candidates taken from each ranking before fusion.")
+    rrf_k: int = Field(default=60, description="Reciprocal rank fusion smoothing constant.")
+    rerank_enabled: bool = Field(default=False, description="Rerank retrieved chunks with a cross-encoder.")
+    rerank_model: str = Field(default="cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+    rerank_candidates: int = Field(default=20, description="Chunks retrieved and scored before keeping the top k.")
+    rerank_batch_size: int = Field(default=32)
+    rerank_max_length: int = Field(default=512, description="Token limit of a query/chunk pair.")
+    rerank_budget_ms: float = Field(
+        default=300.0,
+        description="Scoring time allowed per request before falling back to the retrieval order.",
+    )
+    rerank_max_pending: int = Field(
+        default=4, description="Scoring jobs allowed to wait for the model before requests skip reranking."
+    )
+    rerank_cache_ttl_seconds: float = Field(default=6 * 3600)
+    rerank_cache_max_entries: int = Field(default=20_000)
+    context_packing_enabled: bool = Field(
+        default=True,
+        description="Merge overlapping chunks, diversify and cite them within CONTEXT_MAX_TOKENS.",
+    )
+    context_max_tokens: int = Field(default=1200, description="Estimated token budget of the RAG context.")
+    context_candidates: int = Field(default=8, description="Chunks retrieved before merging and MMR selection.")
+    context_mmr_lambda: float = Field(default=0.7, description="MMR trade-off: 1.0 keeps retrieval order.")
+    embedding_batching_enabled: bool = Field(
+        default=True,
+        description="Micro-batch concurrent query embeddings into a single encode call.",
+    )
+    embedding_batch_max_size: int = Field(default=32)
+    embedding_batch_max_wait_ms: float = Field(default=5.0)
+    embedding_cache_enabled: bool = Field(default=True)
+    embedding_cache_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "embeddings" / "embedding_cache.sqlite"
+    )
+    embedding_cache_max_query_entries: int = Field(
+        default=50_000,
+        description="Query embeddings kept in the cache before least recently used entries are evicted.",
+    )
+
+    # --- Ingestion ------------------------------------------------------
+    ingest_workers: Optional[int] = Field(
+        default=None,
+        description="Number of processes used for PDF extraction. Defaults to all CPU cores.",
+    )
+    ingest_batch_size: int = Field(default=64, description="Number of chunks embedded and inserted per batch.")
+    ingest_on_startup: str = Field(
+        default="background",
+        description=(
+            "How the API process syncs the index at startup: 'background' (thread,"
+            " serve traffic immediately), 'blocking' (finish before serving) or 'off'"
+            " (rely on a separate `python -m app.ingest` job)."
+        ),
+    )
+    ingest_manifest_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "embeddings" / "manifest.json",
+        description="Per-file hashes and vector ids used for incremental re-ingestion.",
+    )
 
     # --- Milvus settings -------------------------------------------------
     milvus_uri: str = Field(default="http://localhost:19530")
     milvus_collection: str = Field(default="regulations_collection")
     milvus_dim: int = Field(default=1024, description="Embedding dimension for e5-large-v2.")
 
+    # --- Vector store ---------------------------------------------------
+    vector_store: str = Field(
+        default="auto",
+        description="'milvus', 'local' (embedded NumPy/HNSW index) or 'auto' (Milvus, local on failure).",
+    )
+    local_index_dir: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "embeddings" / "local_index"
+    )
+    local_index_hnsw: bool = Field(default=False, description="Build an HNSW graph (requires hnswlib).")
+
+    # --- Answer cache ---------------------------------------------------
+    answer_cache_enabled: bool = Field(default=True)
+    answer_cache_threshold: float = Field(
+        default=0.95, description="Minimum cosine similarity between questions to reuse an answer."
+    )
+    answer_cache_ttl_seconds: float = Field(default=6 * 3600)
+    answer_cache_max_entries: int = Field(default=2000)
+
+    # --- Agent ----------------------------------------------------------
+    agent_mode: str = Field(
+        default="react",
+        description="'react' runs one tool per step; 'parallel' lets the agent run independent tools concurrently.",
+    )
+    tool_timeout_seconds: float = Field(default=20.0, description="Default timeout for a single tool call.")
+    tool_timeouts: Dict[str, float] = Field(
+        default_factory=dict, description='Per-tool overrides, e.g. {"web_tool": 8}.'
+    )
+
+    # --- Fast-path routing ---------------------------------------------
+    fast_path_enabled: bool = Field(
+        default=True, description="Answer clear single-tool questions without the ReAct loop."
+    )
+    fast_path_threshold: float = Field(
+        default=0.82, description="Minimum similarity to the closest example question of a route."
+    )
+    fast_path_margin: float = Field(default=0.03, description="Required lead over the runner-up route.")
+
+    # --- Batch chat -----------------------------------------------------
+    batch_concurrency: int = Field(default=8, description="Default items answered at once by /chat/batch.")
+    batch_max_concurrency: int = Field(default=32, description="Upper bound for a request's concurrency.")
+    batch_max_items: int = Field(default=1000, description="Items accepted per /chat/batch request.")
+
     # --- SQLite ---------------------------------------------------------
     sqlite_path: Path = Field(default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "student_records.db")
+    sql_pool_size: int = Field(default=4, description="Read-only connections for generated SQL.")
+    sql_timeout_seconds: float = Field(default=5.0, description="Generated SQL is interrupted after this long.")
+    sql_max_rows: int = Field(default=200, description="Rows fetched per generated query at most.")
+    sql_plan_cache_enabled: bool = Field(default=True)
+    sql_plan_cache_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "sql_plan_cache.sqlite"
+    )
+    sql_plan_cache_max_entries: int = Field(default=5000)
 
     # --- External search ------------------------------------------------
     tavily_api_key: Optional[str] = Field(default=None, env="TAVILY_API_KEY")
     tavily_max_results: int = Field(default=4)
+    tavily_base_url: str = Field(default="https://api.tavily.com")
+    tavily_timeout_seconds: float = Field(default=10.0, description="Read timeout for a Tavily request.")
+    tavily_connect_timeout_seconds: float = Field(default=3.0)
+    tavily_pool_size: int = Field(default=10, description="Maximum pooled connections to Tavily.")
+    tavily_cache_ttl_seconds: float = Field(default=900.0)
+    tavily_cache_max_entries: int = Field(default=1024)
+    tavily_breaker_failures: int = Field(
+        default=5, description="Consecutive failures before web search fails fast."
+    )
+    tavily_breaker_reset_seconds: float = Field(default=30.0, description="How long the circuit stays open.")
 
     # --- Application ----------------------------------------------------
-    session_memory_path: Path = Field(default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "session_memory.json")
+    session_store_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "session_memory.sqlite"
+    )
+    session_memory_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[1] / "data" / "session_memory.json",
+        description="Legacy JSON session file, imported into the SQLite store once if present.",
+    )
+    session_ttl_seconds: Optional[int] = Field(
+        default=30 * 24 * 3600,
+        description="Sessions idle for longer than this are expired. Unset to keep history forever.",
+    )
+    session_history_limit: int = Field(default=40, description="Maximum stored messages loaded per request.")
+    history_max_turns: int = Field(default=6, description="Most recent turns passed to the agent verbatim.")
+    history_token_budget: int = Field(default=1500, description="Token budget for summary plus verbatim turns.")
+    history_summary_enabled: bool = Field(
+        default=True, description="Fold turns that leave the window into a rolling summary."
+    )
     enable_debug_logging: bool = Field(default=False)
 
     class Config:
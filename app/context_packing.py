@@ -0,0 +1,179 @@
+"""Assemble retrieved chunks into a compact, cited context block.
+
+Chunks are produced with ``settings.chunk_overlap`` characters of overlap, so
+neighbouring hits from the same page repeat text, and several hits often say
+the same thing in different documents.  :func:`pack_context` turns the ranked
+retrieval results into the context handed to the agent:
+
+1. consecutive chunks of the same source page are merged into one passage,
+   dropping the overlapping text, and exact duplicates are removed;
+2. passages are ordered by maximal marginal relevance (MMR), trading the
+   retrieval rank against lexical overlap with passages already chosen;
+3. passages are added in that order until ``settings.context_max_tokens`` is
+   reached, each prefixed with a numbered citation of its source and pages.
+
+Redundancy is measured on BM25 tokens rather than embeddings so the stage
+needs no extra model calls and works for any retrieval order (dense, RRF or
+reranked).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from .config import settings
+from .db.bm25_index import tokenize
+from .db.embedding_cache import normalise_text
+from .db.milvus_client import MilvusDocument
+from .utils import estimate_tokens
+
+# Shortest suffix/prefix match treated as chunk overlap rather than coincidence.
+MIN_OVERLAP_CHARS = 20
+
+
+@dataclass
+class Passage:
+    """One or more adjacent chunks of a source, with the best rank among them."""
+
+    text: str
+    source: str
+    pages: List[int] = field(default_factory=list)
+    rank: int = 0
+
+    @property
+    def citation(self) -> str:
+        if not self.pages:
+            return self.source
+        first, last = min(self.pages), max(self.pages)
+        pages = f"trang {first}" if first == last else f"trang {first}-{last}"
+        return f"{self.source}, {pages}"
+
+
+def _join_overlapping(left: str, right: str, *, max_overlap: int) -> str:
+    """Concatenate two consecutive chunks, dropping the text they share."""
+
+    limit = min(len(left), len(right), max_overlap)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left}\n{right}"
+
+
+def merge_adjacent(documents: Sequence[MilvusDocument]) -> List[Passage]:
+    """Merge consecutive chunks of the same source page into passages.
+
+    Chunks carry ``source``, ``page`` and ``chunk`` (index within the page)
+    metadata; chunks without it are kept as they are.  Passages keep the
+    retrieval rank of their best chunk and are returned in rank order.
+    """
+
+    max_overlap = 2 * settings.chunk_overlap
+    passages: List[Passage] = []
+    runs: Dict[Tuple[str, object], List[Tuple[int, int, str]]] = {}
+    seen: set = set()
+    for rank, document in enumerate(documents):
+        key = normalise_text(document.text)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        metadata = document.metadata or {}
+        source = str(metadata.get("source", ""))
+        page = metadata.get("page")
+        chunk = metadata.get("chunk")
+        if not isinstance(chunk, int):
+            pages = [page] if isinstance(page, int) else []
+            passages.append(Passage(text=document.text, source=source, pages=pages, rank=rank))
+            continue
+        runs.setdefault((source, page), []).append((chunk, rank, document.text))
+
+    for (source, page), chunks in runs.items():
+        pages = [page] if isinstance(page, int) else []
+        chunks.sort()
+        current: Passage | None = None
+        previous_index = None
+        for index, rank, text in chunks:
+            if current is not None and index == previous_index + 1:
+                current.text = _join_overlapping(current.text, text, max_overlap=max_overlap)
+                current.rank = min(current.rank, rank)
+            else:
+                current = Passage(text=text, source=source, pages=list(pages), rank=rank)
+                passages.append(current)
+            previous_index = index
+    passages.sort(key=lambda passage: passage.rank)
+    return passages
+
+
+def _similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def mmr_order(passages: Sequence[Passage], *, diversity: float | None = None) -> List[Passage]:
+    """Order ``passages`` by maximal marginal relevance.
+
+    Relevance decays linearly with the retrieval rank; redundancy is the
+    Jaccard similarity of BM25 token sets.  ``diversity`` is the MMR lambda:
+    1.0 keeps the retrieval order, lower values favour novel passages.
+    """
+
+    lam = settings.context_mmr_lambda if diversity is None else diversity
+    if len(passages) <= 2 or lam >= 1.0:
+        return list(passages)
+    worst = max(passage.rank for passage in passages) + 1
+    relevance = [1.0 - passage.rank / worst for passage in passages]
+    tokens = [frozenset(tokenize(passage.text)) for passage in passages]
+    remaining = list(range(len(passages)))
+    chosen: List[int] = []
+    while remaining:
+        best = max(
+            remaining,
+            key=lambda idx: lam * relevance[idx]
+            - (1 - lam) * max((_similarity(tokens[idx], tokens[other]) for other in chosen), default=0.0),
+        )
+        chosen.append(best)
+        remaining.remove(best)
+    return [passages[idx] for idx in chosen]
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    # Inverse of ``estimate_tokens``; cut on a word boundary.
+    limit = max(0, (max_tokens - 1) * 3)
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut.rstrip() + " ..."
+
+
+def pack_context(
+    documents: Sequence[MilvusDocument],
+    *,
+    max_tokens: int | None = None,
+    max_passages: int | None = None,
+) -> Tuple[str, List[str]]:
+    """Return the cited context block and its passages for ``documents``.
+
+    ``documents`` must be in retrieval order (best first).  At most
+    ``max_passages`` passages are used and the block stays within
+    ``max_tokens`` as estimated by :func:`~app.utils.estimate_tokens`; the
+    first passage is truncated rather than dropped if it alone is too long.
+    """
+
+    budget = max_tokens or settings.context_max_tokens
+    blocks: List[str] = []
+    used = 0
+    for passage in mmr_order(merge_adjacent(documents)):
+        if max_passages is not None and len(blocks) >= max_passages:
+            break
+        header = f"[{len(blocks) + 1}] Nguồn: {passage.citation}\n"
+        block = header + passage.text.strip()
+        cost = estimate_tokens(block)
+        if used + cost > budget:
+            if blocks:
+                continue
+            block = header + _truncate(passage.text.strip(), budget - estimate_tokens(header))
+            cost = estimate_tokens(block)
+        blocks.append(block)
+        used += cost
+    return "\n\n".join(blocks), blocks
@@ -0,0 +1,137 @@
+"""Content-addressed, SQLite backed cache of embedding vectors."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from ..config import settings
+from ..metrics import REGISTRY
+
+LOGGER = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+LOOKUPS = REGISTRY.counter("edupolicy_embedding_cache_lookups_total", "Embedding cache lookups by result.", ["result"])
+
+
+def normalise_text(text: str) -> str:
+    """Canonicalise Unicode composition and whitespace before hashing."""
+
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """Map ``(model name, normalised text)`` to a float32 vector.
+
+    Document embeddings produced during ingestion are kept indefinitely so
+    re-ingesting unchanged chunks never reaches the transformer.  Query
+    embeddings are bounded to ``max_query_entries`` and evicted least recently
+    used first.  SQLite in WAL mode lets several API workers share the file.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        *,
+        model_name: str | None = None,
+        max_query_entries: int | None = None,
+    ) -> None:
+        self.path = path or settings.embedding_cache_path
+        self.model_name = model_name or settings.embedding_model
+        self.max_query_entries = max_query_entries or settings.embedding_cache_max_query_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings (kind, last_used)")
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    def key(self, text: str) -> str:
+        payload = f"{self.model_name}\0{normalise_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> Dict[int, List[float]]:
+        """Return cached vectors keyed by their position in ``texts``."""
+
+        if not texts:
+            return {}
+        keys = [self.key(text) for text in texts]
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement.
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ? AND kind = 'query'",
+                    [(time.time(), key) for key in found],
+                )
+                self._conn.commit()
+        vectors = {
+            idx: np.frombuffer(found[key], dtype=np.float32).tolist()
+            for idx, key in enumerate(keys)
+            if key in found
+        }
+        LOOKUPS.inc(len(vectors), result="hit")
+        LOOKUPS.inc(len(keys) - len(vectors), result="miss")
+        return vectors
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]], *, kind: str = "document") -> None:
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (self.key(text), kind, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            # A document entry is never downgraded to an evictable query entry,
+            # while a cached query that gets ingested as a document is upgraded.
+            self._conn.executemany(
+                "INSERT INTO embeddings (key, kind, vector, last_used) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET last_used = excluded.last_used,"
+                " kind = CASE WHEN excluded.kind = 'document' THEN 'document' ELSE embeddings.kind END",
+                rows,
+            )
+            if kind == "query":
+                self._evict_queries()
+            self._conn.commit()
+
+    def _evict_queries(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE kind = 'query'").fetchone()
+        excess = count - self.max_query_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings WHERE kind = 'query' ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            LOGGER.debug("Evicted %s query embeddings from cache", excess)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,299 @@
+"""Embedded vector store used when Milvus is unavailable or not wanted.
+
+The regulation corpus is small (tens of thousands of chunks), so an exact
+cosine search over a memory-mapped float32 matrix answers queries in a few
+milliseconds without a network hop.  When ``hnswlib`` is installed and
+``settings.local_index_hnsw`` is enabled an HNSW graph is built on top of the
+matrix for approximate search.
+
+Every write produces a new snapshot directory under
+``settings.local_index_dir`` holding:
+
+``vectors.npy``
+    ``(n, dim)`` float32 matrix of L2-normalised embeddings.
+``documents.jsonl``
+    One ``{"id", "text", "metadata"}`` object per matrix row.
+
+The ``CURRENT`` file names the published snapshot and is swapped atomically
+once both files are complete, so a reader never pairs vectors with documents
+of another write.  Ingestion may run in another process
+(``python -m app.ingest``), so readers reload whenever ``CURRENT`` changes.
+The previous snapshot is kept for readers still loading it; older ones are
+removed.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..metadata import RetrievalFilter, metadata_columns
+from .milvus_client import MilvusDocument
+
+LOGGER = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+
+
+@dataclass
+class _Snapshot:
+    ids: np.ndarray
+    vectors: np.ndarray
+    texts: List[str]
+    metadatas: List[dict]
+    hnsw: object | None = None
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+
+
+class LocalVectorStore:
+    """In-process implementation of the ``MilvusVectorStore`` interface."""
+
+    def __init__(self, path: Path | None = None, *, dim: int | None = None, use_hnsw: bool | None = None) -> None:
+        self.path = path or settings.local_index_dir
+        self.dim = dim or settings.milvus_dim
+        self.use_hnsw = settings.local_index_hnsw if use_hnsw is None else use_hnsw
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.path / "manifest.json"
+        self._lock = threading.Lock()
+        self._pending_vectors: List[np.ndarray] = []
+        self._pending_docs: List[tuple] = []
+        self._published: Path | None = None
+        self._snapshot = self._load_published()
+        self._next_id = int(self._snapshot.ids.max()) + 1 if len(self._snapshot.ids) else 1
+
+    # ------------------------------------------------------------------
+    def _snapshot_dir(self) -> Path | None:
+        """Directory of the published snapshot, ``None`` before the first write."""
+
+        try:
+            name = (self.path / CURRENT_FILE).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            # Indexes written before snapshots were versioned keep their files at the top level.
+            return self.path if (self.path / VECTORS_FILE).exists() else None
+        return self.path / name
+
+    def _load_published(self) -> _Snapshot:
+        """Load the published snapshot, following ``CURRENT`` if it moves while loading."""
+
+        while True:
+            directory = self._snapshot_dir()
+            try:
+                snapshot = self._load(directory)
+            except (OSError, ValueError):
+                if self._snapshot_dir() == directory:
+                    raise
+                # Superseded and pruned by a writer while we were reading it.
+                continue
+            self._published = directory
+            return snapshot
+
+    def _current(self) -> _Snapshot:
+        """Return the snapshot, reloading it after another process published a new one."""
+
+        if self._snapshot_dir() == self._published:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot_dir() != self._published and not self._pending_docs:
+                try:
+                    snapshot = self._load_published()
+                except (OSError, ValueError):  # pragma: no cover - retried on the next call
+                    LOGGER.exception("Unable to reload the local index at %s", self.path)
+                else:
+                    self._snapshot = snapshot
+                    if len(snapshot.ids):
+                        self._next_id = max(self._next_id, int(snapshot.ids.max()) + 1)
+        return self._snapshot
+
+    def _load(self, directory: Path | None) -> _Snapshot:
+        if directory is None:
+            return _Snapshot(np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32), [], [])
+        vectors = np.load(directory / VECTORS_FILE, mmap_mode="r")
+        ids: List[int] = []
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        with (directory / DOCUMENTS_FILE).open("r", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                ids.append(record["id"])
+                texts.append(record["text"])
+                metadatas.append(record["metadata"])
+        if len(ids) != vectors.shape[0]:
+            raise ValueError(f"Local index at {directory} is corrupt: {len(ids)} documents, {vectors.shape[0]} vectors")
+        LOGGER.info("Loaded local vector index with %s vectors from %s", len(ids), directory)
+        return self._build_snapshot(np.asarray(ids, dtype=np.int64), vectors, texts, metadatas)
+
+    def _build_snapshot(self, ids: np.ndarray, vectors: np.ndarray, texts: List[str], metadatas: List[dict]) -> _Snapshot:
+        snapshot = _Snapshot(ids, vectors, texts, metadatas, columns=metadata_columns(metadatas))
+        if self.use_hnsw and len(ids):
+            try:
+                import hnswlib
+            except ImportError:
+                LOGGER.warning("hnswlib is not installed; falling back to exact search")
+                self.use_hnsw = False
+            else:
+                index = hnswlib.Index(space="cosine", dim=self.dim)
+                index.init_index(max_elements=len(ids), M=16, ef_construction=100)
+                index.add_items(np.asarray(vectors), np.arange(len(ids)))
+                index.set_ef(max(64, settings.top_k * 4))
+                snapshot.hnsw = index
+        return snapshot
+
+    def _persist(self, snapshot: _Snapshot) -> _Snapshot:
+        directory = self.path / f"snapshot-{time.time_ns():x}-{os.getpid()}"
+        directory.mkdir()
+        np.save(directory / VECTORS_FILE, np.ascontiguousarray(snapshot.vectors, dtype=np.float32))
+        with (directory / DOCUMENTS_FILE).open("w", encoding="utf-8") as file:
+            for pk, text, metadata in zip(snapshot.ids.tolist(), snapshot.texts, snapshot.metadatas):
+                file.write(json.dumps({"id": pk, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+        tmp_current = self.path / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+        tmp_current.write_text(directory.name, encoding="utf-8")
+        os.replace(tmp_current, self.path / CURRENT_FILE)
+        previous, self._published = self._published, directory
+        self._prune(keep={directory, previous})
+        vectors = np.load(directory / VECTORS_FILE, mmap_mode="r")
+        return self._build_snapshot(snapshot.ids, vectors, snapshot.texts, snapshot.metadatas)
+
+    def _prune(self, keep: set) -> None:
+        """Remove superseded snapshots other than ``keep``."""
+
+        for directory in self.path.glob("snapshot-*"):
+            if directory not in keep:
+                shutil.rmtree(directory, ignore_errors=True)
+        if self.path not in keep:
+            for name in (VECTORS_FILE, DOCUMENTS_FILE):
+                (self.path / name).unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    def add_embeddings(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        chunks: Sequence[str],
+        metadatas: Sequence[dict],
+        *,
+        flush: bool = True,
+    ) -> List[int]:
+        """Stage vectors for insertion and return their primary keys."""
+
+        if len(embeddings) != len(chunks):
+            raise ValueError("Embeddings and chunks must have the same length")
+        vectors = np.array(embeddings, dtype=np.float32).reshape(len(chunks), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d embeddings, got {vectors.shape[1]}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        with self._lock:
+            ids = list(range(self._next_id, self._next_id + len(chunks)))
+            self._next_id += len(chunks)
+            self._pending_vectors.append(vectors)
+            self._pending_docs.extend(zip(ids, chunks, metadatas))
+        if flush:
+            self.flush()
+        return ids
+
+    def flush(self) -> None:
+        """Append staged vectors to the persisted matrix."""
+
+        with self._lock:
+            if not self._pending_docs:
+                return
+            current = self._snapshot
+            ids, texts, metadatas = zip(*self._pending_docs)
+            snapshot = _Snapshot(
+                ids=np.concatenate([current.ids, np.asarray(ids, dtype=np.int64)]),
+                vectors=np.concatenate([np.asarray(current.vectors), *self._pending_vectors]),
+                texts=current.texts + list(texts),
+                metadatas=current.metadatas + list(metadatas),
+            )
+            self._snapshot = self._persist(snapshot)
+            self._pending_vectors.clear()
+            self._pending_docs.clear()
+        LOGGER.info("Local vector index now holds %s vectors", len(self._snapshot.ids))
+
+    def delete(self, ids: Sequence[int]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            current = self._snapshot
+            keep = ~np.isin(current.ids, np.asarray(list(ids), dtype=np.int64))
+            rows = np.flatnonzero(keep)
+            snapshot = _Snapshot(
+                ids=current.ids[keep],
+                vectors=np.asarray(current.vectors)[keep],
+                texts=[current.texts[i] for i in rows],
+                metadatas=[current.metadatas[i] for i in rows],
+            )
+            self._snapshot = self._persist(snapshot)
+        LOGGER.info("Deleted %s vectors from local index", int((~keep).sum()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending_vectors.clear()
+            self._pending_docs.clear()
+            empty = _Snapshot(np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32), [], [])
+            self._snapshot = self._persist(empty)
+
+    # ------------------------------------------------------------------
+    def query(
+        self,
+        embedding: Sequence[float],
+        top_k: int,
+        *,
+        filters: RetrievalFilter | None = None,
+    ) -> List[MilvusDocument]:
+        snapshot = self._current()
+        if not len(snapshot.ids):
+            return []
+        query = np.array(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        subset = None
+        if filters and not filters.is_empty():
+            # Filtered searches are exact over the (smaller) matching subset.
+            subset = np.flatnonzero(filters.mask(snapshot.columns))
+            if not len(subset):
+                return []
+        if snapshot.hnsw is not None and subset is None:
+            labels, distances = snapshot.hnsw.knn_query(query, k=min(top_k, len(snapshot.ids)))
+            rows, scores = labels[0], 1.0 - distances[0]
+        else:
+            vectors = snapshot.vectors if subset is None else snapshot.vectors[subset]
+            similarities = vectors @ query
+            count = len(similarities)
+            top_k = min(top_k, count)
+            if top_k < count:
+                candidates = np.argpartition(-similarities, top_k - 1)[:top_k]
+            else:
+                candidates = np.arange(count)
+            ordered = candidates[np.argsort(-similarities[candidates])]
+            scores = similarities[ordered]
+            rows = ordered if subset is None else subset[ordered]
+        return [
+            MilvusDocument(
+                text=snapshot.texts[row],
+                metadata=snapshot.metadatas[row],
+                id=int(snapshot.ids[row]),
+                score=float(score),
+            )
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+    def iter_documents(self) -> Iterator[Tuple[int, str, dict]]:
+        """Yield ``(id, text, metadata)`` for every stored chunk."""
+
+        snapshot = self._current()
+        yield from zip(snapshot.ids.tolist(), snapshot.texts, snapshot.metadatas)
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self._current().ids) == 0
@@ -4,14 +4,26 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass
-from typing import List, Sequence
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, MilvusException, connections, utility
 
 from ..config import settings
+from ..metadata import COHORT_MAX, COHORT_MIN, RetrievalFilter
 
 LOGGER = logging.getLogger(__name__)
 
+# Scalar attributes extracted at ingestion (see ``app.metadata``) that search
+# expressions can filter on, with the value used when a chunk lacks one.
+SCALAR_FIELDS: Tuple[Tuple[str, DataType, object], ...] = (
+    ("source", DataType.VARCHAR, ""),
+    ("program_level", DataType.VARCHAR, ""),
+    ("academic_year", DataType.VARCHAR, ""),
+    ("semester", DataType.INT64, 0),
+    ("cohort_from", DataType.INT64, COHORT_MIN),
+    ("cohort_to", DataType.INT64, COHORT_MAX),
+)
+
 
 @dataclass
 class MilvusDocument:
@@ -19,6 +31,8 @@ class MilvusDocument:
 
     text: str
     metadata: dict
+    id: Optional[int] = None
+    score: Optional[float] = None
 
 
 class MilvusVectorStore:
@@ -31,6 +45,13 @@ class MilvusVectorStore:
             LOGGER.error("Unable to connect to Milvus at %s: %s", settings.milvus_uri, exc)
             raise
         self.collection_name = settings.milvus_collection
+        self.manifest_path = settings.ingest_manifest_path
+        if utility.has_collection(self.collection_name) and not self._has_scalar_fields():
+            LOGGER.warning(
+                "Milvus collection %s predates the filterable scalar fields; dropping it for re-ingestion",
+                self.collection_name,
+            )
+            utility.drop_collection(self.collection_name)
         if not utility.has_collection(self.collection_name):
             LOGGER.info("Creating Milvus collection %s", self.collection_name)
             self._create_collection()
@@ -43,6 +64,10 @@ class MilvusVectorStore:
             LOGGER.debug("Milvus collection %s already populated", self.collection_name)
 
     # ------------------------------------------------------------------
+    def _has_scalar_fields(self) -> bool:
+        existing = {field.name for field in Collection(self.collection_name).schema.fields}
+        return all(name in existing for name, _, _ in SCALAR_FIELDS)
+
     def _create_collection(self) -> None:
         fields = [
             FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
@@ -50,6 +75,9 @@ class MilvusVectorStore:
             FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=8192),
             FieldSchema(name="metadata", dtype=DataType.JSON),
         ]
+        for name, dtype, _ in SCALAR_FIELDS:
+            extra = {"max_length": 1024} if dtype == DataType.VARCHAR else {}
+            fields.append(FieldSchema(name=name, dtype=dtype, **extra))
         schema = CollectionSchema(fields, description="University regulation embeddings")
         Collection(name=self.collection_name, schema=schema)
 
@@ -61,32 +89,88 @@ class MilvusVectorStore:
             "params": {"M": 8, "efConstruction": 64},
         }
         self.collection.create_index(field_name="embedding", index_params=index_params)
+        for name, _, _ in SCALAR_FIELDS:
+            self.collection.create_index(field_name=name, index_name=f"{name}_idx")
         self.collection.load()
 
     # ------------------------------------------------------------------
-    def add_embeddings(self, embeddings: Sequence[Sequence[float]], chunks: Sequence[str], metadatas: Sequence[dict]) -> None:
+    def add_embeddings(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        chunks: Sequence[str],
+        metadatas: Sequence[dict],
+        *,
+        flush: bool = True,
+    ) -> List[int]:
+        """Insert vectors and return the primary keys assigned by Milvus."""
+
         if len(embeddings) != len(chunks):
             raise ValueError("Embeddings and chunks must have the same length")
         LOGGER.info("Inserting %s vectors into Milvus", len(embeddings))
         try:
-            self.collection.insert([
+            result = self.collection.insert([
                 list(embeddings),
                 list(chunks),
                 list(metadatas),
+                *[[metadata.get(name, default) for metadata in metadatas] for name, _, default in SCALAR_FIELDS],
             ])
+        except MilvusException as exc:
+            LOGGER.error("Failed to insert into Milvus: %s", exc)
+            raise
+        if flush:
+            self.flush()
+        return list(result.primary_keys)
+
+    def delete(self, ids: Sequence[int], *, batch_size: int = 1000) -> None:
+        """Delete vectors by primary key."""
+
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            try:
+                self.collection.delete(expr=f"id in {batch}")
+            except MilvusException as exc:
+                LOGGER.error("Failed to delete from Milvus: %s", exc)
+                raise
+        if ids:
+            LOGGER.info("Deleted %s vectors from Milvus", len(ids))
+
+    def clear(self) -> None:
+        """Remove every vector from the collection."""
+
+        try:
+            self.collection.delete(expr="id >= 0")
+            self.collection.flush()
+        except MilvusException as exc:
+            LOGGER.error("Failed to clear Milvus collection: %s", exc)
+            raise
+
+    def flush(self) -> None:
+        """Seal pending inserts and make them visible to search."""
+
+        try:
             self.collection.flush()
             self.collection.load()
         except MilvusException as exc:
-            LOGGER.error("Failed to insert into Milvus: %s", exc)
+            LOGGER.error("Failed to flush Milvus collection: %s", exc)
             raise
 
-    def query(self, embedding: Sequence[float], top_k: int) -> List[MilvusDocument]:
+    def query(
+        self,
+        embedding: Sequence[float],
+        top_k: int,
+        *,
+        filters: RetrievalFilter | None = None,
+    ) -> List[MilvusDocument]:
+        expr = filters.to_milvus_expr() if filters else ""
         try:
             results = self.collection.search(
                 data=[list(embedding)],
                 anns_field="embedding",
-                param={"metric_type": "COSINE", "params": {"ef": 32}},
+                # HNSW rejects ``ef`` below ``limit``, e.g. when reranking over-fetches.
+                param={"metric_type": "COSINE", "params": {"ef": max(32, top_k)}},
                 limit=top_k,
+                expr=expr or None,
                 output_fields=["text", "metadata"],
             )
         except MilvusException as exc:
@@ -95,9 +179,34 @@ class MilvusVectorStore:
         documents: List[MilvusDocument] = []
         for hits in results:
             for hit in hits:
-                documents.append(MilvusDocument(text=hit.entity.get("text"), metadata=hit.entity.get("metadata", {})))
+                documents.append(
+                    MilvusDocument(
+                        text=hit.entity.get("text"),
+                        metadata=hit.entity.get("metadata", {}),
+                        id=hit.id,
+                        score=hit.distance,
+                    )
+                )
         return documents
 
+    def iter_documents(self, *, batch_size: int = 1000) -> Iterator[Tuple[int, str, dict]]:
+        """Yield ``(id, text, metadata)`` for every stored chunk."""
+
+        iterator = self.collection.query_iterator(
+            batch_size=batch_size,
+            expr="id >= 0",
+            output_fields=["id", "text", "metadata"],
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                for row in batch:
+                    yield row["id"], row["text"], row.get("metadata") or {}
+        finally:
+            iterator.close()
+
     @property
     def is_empty(self) -> bool:
         return self.collection.is_empty
@@ -2,35 +2,59 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import sqlite3
+import threading
 from pathlib import Path
-from typing import List, Optional, Sequence
+from typing import Optional, Tuple
 
 from langchain_community.utilities import SQLDatabase
 
 from ..config import settings
+from .sql_engine import QueryResult, ReadOnlySQLiteEngine
 
 LOGGER = logging.getLogger(__name__)
 
 
 class SQLiteClient:
-    """Wrapper around ``SQLDatabase`` providing helper methods."""
+    """Wrapper around ``SQLDatabase`` providing helper methods.
+
+    The schema summary given to the NL2SQL prompt (DDL plus sample rows) is
+    rendered once and reused until the database file changes.
+    """
 
     def __init__(self) -> None:
         self.path: Path = settings.sqlite_path
+        self._schema_lock = threading.Lock()
+        self._schema: Tuple[Tuple[int, int], str, str] | None = None
+        self._engine: ReadOnlySQLiteEngine | None = None
         if not self.path.exists():
             LOGGER.warning("SQLite database missing at %s. SQL tool will be disabled until provided.", self.path)
             self.db: Optional[SQLDatabase] = None
         else:
-            self.db = SQLDatabase.from_uri(f"sqlite:///{self.path}")
+            self.db = SQLDatabase.from_uri(f"sqlite:///file:{self.path}?mode=ro&uri=true")
+
+    @property
+    def engine(self) -> ReadOnlySQLiteEngine:
+        if self._engine is None:
+            self._engine = ReadOnlySQLiteEngine(
+                self.path,
+                pool_size=settings.sql_pool_size,
+                timeout_seconds=settings.sql_timeout_seconds,
+                max_rows=settings.sql_max_rows,
+            )
+        return self._engine
+
+    def run_query(self, query: str) -> QueryResult:
+        """Execute a single read-only ``SELECT`` through the guarded engine."""
 
-    def run_raw_query(self, query: str) -> List[Sequence[str]]:
         if not self.db:
             raise FileNotFoundError(
                 f"SQLite database not found at {self.path}. Populate data/student_records.db to enable SQL queries."
             )
-        LOGGER.debug("Executing raw SQL: %s", query)
-        return self.db.run(query)
+        LOGGER.debug("Executing SQL: %s", query)
+        return self.engine.execute(query)
 
     def get_table_info(self) -> str:
         if not self.db:
@@ -38,3 +62,27 @@ class SQLiteClient:
                 f"SQLite database not found at {self.path}. Populate data/student_records.db to enable SQL queries."
             )
         return self.db.get_table_info()
+
+    def _schema_state(self) -> Tuple[str, str]:
+        stat = self.path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._schema_lock:
+            if self._schema is None or self._schema[0] != key:
+                with sqlite3.connect(f"file:{self.path}?mode=ro", uri=True) as conn:
+                    ddl = conn.execute(
+                        "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type, name"
+                    ).fetchall()
+                version = hashlib.sha1(repr(ddl).encode("utf-8")).hexdigest()
+                self._schema = (key, version, self.get_table_info())
+                LOGGER.info("Refreshed schema summary for %s (schema %s)", self.path, version[:12])
+            return self._schema[1], self._schema[2]
+
+    def schema_summary(self) -> str:
+        """Table definitions with sample rows, cached until the file changes."""
+
+        return self._schema_state()[1]
+
+    def schema_version(self) -> str:
+        """Hash of the DDL; changes only when tables or indexes change."""
+
+        return self._schema_state()[0]
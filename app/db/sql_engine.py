@@ -0,0 +1,129 @@
+"""Guarded, read-only execution of generated SQL against SQLite.
+
+LLM-written SQL is untrusted.  Every statement runs on a pooled connection
+opened with ``mode=ro`` and ``PRAGMA query_only``, and an authorizer only
+admits reads, so writes, ``ATTACH`` and pragmas fail before execution.  A
+progress handler aborts statements that exceed the timeout (a runaway cross
+join would otherwise pin a worker thread), the statement is wrapped in a
+``LIMIT`` and rows are fetched incrementally with their real column names.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import queue
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+_PROGRESS_STEPS = 10_000
+
+
+class SQLGuardError(ValueError):
+    """The statement is not a single read-only ``SELECT``."""
+
+
+class QueryTimeoutError(RuntimeError):
+    """The statement exceeded its time budget and was interrupted."""
+
+
+@dataclass
+class QueryResult:
+    columns: List[str]
+    rows: List[Tuple] = field(default_factory=list)
+    truncated: bool = False
+    """More rows matched than ``max_rows``; only the first ``max_rows`` are kept."""
+
+
+def validate_select(sql: str) -> str:
+    """Return ``sql`` without comments or a trailing semicolon, or raise
+    :class:`SQLGuardError` unless it is a single ``SELECT``/``WITH`` query."""
+
+    statement = _COMMENT_RE.sub(" ", sql).strip().rstrip(";").strip()
+    if not statement:
+        raise SQLGuardError("Câu lệnh SQL rỗng.")
+    if ";" in _STRING_RE.sub("''", statement):
+        raise SQLGuardError("Chỉ cho phép một câu lệnh SQL mỗi lần truy vấn.")
+    keyword = statement.split(None, 1)[0].upper()
+    if keyword not in ("SELECT", "WITH"):
+        raise SQLGuardError(f"Chỉ cho phép câu lệnh SELECT (nhận được {keyword}).")
+    return statement
+
+
+def _authorize(action: int, *args) -> int:
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class ReadOnlySQLiteEngine:
+    """Pool of read-only connections executing guarded ``SELECT`` statements."""
+
+    def __init__(self, path: Path, *, pool_size: int, timeout_seconds: float, max_rows: int) -> None:
+        self.path = path
+        self.timeout_seconds = timeout_seconds
+        self.max_rows = max_rows
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA query_only = ON")
+        conn.set_authorizer(_authorize)
+        return conn
+
+    @contextlib.contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._pool.get(timeout=self.timeout_seconds)
+        except queue.Empty as exc:
+            raise QueryTimeoutError("Tất cả kết nối SQLite đang bận, vui lòng thử lại.") from exc
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, 0)
+            self._pool.put(conn)
+
+    def execute(self, sql: str) -> QueryResult:
+        statement = validate_select(sql)
+        # Fetching one extra row tells whether the result was truncated.
+        limited = f"SELECT * FROM ({statement}) LIMIT {self.max_rows + 1}"
+        deadline = time.monotonic() + self.timeout_seconds
+        with self._connection() as conn:
+            conn.set_progress_handler(lambda: int(time.monotonic() > deadline), _PROGRESS_STEPS)
+            try:
+                cursor = conn.execute(limited)
+                columns = [description[0] for description in cursor.description or ()]
+                rows: List[Tuple] = []
+                while len(rows) <= self.max_rows:
+                    batch = cursor.fetchmany(min(100, self.max_rows + 1 - len(rows)))
+                    if not batch:
+                        break
+                    rows.extend(batch)
+                cursor.close()
+            except sqlite3.OperationalError as exc:
+                if time.monotonic() > deadline and "interrupted" in str(exc):
+                    LOGGER.warning("SQL statement timed out after %ss: %s", self.timeout_seconds, statement)
+                    raise QueryTimeoutError(
+                        f"Truy vấn vượt quá {self.timeout_seconds:g} giây và đã bị huỷ."
+                    ) from exc
+                if "not authorized" in str(exc):
+                    raise SQLGuardError("Câu lệnh truy cập tài nguyên không được phép.") from exc
+                raise
+        truncated = len(rows) > self.max_rows
+        return QueryResult(columns=columns, rows=rows[: self.max_rows], truncated=truncated)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,181 @@
+"""Persistent cache of validated NL2SQL plans.
+
+Generating SQL costs an LLM round-trip even for questions the service has
+answered many times.  Once generated SQL has executed successfully it is
+stored under two keys:
+
+* the normalised question, for exact repeats;
+* a *template* of the question in which literals (student IDs, years, GPA
+  thresholds, quoted names) are replaced by typed placeholders, together with
+  the SQL where each of those literals was replaced the same way.  A later
+  question with the same template but different values reuses the SQL with
+  the new values substituted.
+
+A template is only recorded when the mapping is unambiguous: every literal in
+the question occurs exactly once in the SQL.  Plans are scoped to the schema
+version of ``student_records.db`` so schema changes invalidate them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from ..config import settings
+from .embedding_cache import normalise_text
+
+LOGGER = logging.getLogger(__name__)
+
+_LITERAL_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"|(?<![\w.])(\d+(?:\.\d+)?)(?![\w.])")
+
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+# Bumped when template generation changes so plans stored by older rules are ignored.
+TEMPLATE_KIND = "template-v2"
+
+Literal = Tuple[str, str]
+"""``("n", "2021")`` for numbers, ``("s", "Nguyễn Văn A")`` for quoted strings."""
+
+
+def normalise_question(question: str) -> str:
+    return normalise_text(question).lower().rstrip(" ?.!")
+
+
+def parameterise(question: str) -> Tuple[str, List[Literal]]:
+    """Replace literals in the normalised question with ``<n0>``/``<s1>`` markers.
+
+    Only the text around literals is lower-cased; quoted values keep their
+    case so they can be matched against the generated SQL.
+    """
+
+    text = normalise_text(question).rstrip(" ?.!")
+    literals: List[Literal] = []
+    parts: List[str] = []
+    position = 0
+    for match in _LITERAL_RE.finditer(text):
+        quoted = match.group(1) if match.group(1) is not None else match.group(2)
+        kind, value = ("s", quoted) if quoted is not None else ("n", match.group(3))
+        parts.append(text[position : match.start()].lower())
+        parts.append(f"<{kind}{len(literals)}>")
+        literals.append((kind, value))
+        position = match.end()
+    parts.append(text[position:].lower())
+    return "".join(parts), literals
+
+
+def _value_pattern(value: str) -> re.Pattern:
+    return re.compile(r"(?<![\w.])" + re.escape(value) + r"(?![\w.])")
+
+
+def _inside_string_literal(sql: str, start: int, end: int) -> bool:
+    """Whether ``sql[start:end]`` lies within one single-quoted SQL string."""
+
+    return any(
+        literal.start() < start and end < literal.end() for literal in _SQL_STRING_RE.finditer(sql)
+    )
+
+
+def sql_template(sql: str, literals: List[Literal]) -> str | None:
+    """Generalise ``sql`` over the question's literals, or ``None`` if ambiguous.
+
+    Quoted values from the question are user text: they are only generalised
+    where the SQL uses them inside a string literal, where :func:`fill_template`
+    escapes them.  Anywhere else (a column name, a keyword) the plan is not
+    templated and only the exact question is cached.
+    """
+
+    if len({value for _, value in literals}) != len(literals):
+        return None
+    template = sql
+    for index, (kind, value) in enumerate(literals):
+        pattern = _value_pattern(value)
+        matches = list(pattern.finditer(template))
+        if not value or len(matches) != 1:
+            return None
+        if kind == "s" and not _inside_string_literal(template, matches[0].start(), matches[0].end()):
+            return None
+        template = pattern.sub(lambda _: f"<{kind}{index}>", template)
+    return template
+
+
+def fill_template(template: str, literals: List[Literal]) -> str:
+    sql = template
+    for index, (kind, value) in enumerate(literals):
+        sql = sql.replace(f"<{kind}{index}>", value.replace("'", "''") if kind == "s" else value)
+    return sql
+
+
+class SQLPlanCache:
+    """Map questions and question templates to SQL, LRU bounded."""
+
+    def __init__(self, path: Path | None = None, *, max_entries: int | None = None) -> None:
+        self.path = path or settings.sql_plan_cache_path
+        self.max_entries = max_entries or settings.sql_plan_cache_max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " key TEXT PRIMARY KEY,"
+            " sql TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_lru ON plans (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(schema_version: str, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{schema_version}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT sql FROM plans WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE plans SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return row[0]
+
+    # ------------------------------------------------------------------
+    def lookup(self, question: str, *, schema_version: str) -> Tuple[str | None, str]:
+        """Return ``(sql, how)`` where ``how`` is ``exact``, ``template`` or ``miss``."""
+
+        template, literals = parameterise(question)
+        with self._lock:
+            sql = self._get(self._key(schema_version, "exact", normalise_question(question)))
+            if sql is not None:
+                return sql, "exact"
+            if literals:
+                plan = self._get(self._key(schema_version, TEMPLATE_KIND, template))
+                if plan is not None:
+                    return fill_template(plan, literals), "template"
+        return None, "miss"
+
+    def store(self, question: str, sql: str, *, schema_version: str) -> None:
+        """Record SQL that executed successfully for ``question``."""
+
+        template, literals = parameterise(question)
+        now = time.time()
+        rows = [(self._key(schema_version, "exact", normalise_question(question)), sql, now)]
+        plan = sql_template(sql, literals) if literals else None
+        if plan is not None:
+            rows.append((self._key(schema_version, TEMPLATE_KIND, template), plan, now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO plans (key, sql, last_used) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET sql = excluded.sql, last_used = excluded.last_used",
+                rows,
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM plans WHERE key IN (SELECT key FROM plans ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
@@ -0,0 +1,75 @@
+"""Vector store interface and backend selection."""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Iterator, List, Protocol, Sequence, Tuple
+
+from ..config import settings
+from ..metadata import RetrievalFilter
+from .milvus_client import MilvusDocument
+
+LOGGER = logging.getLogger(__name__)
+
+
+class VectorStore(Protocol):
+    """Surface shared by :class:`MilvusVectorStore` and :class:`LocalVectorStore`."""
+
+    manifest_path: Path
+    """Where ingestion records which files this store holds."""
+
+    def add_embeddings(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        chunks: Sequence[str],
+        metadatas: Sequence[dict],
+        *,
+        flush: bool = True,
+    ) -> List[int]: ...
+
+    def flush(self) -> None: ...
+
+    def delete(self, ids: Sequence[int]) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def query(
+        self,
+        embedding: Sequence[float],
+        top_k: int,
+        *,
+        filters: RetrievalFilter | None = None,
+    ) -> List[MilvusDocument]: ...
+
+    def iter_documents(self) -> Iterator[Tuple[int, str, dict]]: ...
+
+    @property
+    def is_empty(self) -> bool: ...
+
+
+def create_vector_store(backend: str | None = None) -> VectorStore:
+    """Instantiate the vector store selected by ``settings.vector_store``.
+
+    ``milvus`` and ``local`` force a backend; ``auto`` tries Milvus and falls
+    back to the embedded local index when the server is unreachable.
+    """
+
+    backend = backend or settings.vector_store
+    if backend == "local":
+        from .local_vector_store import LocalVectorStore
+
+        return LocalVectorStore()
+    if backend not in ("milvus", "auto"):
+        raise ValueError(f"Unknown vector store backend {backend!r}; expected 'milvus', 'local' or 'auto'")
+    from .milvus_client import MilvusVectorStore
+
+    try:
+        return MilvusVectorStore()
+    except Exception:
+        if backend == "milvus":
+            raise
+        LOGGER.warning("Milvus unavailable at %s; using the local vector index instead", settings.milvus_uri)
+        from .local_vector_store import LocalVectorStore
+
+        return LocalVectorStore()
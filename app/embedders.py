@@ -0,0 +1,155 @@
+"""Pluggable sentence-embedding backends.
+
+``settings.embedding_backend`` selects how ``settings.embedding_model`` is
+executed:
+
+``torch``
+    The reference PyTorch ``SentenceTransformer`` model.
+``onnx``
+    The same weights exported to ONNX and run with ONNX Runtime.
+``onnx-int8``
+    The ONNX export with dynamically quantised int8 weights, roughly a quarter
+    of the float model's memory footprint.
+
+All backends must produce ``settings.milvus_dim`` dimensional vectors so they
+can share one index.  ``python -m app.embedders --backend onnx-int8`` compares
+a backend's retrieval against the float model on chunks from the corpus.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+from pathlib import Path
+from typing import List, Sequence
+
+from sentence_transformers import SentenceTransformer
+
+from .config import settings
+
+LOGGER = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _onnx_export_dir(model_name: str) -> Path:
+    return settings.embedding_onnx_dir / model_name.replace("/", "__")
+
+
+def _load_quantised(model_name: str) -> SentenceTransformer:
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_dir = _onnx_export_dir(model_name)
+    config = settings.embedding_quantization
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    if not (export_dir / file_name).exists():
+        LOGGER.info("Quantising %s to int8 (%s) under %s", model_name, config, export_dir)
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save(str(export_dir))
+        export_dynamic_quantized_onnx_model(model, config, str(export_dir))
+    return SentenceTransformer(str(export_dir), backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def load_embedder(backend: str | None = None, model_name: str | None = None) -> SentenceTransformer:
+    """Instantiate ``model_name`` with the requested execution backend."""
+
+    backend = backend or settings.embedding_backend
+    model_name = model_name or settings.embedding_model
+    LOGGER.info("Loading embedding model %s with %s backend", model_name, backend)
+    if backend == "torch":
+        model = SentenceTransformer(model_name)
+    elif backend == "onnx":
+        model = SentenceTransformer(model_name, backend="onnx")
+    elif backend == "onnx-int8":
+        model = _load_quantised(model_name)
+    else:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+    dim = model.get_sentence_embedding_dimension()
+    if dim != settings.milvus_dim:
+        raise ValueError(
+            f"Embedding model {model_name} produces {dim}-d vectors but the index expects {settings.milvus_dim}"
+        )
+    return model
+
+
+def embedder_id(backend: str | None = None, model_name: str | None = None) -> str:
+    """Identifier used to key cached vectors produced by a backend."""
+
+    backend = backend or settings.embedding_backend
+    model_name = model_name or settings.embedding_model
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+# ----------------------------------------------------------------------
+def compare_backends(
+    texts: Sequence[str],
+    queries: Sequence[str],
+    *,
+    candidate: str,
+    reference: str = "torch",
+    k: int = 10,
+) -> dict:
+    """Measure how well ``candidate`` reproduces ``reference`` retrieval.
+
+    Returns recall@k of the candidate's top-k against the reference top-k and
+    the mean cosine similarity between paired document vectors.
+    """
+
+    import numpy as np
+
+    def encode(backend: str, items: Sequence[str]) -> "np.ndarray":
+        model = load_embedder(backend)
+        return np.asarray(model.encode(list(items), normalize_embeddings=True, batch_size=32), dtype=np.float32)
+
+    ref_docs, ref_queries = encode(reference, texts), encode(reference, queries)
+    cand_docs, cand_queries = encode(candidate, texts), encode(candidate, queries)
+    k = min(k, len(texts))
+    ref_top = np.argsort(-(ref_queries @ ref_docs.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(cand_queries @ cand_docs.T), axis=1)[:, :k]
+    recalls = [len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]
+    return {
+        "reference": reference,
+        "candidate": candidate,
+        "documents": len(texts),
+        "queries": len(queries),
+        "k": k,
+        "recall_at_k": float(np.mean(recalls)),
+        "mean_vector_cosine": float(np.mean(np.sum(ref_docs * cand_docs, axis=1))),
+    }
+
+
+def _sample_corpus(sample: int, seed: int) -> List[str]:
+    from .ingest import discover_pdfs, extract_chunks
+
+    texts: List[str] = []
+    for path in discover_pdfs():
+        texts.extend(chunk.text for chunk in extract_chunks(path))
+    random.Random(seed).shuffle(texts)
+    return texts[:sample]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare an embedding backend against the float model.")
+    parser.add_argument("--backend", choices=BACKENDS, default="onnx-int8")
+    parser.add_argument("--reference", choices=BACKENDS, default="torch")
+    parser.add_argument("--sample", type=int, default=500, help="Number of corpus chunks to index.")
+    parser.add_argument("--queries", type=int, default=100, help="Number of chunk prefixes used as queries.")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    texts = _sample_corpus(args.sample, args.seed)
+    if not texts:
+        parser.error(f"No PDF text found under {settings.data_dir}")
+    # A chunk's opening sentence stands in for a user question about it.
+    queries = [text[:120] for text in texts[: args.queries]]
+    report = compare_backends(texts, queries, candidate=args.backend, reference=args.reference, k=args.k)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
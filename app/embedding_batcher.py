@@ -0,0 +1,122 @@
+"""Dynamic micro-batching of query embeddings.
+
+Concurrent ``/rag/query`` and agent ``rag_tool`` calls each need a single query
+vector.  Encoding them one at a time leaves most of the transformer's
+throughput unused on CPU, so :class:`EmbeddingBatcher` queues requests, waits
+up to ``max_wait_ms`` for more to arrive and encodes up to ``max_batch_size``
+texts in one forward pass.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Sequence
+
+from .metrics import REGISTRY
+
+LOGGER = logging.getLogger(__name__)
+
+QUEUE_DEPTH = REGISTRY.gauge("edupolicy_embedding_queue_depth", "Query embedding requests waiting to be batched.")
+BATCH_SIZE = REGISTRY.histogram(
+    "edupolicy_embedding_batch_size",
+    "Number of texts encoded per micro-batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "edupolicy_embedding_queue_wait_seconds", "Time a query spent queued before its batch started encoding."
+)
+ENCODE_LATENCY = REGISTRY.histogram(
+    "edupolicy_embedding_encode_seconds", "Wall-clock time spent encoding one micro-batch."
+)
+
+
+@dataclass
+class _Request:
+    text: str
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class EmbeddingBatcher:
+    """Collect concurrent embedding requests and encode them as one batch."""
+
+    def __init__(
+        self,
+        encode: Callable[[Sequence[str]], List[List[float]]],
+        *,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def submit(self, text: str) -> Future:
+        """Enqueue ``text`` and return a future resolving to its vector."""
+
+        self._ensure_worker()
+        request = _Request(text=text)
+        self._queue.put(request)
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return request.future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    # ------------------------------------------------------------------
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for request in batch:
+                QUEUE_WAIT.observe(started - request.enqueued_at)
+            # Identical concurrent questions are encoded once.
+            unique: Dict[str, int] = {}
+            for request in batch:
+                unique.setdefault(request.text, len(unique))
+            try:
+                vectors = self._encode(list(unique))
+            except Exception as exc:  # pragma: no cover - propagated to every caller
+                LOGGER.exception("Embedding batch of %s texts failed", len(unique))
+                for request in batch:
+                    request.future.set_exception(exc)
+                continue
+            BATCH_SIZE.observe(len(unique))
+            ENCODE_LATENCY.observe(time.perf_counter() - started)
+            for request in batch:
+                request.future.set_result(vectors[unique[request.text]])
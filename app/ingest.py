@@ -0,0 +1,457 @@
+"""Corpus ingestion pipeline for the regulation PDFs stored under ``data/``.
+
+PDF parsing is CPU bound and PyPDF2 is pure Python, so page extraction and
+chunking run in a process pool while the parent process embeds finished
+documents in batches and streams them into the vector store.
+
+Ingestion is incremental: an :class:`IngestionManifest` persisted next to the
+exported embeddings records, for every PDF, its content hash, mtime and the
+hash and vector id of each chunk.  Only new or modified files are re-extracted,
+chunks whose text and metadata did not change keep their vectors, and vectors
+belonging to deleted files are removed.  Whenever the vector store changes, a
+BM25 index over the same chunks is rebuilt alongside it for hybrid retrieval.
+
+The pipeline can run as a standalone job (``python -m app.ingest``) or as a
+background thread inside the API process; either way :data:`ingestion_status`
+tracks progress so ``/health`` can report index readiness.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import settings
+from .db.bm25_index import BM25Index, bm25_index_path
+from .db.vector_store import VectorStore, create_vector_store
+from .embedders import embedder_id
+from .metadata import extract_attributes
+from .utils import DocumentChunk, chunk_text, embed_texts, load_pdf_pages
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+LOGGER = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 2
+
+
+def discover_pdfs(data_dir: Path | None = None) -> List[Path]:
+    """Return every PDF below ``data_dir`` in a stable order."""
+
+    root = data_dir or settings.data_dir
+    return sorted(path for path in root.rglob("*") if path.is_file() and path.suffix.lower() == ".pdf")
+
+
+def source_name(pdf_path: Path, data_dir: Path | None = None) -> str:
+    """Return the identifier stored as ``source`` metadata for ``pdf_path``."""
+
+    try:
+        return pdf_path.relative_to(data_dir or settings.data_dir).as_posix()
+    except ValueError:
+        return pdf_path.name
+
+
+def extract_chunks(pdf_path: Path, data_dir: Path | None = None) -> List[DocumentChunk]:
+    """Extract and chunk a single PDF page by page.
+
+    Defined at module level so it can be pickled into worker processes.
+    """
+
+    source = source_name(pdf_path, data_dir)
+    pages = load_pdf_pages(pdf_path)
+    attributes = extract_attributes(source, pages[0] if pages else "")
+    chunks: List[DocumentChunk] = []
+    for page_number, page_text in enumerate(pages, start=1):
+        if not page_text.strip():
+            continue
+        chunks.extend(chunk_text(page_text, metadata={"source": source, "page": page_number, **attributes}))
+    return chunks
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(chunk: DocumentChunk) -> str:
+    """Hash a chunk's text together with its metadata."""
+
+    payload = json.dumps({"text": chunk.text, "metadata": chunk.metadata}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------------------------------------------------------
+@dataclass
+class FileRecord:
+    """Manifest entry for one ingested PDF."""
+
+    sha256: str
+    mtime: float
+    size: int
+    chunks: Dict[str, int] = field(default_factory=dict)
+    """Mapping of chunk hash to vector store primary key."""
+
+
+class IngestionManifest:
+    """JSON manifest describing what is currently indexed in the vector store."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Model and backend: vectors from different backends are not interchangeable.
+        self.embedder = embedder_id()
+        self.files: Dict[str, FileRecord] = {}
+        self.exists = self.path.exists()
+        if self.exists:
+            self._load()
+
+    def _load(self) -> None:
+        with self.path.open("r", encoding="utf-8") as file:
+            payload = json.load(file)
+        # Manifests written before the backend was recorded hold only the model name,
+        # which equals the id of the torch backend.
+        embedder = payload.get("embedder", payload.get("embedding_model"))
+        if payload.get("version") != MANIFEST_VERSION or embedder != self.embedder:
+            LOGGER.info("Ingestion manifest at %s is stale; a full rebuild is required", self.path)
+            self.exists = False
+            return
+        self.files = {source: FileRecord(**record) for source, record in payload.get("files", {}).items()}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "embedder": self.embedder,
+            "files": {source: record.__dict__ for source, record in sorted(self.files.items())},
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as file:
+            json.dump(payload, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+
+def corpus_version(manifest_path: Path) -> str:
+    """Fingerprint of the indexed corpus; changes whenever ingestion saves the manifest."""
+
+    try:
+        return hashlib.sha1(manifest_path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return ""
+
+
+def build_sparse_index(vector_store: VectorStore, path: Path) -> BM25Index:
+    """Rebuild the BM25 index from everything currently in ``vector_store``."""
+
+    index = BM25Index.build(vector_store.iter_documents())
+    index.save(path)
+    LOGGER.info("BM25 index rebuilt: %s chunks, %s terms", len(index.doc_ids), len(index.terms))
+    return index
+
+
+# ----------------------------------------------------------------------
+@dataclass
+class _PendingFile:
+    record: FileRecord
+    previous: Dict[str, int]
+    remaining: int = 0
+
+
+def _plan_changes(
+    manifest: IngestionManifest, pdf_paths: Sequence[Path], root: Path
+) -> Tuple[Dict[str, Tuple[Path, FileRecord]], List[str], bool]:
+    """Return files needing extraction, sources that disappeared and whether
+    any unchanged record had its mtime refreshed."""
+
+    changed: Dict[str, Tuple[Path, FileRecord]] = {}
+    seen = set()
+    touched = False
+    for path in pdf_paths:
+        source = source_name(path, root)
+        seen.add(source)
+        stat = path.stat()
+        record = manifest.files.get(source)
+        if record and record.mtime == stat.st_mtime and record.size == stat.st_size:
+            continue
+        digest = file_sha256(path)
+        if record and record.sha256 == digest:
+            record.mtime, record.size = stat.st_mtime, stat.st_size
+            touched = True
+            continue
+        changed[source] = (path, FileRecord(sha256=digest, mtime=stat.st_mtime, size=stat.st_size))
+    removed = [source for source in manifest.files if source not in seen]
+    return changed, removed, touched
+
+
+def ingest_corpus(
+    vector_store: VectorStore,
+    *,
+    data_dir: Path | None = None,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    manifest_path: Path | None = None,
+) -> int:
+    """Synchronise the vector store with the PDFs in ``data_dir``.
+
+    Returns the number of chunks that had to be embedded.
+    """
+
+    root = data_dir or settings.data_dir
+    manifest = IngestionManifest(manifest_path or vector_store.manifest_path)
+    if not manifest.exists and not vector_store.is_empty:
+        LOGGER.warning("Vector store has no valid ingestion manifest; rebuilding the index from scratch")
+        vector_store.clear()
+        manifest.files = {}
+    elif manifest.files and vector_store.is_empty:
+        LOGGER.warning("Ingestion manifest lists indexed files but the vector store is empty; re-ingesting")
+        manifest.files = {}
+
+    pdf_paths = discover_pdfs(root)
+    changed, removed, touched = _plan_changes(manifest, pdf_paths, root)
+    for source in removed:
+        LOGGER.info("Removing vectors for deleted file %s", source)
+        vector_store.delete(list(manifest.files.pop(source).chunks.values()))
+    sparse_path = bm25_index_path(manifest.path)
+    if not changed:
+        if removed or touched or not manifest.exists:
+            manifest.save()
+        if removed or not sparse_path.exists():
+            build_sparse_index(vector_store, sparse_path)
+        LOGGER.info("Index up to date: %s files, nothing to ingest", len(pdf_paths))
+        return 0
+
+    workers = workers or settings.ingest_workers or os.cpu_count() or 1
+    batch_size = batch_size or settings.ingest_batch_size
+    LOGGER.info(
+        "Ingesting %s new or modified PDF files (%s unchanged) with %s worker processes",
+        len(changed),
+        len(pdf_paths) - len(changed),
+        workers,
+    )
+
+    pending_files: Dict[str, _PendingFile] = {}
+    pending: List[Tuple[str, str, DocumentChunk]] = []
+    total = 0
+
+    def finalise(source: str) -> None:
+        state = pending_files.pop(source)
+        stale = [pk for digest, pk in state.previous.items() if digest not in state.record.chunks]
+        vector_store.delete(stale)
+        manifest.files[source] = state.record
+        manifest.save()
+
+    def flush(batch: List[Tuple[str, str, DocumentChunk]]) -> None:
+        texts = [chunk.text for _, _, chunk in batch]
+        ids = vector_store.add_embeddings(
+            embeddings=embed_texts(texts),
+            chunks=texts,
+            metadatas=[chunk.metadata for _, _, chunk in batch],
+            flush=False,
+        )
+        finished = []
+        for (source, digest, _), pk in zip(batch, ids):
+            state = pending_files[source]
+            state.record.chunks[digest] = pk
+            state.remaining -= 1
+            if state.remaining == 0:
+                finished.append(source)
+        if finished:
+            vector_store.flush()
+            for source in finished:
+                finalise(source)
+
+    try:
+        # ``spawn`` keeps workers safe when ingestion runs in a thread of the API process.
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(changed)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = {executor.submit(extract_chunks, path, root): source for source, (path, _) in changed.items()}
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    chunks = future.result()
+                except Exception:  # pragma: no cover - corrupt PDFs should not abort the run
+                    LOGGER.exception("Failed to extract text from %s", changed[source][0])
+                    continue
+                previous = manifest.files[source].chunks if source in manifest.files else {}
+                state = _PendingFile(record=changed[source][1], previous=previous)
+                pending_files[source] = state
+                for chunk in chunks:
+                    digest = chunk_hash(chunk)
+                    if digest in state.record.chunks:
+                        continue
+                    if digest in previous:
+                        state.record.chunks[digest] = previous[digest]
+                        continue
+                    state.remaining += 1
+                    pending.append((source, digest, chunk))
+                LOGGER.debug("%s: %s chunks, %s to embed", source, len(chunks), state.remaining)
+                if state.remaining == 0:
+                    finalise(source)
+                while len(pending) >= batch_size:
+                    flush(pending[:batch_size])
+                    total += batch_size
+                    del pending[:batch_size]
+        if pending:
+            flush(pending)
+            total += len(pending)
+    except BaseException:
+        # Vectors of files that never reached ``finalise`` are unknown to the
+        # manifest; the next run would insert them again as duplicates.
+        orphaned = []
+        for state in pending_files.values():
+            reused = set(state.previous.values())
+            orphaned.extend(pk for pk in state.record.chunks.values() if pk not in reused)
+        if orphaned:
+            LOGGER.warning("Ingestion failed; removing %s vectors of unfinished files", len(orphaned))
+            try:
+                # Staged inserts must be persisted before they can be deleted.
+                vector_store.flush()
+                vector_store.delete(orphaned)
+            except Exception:  # pragma: no cover - keep the original error
+                LOGGER.exception("Unable to remove vectors of unfinished files")
+        raise
+    build_sparse_index(vector_store, sparse_path)
+    LOGGER.info("Ingestion complete: embedded %s chunks from %s files", total, len(changed))
+    return total
+
+
+# ----------------------------------------------------------------------
+@dataclass
+class IngestionStatus:
+    """Progress of the most recent ingestion run in this process."""
+
+    state: str = "idle"
+    """One of ``idle``, ``running``, ``ready`` or ``failed``."""
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    embedded_chunks: int = 0
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+ingestion_status = IngestionStatus()
+_ingestion_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _process_lock(path: Path) -> Iterator[bool]:
+    """Hold an exclusive lock on ``path`` across processes, yielding ``False`` if another process has it.
+
+    API workers and a separate ``python -m app.ingest`` job share the manifest
+    and the vector store, so only one of them may ingest at a time.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a+b") as handle:
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:  # pragma: no cover - Windows
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def run_ingestion(vector_store: VectorStore, **kwargs) -> int:
+    """Run :func:`ingest_corpus` while updating :data:`ingestion_status`.
+
+    Skipped (returning 0) while another thread or process is ingesting.
+    """
+
+    if not _ingestion_lock.acquire(blocking=False):
+        LOGGER.info("Ingestion already running; skipping duplicate request")
+        return 0
+    manifest_path = kwargs.get("manifest_path") or vector_store.manifest_path
+    try:
+        with _process_lock(manifest_path.with_suffix(".lock")) as acquired:
+            if not acquired:
+                LOGGER.info("Ingestion is running in another process; skipping")
+                return 0
+            return _run_ingestion_locked(vector_store, **kwargs)
+    finally:
+        _ingestion_lock.release()
+
+
+def _run_ingestion_locked(vector_store: VectorStore, **kwargs) -> int:
+    ingestion_status.state = "running"
+    ingestion_status.started_at = time.time()
+    ingestion_status.finished_at = None
+    ingestion_status.error = None
+    try:
+        ingestion_status.embedded_chunks = ingest_corpus(vector_store, **kwargs)
+        ingestion_status.state = "ready"
+        return ingestion_status.embedded_chunks
+    except Exception as exc:
+        LOGGER.exception("Ingestion failed")
+        ingestion_status.state = "failed"
+        ingestion_status.error = str(exc)
+        raise
+    finally:
+        ingestion_status.finished_at = time.time()
+
+
+def start_background_ingestion(vector_store: VectorStore, **kwargs) -> threading.Thread:
+    """Run ingestion in a daemon thread so the API can serve traffic meanwhile."""
+
+    def target() -> None:
+        try:
+            run_ingestion(vector_store, **kwargs)
+        except Exception:  # pragma: no cover - already logged and recorded in the status
+            pass
+
+    thread = threading.Thread(target=target, name="corpus-ingestion", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Index the regulation PDFs under data/ into the vector store.")
+    parser.add_argument("--data-dir", type=Path, default=None, help="Directory scanned for PDFs.")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes.")
+    parser.add_argument("--batch-size", type=int, default=None, help="Chunks embedded per batch.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if settings.enable_debug_logging else logging.INFO)
+    vector_store = create_vector_store()
+    embedded = run_ingestion(
+        vector_store,
+        data_dir=args.data_dir,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    print(f"Embedded {embedded} chunks.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
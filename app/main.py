@@ -2,13 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from .agents.controller import AgentController
+from .agents.streaming import format_sse
+from .agents.tools.web_tool import NOT_CONFIGURED_MESSAGE, WebSearchError
+from .batch import run_batch
+from .config import settings
+from .ingest import ingestion_status
+from .metadata import RetrievalFilter
+from .metrics import REGISTRY
+from .resilience import CircuitOpenError
 from .schemas import (
+    BatchChatRequest,
     ChatRequest,
     ChatResponse,
     HealthResponse,
@@ -43,36 +54,112 @@ async def startup_event() -> None:
         except Exception as exc:  # pragma: no cover - ensures informative logs during startup
             LOGGER.exception("Failed to initialise AgentController")
             raise
+        mode = settings.ingest_on_startup
+        if mode == "background":
+            controller.rag_tool.start_ingestion(background=True)
+        elif mode == "blocking":
+            controller.rag_tool.start_ingestion(background=False)
+        elif mode != "off":
+            LOGGER.warning("Unknown INGEST_ON_STARTUP value %r; skipping ingestion", mode)
 
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check() -> HealthResponse:
-    """Simple health check endpoint."""
+    """Liveness probe that also reports whether the RAG index is ready."""
 
-    return HealthResponse(status="ok")
+    controller: AgentController = globals().get("controller")  # type: ignore[assignment]
+    if not controller:
+        return HealthResponse(status="starting")
+    index_ready = await asyncio.to_thread(lambda: controller.rag_tool.index_ready)
+    return HealthResponse(
+        status="ok",
+        index_ready=index_ready,
+        ingestion=ingestion_status.as_dict(),
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Expose process metrics in Prometheus text format."""
+
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest) -> ChatResponse:
+async def chat_endpoint(request: ChatRequest) -> ChatResponse | StreamingResponse:
     """Main chat endpoint bridging the UI and the agent."""
 
     controller: AgentController = globals().get("controller")  # type: ignore[assignment]
     if not controller:
         raise HTTPException(status_code=503, detail="Agent controller not initialised")
+    if request.stream:
+        return _stream_chat(controller, request)
     try:
-        response = controller.chat(request.session_id, request.message)
+        response = await controller.achat(request.session_id, request.message, include_timings=request.include_timings)
     except Exception as exc:  # pragma: no cover - surfaces agent errors
         LOGGER.exception("Agent execution failed")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
     return response
 
 
+def _stream_chat(controller: AgentController, request: ChatRequest) -> StreamingResponse:
+    async def events():
+        async for event in controller.astream_chat(
+            request.session_id, request.message, include_timings=request.include_timings
+        ):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest) -> StreamingResponse:
+    """Stream agent steps and answer tokens as Server-Sent Events.
+
+    Events: ``tool_start``, ``tool_end``, ``token``, then ``final`` (the full
+    :class:`ChatResponse`) or ``error``.
+    """
+
+    controller: AgentController = globals().get("controller")  # type: ignore[assignment]
+    if not controller:
+        raise HTTPException(status_code=503, detail="Agent controller not initialised")
+    return _stream_chat(controller, request)
+
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: BatchChatRequest) -> StreamingResponse:
+    """Answer many questions with bounded concurrency, streaming JSON lines.
+
+    Each line is a :class:`BatchChatResult`, written as soon as its item
+    finishes, so lines arrive in completion order rather than input order.
+    """
+
+    controller: AgentController = globals().get("controller")  # type: ignore[assignment]
+    if not controller:
+        raise HTTPException(status_code=503, detail="Agent controller not initialised")
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.batch_max_items} items per batch")
+
+    async def lines():
+        async for result in run_batch(
+            controller, request.items, concurrency=request.concurrency, include_timings=request.include_timings
+        ):
+            yield result.json(ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @app.post("/rag/query", response_model=ToolResponse)
 async def rag_query(request: RAGQueryRequest) -> ToolResponse:
     controller: AgentController = globals().get("controller")  # type: ignore[assignment]
     if not controller:
         raise HTTPException(status_code=503, detail="Agent controller not initialised")
-    context, snippets = controller.rag_query(request.query, top_k=request.top_k)
+    filters = RetrievalFilter(**request.filters.dict()) if request.filters else None
+    context, snippets = await controller.arag_query(request.query, top_k=request.top_k, filters=filters)
     return ToolResponse(result=context, source="rag_tool", context=snippets)
 
 
@@ -81,7 +168,7 @@ async def sql_query(request: SQLQueryRequest) -> ToolResponse:
     controller: AgentController = globals().get("controller")  # type: ignore[assignment]
     if not controller:
         raise HTTPException(status_code=503, detail="Agent controller not initialised")
-    result = controller.sql_tool.query_sql(request.question)
+    result = await controller.sql_tool.aquery_sql(request.question)
     return ToolResponse(result=result, source="sql_tool")
 
 
@@ -90,5 +177,12 @@ async def web_query(request: WebQueryRequest) -> ToolResponse:
     controller: AgentController = globals().get("controller")  # type: ignore[assignment]
     if not controller:
         raise HTTPException(status_code=503, detail="Agent controller not initialised")
-    result = controller.web_tool.search_web(request.query, max_results=request.max_results)
-    return ToolResponse(result=result, source="web_tool")
+    if not controller.web_tool.configured:
+        raise HTTPException(status_code=503, detail=NOT_CONFIGURED_MESSAGE)
+    try:
+        response = await controller.web_tool.asearch(request.query, max_results=request.max_results)
+    except CircuitOpenError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    except WebSearchError as exc:
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
+    return ToolResponse(result=controller.web_tool.format_results(response), source="web_tool")
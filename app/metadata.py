@@ -0,0 +1,156 @@
+"""Structured document attributes and retrieval filters.
+
+Regulation filenames (and first pages) encode who a document applies to:
+program level (đại học / thạc sĩ / tiến sĩ), the academic term of a Hội đồng
+học vụ conclusion, and the student cohorts in scope ("khoá 2022 trở về sau").
+:func:`extract_attributes` turns these into scalar fields stored alongside each
+chunk so searches can be narrowed before ranking.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+COHORT_MIN = 0
+COHORT_MAX = 9999
+PROGRAM_LEVELS = ("dai_hoc", "thac_si", "tien_si")
+
+_YEAR_RANGE_RE = re.compile(r"(20\d{2})\s*-\s*(20\d{2})")
+_SEMESTER_RE = re.compile(r"hoc ky\s*(\d)(?!\d)")
+_SEMESTER_CODE_RE = re.compile(r"hoc ky\s*(\d{2})(\d)(?!\d)")
+_COHORT_RE = re.compile(r"khoa\s+((?:20\d{2}\s*,\s*)*20\d{2})(\s*tro (?:ve )?(sau|truoc|di))?")
+
+
+def fold_diacritics(text: str) -> str:
+    """Lower-case ``text`` and strip Vietnamese diacritics."""
+
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if unicodedata.category(char) != "Mn")
+
+
+def _program_level(folded: str) -> str:
+    doctoral = "tien si" in folded
+    masters = "thac si" in folded or "cao hoc" in folded
+    if doctoral and not masters:
+        return "tien_si"
+    if masters and not doctoral:
+        return "thac_si"
+    if not doctoral and not masters and "dai hoc" in folded and "sau dai hoc" not in folded:
+        return "dai_hoc"
+    return ""
+
+
+def _attributes_from(folded: str) -> dict:
+    attributes: dict = {}
+    level = _program_level(folded)
+    if level:
+        attributes["program_level"] = level
+    code = _SEMESTER_CODE_RE.search(folded)
+    if code:
+        year = 2000 + int(code.group(1))
+        attributes["academic_year"] = f"{year}-{year + 1}"
+        attributes["semester"] = int(code.group(2))
+    else:
+        semester = _SEMESTER_RE.search(folded)
+        if semester:
+            attributes["semester"] = int(semester.group(1))
+        years = _YEAR_RANGE_RE.search(folded)
+        if years:
+            attributes["academic_year"] = f"{years.group(1)}-{years.group(2)}"
+    cohort = _COHORT_RE.search(folded)
+    if cohort:
+        cohorts = [int(year) for year in re.findall(r"20\d{2}", cohort.group(1))]
+        direction = cohort.group(3)
+        attributes["cohort_from"] = COHORT_MIN if direction == "truoc" else min(cohorts)
+        attributes["cohort_to"] = COHORT_MAX if direction in ("sau", "di") else max(cohorts)
+    return attributes
+
+
+def extract_attributes(source: str, first_page: str = "") -> dict:
+    """Derive filterable attributes for a document.
+
+    The filename is authoritative; the first page only fills attributes the
+    filename does not mention.
+    """
+
+    from_text = _attributes_from(fold_diacritics(first_page[:2000]))
+    from_name = _attributes_from(fold_diacritics(source))
+    attributes = {
+        "program_level": "",
+        "academic_year": "",
+        "semester": 0,
+        "cohort_from": COHORT_MIN,
+        "cohort_to": COHORT_MAX,
+    }
+    attributes.update(from_text)
+    attributes.update(from_name)
+    return attributes
+
+
+# ----------------------------------------------------------------------
+def metadata_columns(metadatas: Sequence[dict]) -> Dict[str, np.ndarray]:
+    """Columnar view of chunk attributes used to evaluate filters quickly."""
+
+    return {
+        "source": np.asarray([m.get("source", "") for m in metadatas], dtype=object),
+        "program_level": np.asarray([m.get("program_level", "") for m in metadatas], dtype=object),
+        "academic_year": np.asarray([m.get("academic_year", "") for m in metadatas], dtype=object),
+        "semester": np.asarray([m.get("semester", 0) for m in metadatas], dtype=np.int64),
+        "cohort_from": np.asarray([m.get("cohort_from", COHORT_MIN) for m in metadatas], dtype=np.int64),
+        "cohort_to": np.asarray([m.get("cohort_to", COHORT_MAX) for m in metadatas], dtype=np.int64),
+    }
+
+
+@dataclass
+class RetrievalFilter:
+    """Restrict retrieval to matching chunks.
+
+    ``program_level`` also admits documents that apply to every level;
+    ``cohort`` matches documents whose cohort range contains it.  All other
+    fields are exact matches.
+    """
+
+    source: Optional[str] = None
+    program_level: Optional[str] = None
+    academic_year: Optional[str] = None
+    semester: Optional[int] = None
+    cohort: Optional[int] = None
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in self.__dict__.values())
+
+    def to_milvus_expr(self) -> str:
+        clauses: List[str] = []
+        if self.source is not None:
+            clauses.append(f"source == {json.dumps(self.source, ensure_ascii=False)}")
+        if self.program_level is not None:
+            clauses.append(f'program_level in [{json.dumps(self.program_level)}, ""]')
+        if self.academic_year is not None:
+            clauses.append(f"academic_year == {json.dumps(self.academic_year)}")
+        if self.semester is not None:
+            clauses.append(f"semester == {int(self.semester)}")
+        if self.cohort is not None:
+            clauses.append(f"cohort_from <= {int(self.cohort)} and cohort_to >= {int(self.cohort)}")
+        return " and ".join(clauses)
+
+    def mask(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        size = len(columns["source"])
+        keep = np.ones(size, dtype=bool)
+        if self.source is not None:
+            keep &= columns["source"] == self.source
+        if self.program_level is not None:
+            keep &= (columns["program_level"] == self.program_level) | (columns["program_level"] == "")
+        if self.academic_year is not None:
+            keep &= columns["academic_year"] == self.academic_year
+        if self.semester is not None:
+            keep &= columns["semester"] == self.semester
+        if self.cohort is not None:
+            keep &= (columns["cohort_from"] <= self.cohort) & (columns["cohort_to"] >= self.cohort)
+        return keep
@@ -0,0 +1,216 @@
+"""Cross-encoder reranking of retrieved chunks.
+
+Dense and BM25 retrieval often place the passage that answers a question
+outside the top few results, and the agent then spends extra ``rag_tool``
+calls looking for it.  When ``settings.rerank_enabled`` is set, retrieval
+over-fetches ``rerank_candidates`` chunks and :class:`Reranker` scores every
+``(query, chunk)`` pair with a small cross-encoder in one batched forward
+pass before the top ``k`` are kept.
+
+Scores are cached per query and chunk id, so only new pairs reach the model.
+Scoring runs on a dedicated worker thread and must finish within
+``rerank_budget_ms``; at most ``rerank_max_pending`` jobs wait for the worker.
+The retrieval order is returned unchanged when scoring misses the budget
+(the job is cancelled if it has not started; a running job completes and
+caches its scores for the next request), when the queue is full, or when the
+model fails.  After the model fails to load, loading is retried at most every
+``MODEL_RETRY_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import threading
+import time
+from typing import Hashable, List, Sequence, Set
+
+from .caching import TTLCache
+from .config import settings
+from .db.embedding_cache import normalise_text
+from .db.milvus_client import MilvusDocument
+from .metrics import REGISTRY
+from .tracing import span
+
+LOGGER = logging.getLogger(__name__)
+
+MODEL_RETRY_SECONDS = 300.0
+
+RERANKS = REGISTRY.counter(
+    "edupolicy_rerank_total", "Rerank requests by outcome (reranked, cached, busy or fallback).", ["outcome"]
+)
+SCORED_PAIRS = REGISTRY.histogram(
+    "edupolicy_rerank_scored_pairs",
+    "Query/chunk pairs sent to the cross-encoder per request (cache misses).",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+SCORE_LATENCY = REGISTRY.histogram("edupolicy_rerank_score_seconds", "Cross-encoder scoring time per batch.")
+
+
+def load_cross_encoder(model_name: str | None = None):
+    """Instantiate the cross-encoder named by ``settings.rerank_model``."""
+
+    from sentence_transformers import CrossEncoder
+
+    model_name = model_name or settings.rerank_model
+    LOGGER.info("Loading rerank model %s", model_name)
+    return CrossEncoder(model_name, max_length=settings.rerank_max_length, device="cpu")
+
+
+class Reranker:
+    """Reorder retrieved documents by cross-encoder relevance within a latency budget."""
+
+    def __init__(
+        self,
+        model=None,
+        *,
+        budget_ms: float | None = None,
+        batch_size: int | None = None,
+        cache_max_entries: int | None = None,
+    ) -> None:
+        self.budget = (settings.rerank_budget_ms if budget_ms is None else budget_ms) / 1000.0
+        self.batch_size = batch_size or settings.rerank_batch_size
+        self.scores: TTLCache[float] = TTLCache(
+            max_entries=cache_max_entries or settings.rerank_cache_max_entries,
+            ttl_seconds=settings.rerank_cache_ttl_seconds,
+        )
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._load_failed_at: float | None = None
+        # One worker: concurrent forward passes would only contend for the CPU.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self.max_pending = settings.rerank_max_pending
+        self._pending: Set[concurrent.futures.Future] = set()
+        self._pending_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                if self._load_failed_at is not None and time.monotonic() - self._load_failed_at < MODEL_RETRY_SECONDS:
+                    raise RuntimeError("rerank model unavailable after a failed load")
+                try:
+                    self._model = load_cross_encoder()
+                except Exception:
+                    self._load_failed_at = time.monotonic()
+                    LOGGER.exception("Unable to load the rerank model; retrying in %.0f s", MODEL_RETRY_SECONDS)
+                    raise
+                self._load_failed_at = None
+            return self._model
+
+    def _submit(self, fn, *args) -> concurrent.futures.Future | None:
+        """Queue ``fn`` on the worker, or return ``None`` when ``max_pending`` jobs are unfinished.
+
+        The bound keeps a slow model from building a backlog that every later
+        request would wait behind.
+        """
+
+        with self._pending_lock:
+            self._pending = {future for future in self._pending if not future.done()}
+            if len(self._pending) >= self.max_pending:
+                return None
+            future = self._executor.submit(fn, *args)
+            self._pending.add(future)
+            return future
+
+    @staticmethod
+    def _key(query: str, document: MilvusDocument) -> Hashable:
+        chunk = document.id if document.id is not None else hashlib.sha1(document.text.encode("utf-8")).hexdigest()
+        return normalise_text(query).lower(), chunk
+
+    def _score(self, query: str, documents: Sequence[MilvusDocument]) -> List[float]:
+        """Return scores for ``documents``, scoring cache misses in one batch."""
+
+        keys = [self._key(query, document) for document in documents]
+        scores = [self.scores.get(key) for key in keys]
+        missing = [idx for idx, score in enumerate(scores) if score is None]
+        if missing:
+            model = self._get_model()
+            started = time.perf_counter()
+            predicted = model.predict(
+                [(query, documents[idx].text) for idx in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            SCORE_LATENCY.observe(time.perf_counter() - started)
+            SCORED_PAIRS.observe(len(missing))
+            for idx, score in zip(missing, predicted):
+                scores[idx] = float(score)
+                self.scores.set(keys[idx], float(score))
+        return scores
+
+    def _cached_scores(self, query: str, documents: Sequence[MilvusDocument]) -> List[float] | None:
+        scores = [self.scores.get(self._key(query, document)) for document in documents]
+        return None if any(score is None for score in scores) else scores
+
+    @staticmethod
+    def _ordered(documents: Sequence[MilvusDocument], scores: Sequence[float], top_k: int) -> List[MilvusDocument]:
+        ranked = sorted(zip(scores, range(len(documents))), key=lambda pair: pair[0], reverse=True)[:top_k]
+        return [
+            MilvusDocument(text=documents[idx].text, metadata=documents[idx].metadata, id=documents[idx].id, score=score)
+            for score, idx in ranked
+        ]
+
+    @staticmethod
+    def _fallback(documents: Sequence[MilvusDocument], top_k: int, *, outcome: str = "fallback") -> List[MilvusDocument]:
+        RERANKS.inc(outcome=outcome)
+        return list(documents[:top_k])
+
+    # ------------------------------------------------------------------
+    def rerank(self, query: str, documents: Sequence[MilvusDocument], *, top_k: int) -> List[MilvusDocument]:
+        """Return the ``top_k`` best of ``documents`` for ``query``."""
+
+        if len(documents) <= 1:
+            return list(documents[:top_k])
+        with span("rag.rerank"):
+            cached = self._cached_scores(query, documents)
+            if cached is not None:
+                RERANKS.inc(outcome="cached")
+                return self._ordered(documents, cached, top_k)
+            future = self._submit(self._score, query, documents)
+            if future is None:
+                return self._fallback(documents, top_k, outcome="busy")
+            try:
+                scores = future.result(timeout=self.budget)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                LOGGER.debug("Rerank exceeded %.0f ms; keeping retrieval order", self.budget * 1000)
+                return self._fallback(documents, top_k)
+            except Exception as exc:
+                LOGGER.warning("Rerank failed (%s); keeping retrieval order", exc)
+                return self._fallback(documents, top_k)
+            RERANKS.inc(outcome="reranked")
+            return self._ordered(documents, scores, top_k)
+
+    async def arerank(self, query: str, documents: Sequence[MilvusDocument], *, top_k: int) -> List[MilvusDocument]:
+        """Async variant of :meth:`rerank`; the event loop is never blocked."""
+
+        if len(documents) <= 1:
+            return list(documents[:top_k])
+        with span("rag.rerank"):
+            cached = self._cached_scores(query, documents)
+            if cached is not None:
+                RERANKS.inc(outcome="cached")
+                return self._ordered(documents, cached, top_k)
+            future = self._submit(self._score, query, documents)
+            if future is None:
+                return self._fallback(documents, top_k, outcome="busy")
+            try:
+                # Shielded so a job that already started still caches its scores.
+                scores = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=self.budget)
+            except asyncio.TimeoutError:
+                future.cancel()
+                LOGGER.debug("Rerank exceeded %.0f ms; keeping retrieval order", self.budget * 1000)
+                return self._fallback(documents, top_k)
+            except Exception as exc:
+                LOGGER.warning("Rerank failed (%s); keeping retrieval order", exc)
+                return self._fallback(documents, top_k)
+            RERANKS.inc(outcome="reranked")
+            return self._ordered(documents, scores, top_k)
+
+    def warm_up(self) -> None:
+        """Load the model on the worker thread so the first requests are not all fallbacks."""
+
+        self._submit(self._get_model)
@@ -0,0 +1,74 @@
+"""Circuit breaker for calls to external services."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from .metrics import REGISTRY
+
+LOGGER = logging.getLogger(__name__)
+
+BREAKER_STATE = REGISTRY.gauge(
+    "edupolicy_circuit_breaker_open", "1 while the circuit breaker for a dependency is open.", ["name"]
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures of a dependency.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    :meth:`check` raises :class:`CircuitOpenError` for ``reset_seconds``.
+    Then a single trial call is let through (half-open): success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, *, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, name=name)
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def check(self) -> None:
+        """Raise :class:`CircuitOpenError` unless a call may proceed."""
+
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpenError(f"{self.name} unavailable; retrying in {max(remaining, 0):.0f}s")
+            self._trial_running = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                LOGGER.info("Circuit for %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+            BREAKER_STATE.set(0, name=self.name)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_running
+            self._trial_running = False
+            if reopen or self._failures >= self.failure_threshold:
+                if self._opened_at is None or reopen:
+                    LOGGER.warning("Circuit for %s opened after %s failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+                BREAKER_STATE.set(1, name=self.name)
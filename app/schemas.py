@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -11,6 +11,8 @@ class HealthResponse(BaseModel):
     """Response model for health checks."""
 
     status: str = Field(..., description="Health status string")
+    index_ready: bool = Field(False, description="Whether the regulation index can serve RAG queries.")
+    ingestion: Optional[dict] = Field(default=None, description="State of the last ingestion run in this process.")
 
 
 class ChatMessage(BaseModel):
@@ -25,7 +27,8 @@ class ChatRequest(BaseModel):
 
     session_id: str = Field(..., description="Conversation identifier used for memory persistence.")
     message: str = Field(..., description="User prompt to send to the agent.")
-    stream: bool = Field(False, description="Whether to stream tokens (not yet implemented).")
+    stream: bool = Field(False, description="Stream agent steps and answer tokens as Server-Sent Events.")
+    include_timings: bool = Field(False, description="Attach a per-stage timing breakdown to the response.")
 
 
 class ToolResponse(BaseModel):
@@ -36,6 +39,19 @@ class ToolResponse(BaseModel):
     context: Optional[List[str]] = Field(default=None, description="Optional context snippets.")
 
 
+class ChatTimings(BaseModel):
+    """Where the time of one chat request went."""
+
+    total_ms: float
+    stages: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Milliseconds per stage; repeated stages are summed and nested or concurrent stages overlap.",
+    )
+    llm_calls: int = 0
+    prompt_tokens: int = Field(0, description="Reported by the provider, or estimated for streamed calls.")
+    completion_tokens: int = 0
+
+
 class ChatResponse(BaseModel):
     """Structured response from the agent orchestrator."""
 
@@ -43,11 +59,58 @@ class ChatResponse(BaseModel):
     session_id: str
     reasoning: List[str] = Field(default_factory=list, description="Agent reasoning trace.")
     tool_interactions: List[str] = Field(default_factory=list, description="Human readable view of tool usage.")
+    cached: bool = Field(False, description="Whether the answer was served from the semantic answer cache.")
+    timings: Optional[ChatTimings] = Field(default=None, description="Present when the request set include_timings.")
+
+
+class BatchChatItem(BaseModel):
+    """One question of a `/chat/batch` request."""
+
+    message: str
+    id: Optional[str] = Field(default=None, description="Caller's identifier, echoed in the result.")
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Defaults to a fresh session per item; items sharing a session run in input order.",
+    )
+
+
+class BatchChatRequest(BaseModel):
+    """Inbound request body for the `/chat/batch` endpoint."""
+
+    items: List[BatchChatItem] = Field(..., min_items=1)
+    concurrency: Optional[int] = Field(
+        default=None, ge=1, description="Items answered at once; defaults to BATCH_CONCURRENCY."
+    )
+    include_timings: bool = Field(True, description="Attach the per-stage timing breakdown to each response.")
+
+
+class BatchChatResult(BaseModel):
+    """One line of the `/chat/batch` JSONL stream."""
+
+    index: int = Field(..., description="Position of the item in the request.")
+    id: Optional[str] = None
+    session_id: str
+    elapsed_ms: float
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = Field(default=None, description="Set instead of response when the item failed.")
+
+
+class RAGFilters(BaseModel):
+    """Optional restrictions applied inside the vector and BM25 searches."""
+
+    source: Optional[str] = Field(default=None, description="Exact source file, relative to data/.")
+    program_level: Optional[Literal["dai_hoc", "thac_si", "tien_si"]] = Field(
+        default=None, description="Program level; documents applying to all levels are always included."
+    )
+    academic_year: Optional[str] = Field(default=None, description="Academic year such as '2023-2024'.")
+    semester: Optional[int] = Field(default=None, description="Semester number within the academic year.")
+    cohort: Optional[int] = Field(default=None, description="Student cohort (khoá) the document must apply to.")
 
 
 class RAGQueryRequest(BaseModel):
     query: str
     top_k: Optional[int] = Field(default=None)
+    filters: Optional[RAGFilters] = Field(default=None)
 
 
 class SQLQueryRequest(BaseModel):
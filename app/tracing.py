@@ -0,0 +1,192 @@
+"""Per-stage timing of the request pipeline.
+
+:func:`span` times one stage (``chat.history``, ``tool.sql_tool``,
+``sql.execute``, ``llm``, ...).  Every span feeds the
+``edupolicy_stage_seconds`` histogram served on ``/metrics``, and while a
+:func:`request_trace` is active the duration is also added to that request's
+:class:`RequestTrace`, which becomes the optional timing breakdown of a chat
+response.  The trace lives in a context variable, so it follows the request
+into tasks and ``asyncio.to_thread`` workers.
+
+When the ``opentelemetry-api`` package is installed spans are also reported
+to its global tracer; without a configured SDK that tracer is a no-op.
+
+:class:`LLMUsageCallback` is attached to the chat models and counts calls,
+latency and tokens, using the provider's reported usage when available and an
+estimate otherwise (streamed responses carry no usage).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, TypeVar
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.outputs import LLMResult
+
+from .metrics import REGISTRY
+
+try:  # pragma: no cover - optional dependency
+    from opentelemetry import trace as _otel_trace
+except ImportError:  # pragma: no cover - optional dependency
+    _otel_trace = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+STAGE_SECONDS = REGISTRY.histogram("edupolicy_stage_seconds", "Time spent in each pipeline stage.", ["stage"])
+LLM_CALLS = REGISTRY.counter("edupolicy_llm_calls_total", "LLM calls by outcome.", ["outcome"])
+LLM_TOKENS = REGISTRY.counter("edupolicy_llm_tokens_total", "LLM tokens by kind (prompt or completion).", ["kind"])
+
+_tracer = _otel_trace.get_tracer("edupolicy") if _otel_trace is not None else None
+_current: ContextVar["RequestTrace | None"] = ContextVar("edupolicy_request_trace", default=None)
+
+
+def _estimate_tokens(text: str) -> int:
+    # Same heuristic as ``utils.estimate_tokens``, which cannot be imported
+    # here because ``utils`` itself uses :func:`span`.
+    return len(text) // 3 + 1
+
+
+class RequestTrace:
+    """Stage durations and LLM usage accumulated for one request.
+
+    Durations of a stage that runs several times (or concurrently, e.g.
+    parallel tool calls) are summed, and nested stages are also included in
+    their parents, so stages do not add up to the total.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_llm(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def breakdown(self) -> dict:
+        """Milliseconds per stage plus LLM usage, as stored in ``ChatResponse.timings``."""
+
+        with self._lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "stages": {stage: round(seconds * 1000, 2) for stage, seconds in sorted(self.stages.items())},
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+@contextlib.contextmanager
+def request_trace() -> Iterator[RequestTrace]:
+    """Collect the spans of the enclosed request into a new :class:`RequestTrace`."""
+
+    trace = RequestTrace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """Time the enclosed block as ``stage``."""
+
+    otel_span = contextlib.nullcontext()
+    if _tracer is not None:
+        otel_span = _tracer.start_as_current_span(stage, attributes=attributes)
+    started = time.perf_counter()
+    try:
+        with otel_span:
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+def traced(stage: str, fn: F) -> F:
+    """Wrap a function or coroutine function so each call runs in :func:`span`."""
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return await fn(*args, **kwargs)
+
+        return async_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with span(stage):
+            return fn(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """Record latency, call counts and token usage of every LLM call."""
+
+    # Runs on the event loop so the request's context (and trace) is visible.
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._runs: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, prompt_text: str) -> None:
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), prompt_text)
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[BaseMessage]], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id, "\n".join(get_buffer_string(batch) for batch in messages))
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, "\n".join(prompts))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            started, prompt_text = self._runs.pop(run_id, (None, ""))
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens") or _estimate_tokens(prompt_text)
+        completion_tokens = usage.get("completion_tokens") or sum(
+            _estimate_tokens(generation.text) for generations in response.generations for generation in generations
+        )
+        LLM_CALLS.inc(outcome="ok")
+        LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, kind="completion")
+        trace = _current.get()
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.observe(elapsed, stage="llm")
+            if trace is not None:
+                trace.add("llm", elapsed)
+        if trace is not None:
+            trace.add_llm(prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+        LLM_CALLS.inc(outcome="error")
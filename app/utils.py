@@ -2,30 +2,45 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import sqlite3
+import threading
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Sequence
+from typing import List, Sequence, Tuple
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from sentence_transformers import SentenceTransformer
 
 from .config import settings
+from .db.embedding_cache import EmbeddingCache
+from .embedders import embedder_id, load_embedder
+from .embedding_batcher import EmbeddingBatcher
+from .tracing import span
 
 LOGGER = logging.getLogger(__name__)
 
 
 _embedder = None
+_embedding_cache: EmbeddingCache | None = None
+_query_batcher: EmbeddingBatcher | None = None
+
+_LEGACY_IMPORT_MIGRATION = "legacy_session_json"
 
 
 def get_embedder() -> SentenceTransformer:
-    """Return a lazily instantiated sentence transformer model."""
+    """Return a lazily instantiated sentence transformer model.
+
+    The execution backend (PyTorch, ONNX or int8 ONNX) follows
+    ``settings.embedding_backend``.
+    """
 
     global _embedder
     if _embedder is None:
-        LOGGER.info("Loading embedding model %s", settings.embedding_model)
-        _embedder = SentenceTransformer(settings.embedding_model)
+        _embedder = load_embedder()
     return _embedder
 
 
@@ -37,8 +52,18 @@ class DocumentChunk:
     metadata: dict
 
 
-def chunk_text(text: str, *, chunk_size: int | None = None, chunk_overlap: int | None = None) -> List[DocumentChunk]:
-    """Split a string into overlapping chunks suitable for embeddings."""
+def chunk_text(
+    text: str,
+    *,
+    chunk_size: int | None = None,
+    chunk_overlap: int | None = None,
+    metadata: dict | None = None,
+) -> List[DocumentChunk]:
+    """Split a string into overlapping chunks suitable for embeddings.
+
+    ``metadata`` is copied onto every produced chunk (typically the source
+    filename and page number) alongside the chunk index.
+    """
 
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size or settings.chunk_size,
@@ -47,66 +72,306 @@ def chunk_text(text: str, *, chunk_size: int | None = None, chunk_overlap: int |
         length_function=len,
     )
     chunks = splitter.split_text(text)
-    return [DocumentChunk(text=c, metadata={"source": "regulations.pdf", "chunk": idx}) for idx, c in enumerate(chunks)]
+    base_metadata = metadata or {}
+    return [DocumentChunk(text=c, metadata={**base_metadata, "chunk": idx}) for idx, c in enumerate(chunks)]
 
 
-def embed_texts(texts: Sequence[str]) -> List[List[float]]:
-    """Generate dense embeddings for provided texts."""
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Return the shared embedding cache, or ``None`` when disabled."""
 
-    embedder = get_embedder()
-    return embedder.encode(list(texts), normalize_embeddings=True).tolist()
+    global _embedding_cache
+    if _embedding_cache is None and settings.embedding_cache_enabled:
+        _embedding_cache = EmbeddingCache(model_name=embedder_id())
+    return _embedding_cache
 
 
-def load_pdf_text(pdf_path: Path) -> str:
-    """Extract plain text from a PDF file."""
+def embed_texts(texts: Sequence[str], *, kind: str = "document") -> List[List[float]]:
+    """Generate dense embeddings for provided texts.
+
+    Vectors are served from the on-disk embedding cache where possible; only
+    cache misses are encoded.  ``kind`` is ``"document"`` for corpus chunks
+    (kept indefinitely) or ``"query"`` for user questions (LRU bounded).
+    """
+
+    texts = list(texts)
+    cache = get_embedding_cache()
+    cached = cache.get_many(texts) if cache else {}
+    missing = [idx for idx in range(len(texts)) if idx not in cached]
+    if missing:
+        embedder = get_embedder()
+        with span("embedding.encode"):
+            encoded = embedder.encode([texts[idx] for idx in missing], normalize_embeddings=True).tolist()
+        cached.update(zip(missing, encoded))
+        if cache:
+            cache.put_many([texts[idx] for idx in missing], encoded, kind=kind)
+    return [cached[idx] for idx in range(len(texts))]
+
+
+def get_query_batcher() -> EmbeddingBatcher:
+    """Return the process wide micro-batcher for query embeddings."""
+
+    global _query_batcher
+    if _query_batcher is None:
+        _query_batcher = EmbeddingBatcher(
+            lambda texts: embed_texts(texts, kind="query"),
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms,
+        )
+    return _query_batcher
+
+
+def _cached_query_vector(query: str) -> List[float] | None:
+    cache = get_embedding_cache()
+    if cache:
+        cached = cache.get_many([query])
+        if cached:
+            return cached[0]
+    return None
+
+
+def embed_query(query: str) -> List[float]:
+    """Embed a single user query, batching it with concurrent callers.
+
+    Cached queries are answered immediately without entering the batch queue.
+    """
+
+    cached = _cached_query_vector(query)
+    if cached is not None:
+        return cached
+    if not settings.embedding_batching_enabled:
+        return embed_texts([query], kind="query")[0]
+    return get_query_batcher().embed(query)
+
+
+async def aembed_query(query: str) -> List[float]:
+    """Async variant of :func:`embed_query` that never blocks the event loop.
+
+    The cache lookup (a SQLite read and LRU update) runs in a worker thread,
+    and the transformer on the batcher thread (or a worker thread when
+    batching is disabled) while the coroutine awaits the result.
+    """
+
+    cached = await asyncio.to_thread(_cached_query_vector, query)
+    if cached is not None:
+        return cached
+    if not settings.embedding_batching_enabled:
+        vectors = await asyncio.to_thread(embed_texts, [query], kind="query")
+        return vectors[0]
+    return await asyncio.wrap_future(get_query_batcher().submit(query))
+
+
+def load_pdf_pages(pdf_path: Path) -> List[str]:
+    """Extract plain text from a PDF file, one string per page."""
 
     from PyPDF2 import PdfReader
 
     reader = PdfReader(str(pdf_path))
-    text_content: List[str] = []
-    for page in reader.pages:
-        text_content.append(page.extract_text() or "")
-    return "\n".join(text_content)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def load_pdf_text(pdf_path: Path) -> str:
+    """Extract plain text from a PDF file."""
+
+    return "\n".join(load_pdf_pages(pdf_path))
 
 
 class SessionMemory:
-    """Persist conversation history to a JSON file.
+    """Persist conversation history in an SQLite database keyed by session.
 
-    The structure stored on disk is a mapping from session identifier to a list of
-    dictionaries with ``role`` and ``content`` keys.  This simple approach keeps
-    the memory human readable whilst satisfying the project requirement of JSON
-    based memory persistence.
+    Messages live in an append-only table indexed by ``(session_id, id)`` so
+    appending a turn is a single insert and reading the last ``limit``
+    messages touches only that session's rows.  The database runs in WAL mode,
+    which lets several API worker processes read and write concurrently
+    without losing updates.  Sessions idle for longer than
+    ``settings.session_ttl_seconds`` expire and are purged periodically.
+
+    A legacy ``session_memory.json`` file is imported once on first start.
     """
 
-    def __init__(self, path: Path | None = None) -> None:
-        self.path = path or settings.session_memory_path
+    _PURGE_INTERVAL = 600.0
+
+    def __init__(self, path: Path | None = None, *, ttl_seconds: int | None = None) -> None:
+        self.path = path or settings.session_store_path
+        self.ttl_seconds = settings.session_ttl_seconds if ttl_seconds is None else ttl_seconds
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.path.exists():
-            self._write({})
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " role TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " session_id TEXT PRIMARY KEY,"
+                " summary TEXT NOT NULL,"
+                " covered_until INTEGER NOT NULL)"
+            )
+        if path is None:
+            self._import_legacy_json(settings.session_memory_path)
+
+    # ------------------------------------------------------------------
+    def _import_legacy_json(self, legacy_path: Path) -> None:
+        """Import ``legacy_path`` once, even when several workers start together.
+
+        The import runs in a ``BEGIN IMMEDIATE`` transaction that also records
+        a marker row, so only the first worker to take the write lock copies
+        the messages; the others see the marker and only tidy up the file.
+        """
+
+        if not legacy_path.exists():
+            return
+        imported = 0
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at REAL NOT NULL)"
+            )
+            done = self._conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (_LEGACY_IMPORT_MIGRATION,)
+            ).fetchone()
+            if not done and legacy_path.exists():
+                with legacy_path.open("r", encoding="utf-8") as file:
+                    payload = json.load(file)
+                now = time.time()
+                for session_id, history in payload.items():
+                    self._conn.executemany(
+                        "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                        [(session_id, item["role"], item["content"], now) for item in history],
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sessions (session_id, updated_at) VALUES (?, ?)", (session_id, now)
+                    )
+                self._conn.execute(
+                    "INSERT INTO migrations (name, applied_at) VALUES (?, ?)", (_LEGACY_IMPORT_MIGRATION, now)
+                )
+                imported = len(payload)
+        try:
+            legacy_path.rename(legacy_path.with_suffix(legacy_path.suffix + ".migrated"))
+        except FileNotFoundError:
+            pass  # Another worker renamed it first.
+        if imported:
+            LOGGER.info("Imported %s sessions from %s", imported, legacy_path)
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        if not self.ttl_seconds or now - self._last_purge < self._PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        cutoff = self._cutoff()
+        for table in ("messages", "summaries"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)",
+                (cutoff,),
+            )
+        deleted = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+        if deleted:
+            LOGGER.info("Expired %s idle sessions", deleted)
+
+    # ------------------------------------------------------------------
+    def get_messages(
+        self,
+        session_id: str,
+        *,
+        after_id: int = 0,
+        limit: int | None = None,
+        oldest: bool = False,
+    ) -> List[Tuple[int, str, str]]:
+        """Return ``(id, role, content)`` rows newer than ``after_id``, oldest
+        first and at most the last ``limit`` of them (the first ``limit`` with
+        ``oldest``)."""
+
+        order = "ASC" if oldest else "DESC"
+        with self._lock:
+            row = self._conn.execute("SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None or row[0] < self._cutoff():
+                return []
+            rows = self._conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? AND id > ?"
+                f" ORDER BY id {order} LIMIT ?",
+                (session_id, after_id, -1 if limit is None else limit),
+            ).fetchall()
+        return rows if oldest else rows[::-1]
+
+    def get_history(self, session_id: str, *, limit: int | None = None) -> List[dict]:
+        """Return the session's messages oldest first, at most the last ``limit``."""
+
+        return [
+            {"role": role, "content": content}
+            for _, role, content in self.get_messages(session_id, limit=limit)
+        ]
+
+    def get_summary(self, session_id: str) -> Tuple[str, int]:
+        """Return the rolling summary and the last message id it covers."""
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, covered_until FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else ("", 0)
+
+    def set_summary(self, session_id: str, summary: str, covered_until: int, *, previous: int) -> bool:
+        """Store a summary unless another writer advanced it past ``previous``."""
+
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO summaries (session_id, summary, covered_until) VALUES (?, ?, ?)"
+                " ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary,"
+                " covered_until = excluded.covered_until WHERE summaries.covered_until = ?",
+                (session_id, summary, covered_until, previous),
+            )
+        return cursor.rowcount > 0
+
+    def append_many(self, session_id: str, messages: Sequence[Tuple[str, str]]) -> None:
+        """Append ``(role, content)`` pairs in a single transaction."""
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, role, content, now) for role, content in messages],
+            )
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?)"
+                " ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, now),
+            )
+            self._maybe_purge()
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        self.append_many(session_id, [(role, content)])
 
-    def _read(self) -> dict:
-        with self.path.open("r", encoding="utf-8") as file:
-            return json.load(file)
+    def reset(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
 
-    def _write(self, payload: dict) -> None:
-        with self.path.open("w", encoding="utf-8") as file:
-            json.dump(payload, file, ensure_ascii=False, indent=2)
 
-    def get_history(self, session_id: str) -> List[dict]:
-        data = self._read()
-        return data.get(session_id, [])
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for prompt budgeting.
 
-    def append(self, session_id: str, role: str, content: str) -> None:
-        data = self._read()
-        history = data.setdefault(session_id, [])
-        history.append({"role": role, "content": content})
-        self._write(data)
+    Vietnamese text averages roughly three characters per BPE token for the
+    OpenAI-compatible tokenizers served by OpenRouter; the estimate errs
+    slightly high so budgets stay conservative.
+    """
 
-    def reset(self, session_id: str) -> None:
-        data = self._read()
-        if session_id in data:
-            del data[session_id]
-            self._write(data)
+    return len(text) // 3 + 1
 
 
 def build_tool_observation(tool_name: str, observation: str, *, max_length: int = 600) -> str:
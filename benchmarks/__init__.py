@@ -0,0 +1 @@
+"""Offline micro-benchmarks for the EduPolicy Agent backend."""
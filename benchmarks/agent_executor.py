@@ -0,0 +1,98 @@
+"""Per-request overhead of building the agent executor versus reusing it.
+
+Compares the previous behaviour of ``AgentController.chat`` (calling
+``initialize_agent`` for every message) with invoking a single prebuilt
+executor.  A scripted chat model answers immediately, so the timings isolate
+LangChain's construction and dispatch overhead from network latency.
+
+Run with::
+
+    python -m benchmarks.agent_executor --requests 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import tracemalloc
+from typing import Callable, List
+
+from langchain.agents import AgentType, Tool, initialize_agent
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.agents.controller import AGENT_KWARGS
+
+FINAL_ANSWER = '```\n{\n  "action": "Final Answer",\n  "action_input": "Xin chào"\n}\n```'
+
+
+def _tools() -> List[Tool]:
+    return [
+        Tool(name=name, func=lambda text: text, description=f"{name} placeholder")
+        for name in ("rag_tool", "sql_tool", "web_tool", "summarizer")
+    ]
+
+
+def _build(llm: FakeListChatModel, tools: List[Tool]):
+    return initialize_agent(
+        tools=tools,
+        llm=llm,
+        agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True,
+        verbose=False,
+        agent_kwargs=AGENT_KWARGS,
+    )
+
+
+def _measure(label: str, handle: Callable[[str], None], requests: int) -> None:
+    handle("warm-up")
+    timings = []
+    for idx in range(requests):
+        started = time.perf_counter()
+        handle(f"Câu hỏi {idx}")
+        timings.append((time.perf_counter() - started) * 1000)
+    # Allocations are traced in a separate pass so tracing does not skew timings.
+    tracemalloc.start()
+    for idx in range(min(requests, 20)):
+        handle(f"Câu hỏi {idx}")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+    print(
+        f"{label:<22} mean {statistics.mean(timings):7.3f} ms  "
+        f"p50 {timings[len(timings) // 2]:7.3f} ms  "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:7.3f} ms  "
+        f"peak alloc {peak / 1024:8.1f} KiB"
+    )
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    llm = FakeListChatModel(responses=[FINAL_ANSWER])
+    tools = _tools()
+    payload = lambda message: {"input": message, "chat_history": []}  # noqa: E731
+
+    def per_request(message: str) -> None:
+        _build(llm, tools).invoke(payload(message))
+
+    shared = _build(llm, tools)
+
+    def reused(message: str) -> None:
+        shared.invoke(payload(message))
+
+    def construction_only(message: str) -> None:
+        _build(llm, tools)
+
+    print(f"{args.requests} requests, scripted LLM (no network)")
+    _measure("build per request", per_request, args.requests)
+    _measure("shared executor", reused, args.requests)
+    _measure("construction only", construction_only, args.requests)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,321 @@
+"""Offline stand-ins for the services the backend talks to.
+
+* :class:`ScriptedChatModel` replaces OpenRouter.  It recognises the prompts
+  the backend sends (structured-chat agent steps, NL2SQL, fast-path answers,
+  summaries) and replies with deterministic, well-formed output after a
+  configurable delay, so the agent takes the same path on every run.
+* :class:`HashEmbedder` replaces the sentence-transformer with hashed
+  bag-of-words vectors: questions sharing words stay close, which keeps the
+  router and answer cache behaving plausibly.
+* :class:`InMemoryVectorStore` replaces Milvus with the local index kept
+  entirely in memory, filled from :func:`synthetic_corpus`.
+
+The Tavily stand-in lives in :mod:`benchmarks.tavily_stub` and the student
+database generator in :mod:`benchmarks.student_db`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import agenerate_from_stream, generate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from app.db.bm25_index import bm25_index_path
+from app.db.local_vector_store import LocalVectorStore, _Snapshot
+from app.ingest import build_sparse_index
+from app.utils import estimate_tokens
+
+from .student_db import COHORTS
+
+# Questions are routed to tools by keyword, checked in this order; anything
+# else goes to rag_tool.  Mixed questions need several tools.
+TOOL_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("sql_tool", ("bao nhiêu sinh viên", "mã sinh viên", "gpa", "điểm trung bình")),
+    ("web_tool", ("bộ giáo dục", "tin tức", "mới nhất")),
+    ("rag_tool", ("quy định", "quy chế", "điều kiện")),
+)
+
+_OBSERVATION_RE = re.compile(r"^Observation:", re.M)
+_SQL_QUESTION_RE = re.compile(r"Question: (.*?)\s*SQLQuery:", re.S)
+_FAST_PATH_RE = re.compile(r"Kết quả từ (\w+):.*\n\nCâu hỏi: (.*)", re.S)
+_STUDENT_ID_RE = re.compile(r"SV\d{5}")
+_YEAR_RE = re.compile(r"20\d{2}")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _blob(payload: Any) -> str:
+    return "Action:\n```\n" + json.dumps(payload, ensure_ascii=False, indent=2) + "\n```"
+
+
+def tools_for(question: str) -> List[str]:
+    """Tools the scripted agent calls for ``question``, in order."""
+
+    lowered = question.lower()
+    tools = [tool for tool, keywords in TOOL_KEYWORDS if any(keyword in lowered for keyword in keywords)]
+    return tools or ["rag_tool"]
+
+
+def sql_for(question: str) -> str:
+    """SQL the scripted model writes for ``question`` against :mod:`benchmarks.student_db`."""
+
+    student = _STUDENT_ID_RE.search(question)
+    if student:
+        return (
+            "SELECT student_id, full_name, cohort, gpa, credits, status FROM students"
+            f" WHERE student_id = '{student.group(0)}'"
+        )
+    year = _YEAR_RE.search(question)
+    if year and "cảnh báo" in question.lower():
+        return (
+            "SELECT COUNT(DISTINCT w.student_id) AS so_sinh_vien FROM academic_warnings w"
+            f" JOIN students s ON s.student_id = w.student_id WHERE s.cohort = {year.group(0)}"
+        )
+    if year:
+        return f"SELECT COUNT(*) AS so_sinh_vien, ROUND(AVG(gpa), 2) AS gpa_trung_binh FROM students WHERE cohort = {year.group(0)}"
+    return "SELECT faculty, ROUND(AVG(gpa), 2) AS gpa_trung_binh FROM students GROUP BY faculty ORDER BY gpa_trung_binh DESC"
+
+
+class LLMUsage:
+    """Call and approximate token counters shared by copies of a model."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, messages: Sequence[BaseMessage], completion: str) -> None:
+        prompt = sum(estimate_tokens(str(message.content)) for message in messages)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.completion_tokens += estimate_tokens(completion)
+
+    def snapshot(self) -> Tuple[int, int, int]:
+        with self._lock:
+            return self.calls, self.prompt_tokens, self.completion_tokens
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic chat model answering the backend's prompts after ``delay_ms``."""
+
+    delay_ms: float = 0.0
+    """Latency of every call; streamed replies spread it over their chunks."""
+    streaming: bool = False
+    usage: LLMUsage = Field(default_factory=LLMUsage)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat"
+
+    # ------------------------------------------------------------------
+    def respond(self, messages: Sequence[BaseMessage]) -> str:
+        system = next((str(m.content) for m in messages if isinstance(m, SystemMessage)), "")
+        prompt = str(messages[-1].content) if messages else ""
+        if "$JSON_BLOB" in system:
+            return self._agent_step(prompt, parallel="independent of each other" in system)
+        question = _SQL_QUESTION_RE.findall(prompt)
+        if question:
+            return sql_for(question[-1])
+        fast_path = _FAST_PATH_RE.search(prompt)
+        if fast_path:
+            return f"Theo kết quả từ {fast_path.group(1)}, đây là câu trả lời cho: {fast_path.group(2).strip()}"
+        if "tóm tắt" in prompt.lower():
+            return "Tóm tắt: người dùng hỏi về quy định học vụ và đã nhận được câu trả lời từ các công cụ."
+        return "Xin chào, tôi là EduPolicyAgent."
+
+    @staticmethod
+    def _agent_step(prompt: str, *, parallel: bool) -> str:
+        question = prompt.split("\n\nThis was your previous work", 1)[0].strip()
+        tools = tools_for(question)
+        done = len(_OBSERVATION_RE.findall(prompt))
+        if parallel and done == 0 and len(tools) > 1:
+            return "Thought: Các công cụ này độc lập, gọi song song.\n" + _blob(
+                [{"action": tool, "action_input": question} for tool in tools]
+            )
+        if done < len(tools) and not (parallel and done):
+            tool = tools[done]
+            return f"Thought: Cần dùng {tool}.\n" + _blob({"action": tool, "action_input": question})
+        answer = f"Dựa trên {', '.join(tools)}: câu trả lời cho \"{question}\"."
+        return "Thought: Đã đủ thông tin.\n" + _blob({"action": "Final Answer", "action_input": answer})
+
+    @staticmethod
+    def _pieces(text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text) or [text]
+
+    # ------------------------------------------------------------------
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.streaming:
+            return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+        text = self.respond(messages)
+        time.sleep(self.delay_ms / 1000)
+        self.usage.record(messages, text)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.streaming:
+            return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+        text = self.respond(messages)
+        await asyncio.sleep(self.delay_ms / 1000)
+        self.usage.record(messages, text)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        text = self.respond(messages)
+        pieces = self._pieces(text)
+        for piece in pieces:
+            time.sleep(self.delay_ms / 1000 / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        self.usage.record(messages, text)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        text = self.respond(messages)
+        pieces = self._pieces(text)
+        for piece in pieces:
+            await asyncio.sleep(self.delay_ms / 1000 / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        self.usage.record(messages, text)
+
+
+# ----------------------------------------------------------------------
+class HashEmbedder:
+    """Drop-in for ``SentenceTransformer.encode`` using hashed word vectors."""
+
+    def __init__(self, dim: int, *, delay_ms: float = 0.0) -> None:
+        self.dim = dim
+        self.delay_ms = delay_ms
+        """Simulated model time per ``encode`` call (one micro-batch)."""
+
+    @lru_cache(maxsize=50_000)
+    def _word(self, word: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def encode(self, texts: Sequence[str], normalize_embeddings: bool = True, **kwargs: Any) -> np.ndarray:
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD_RE.findall(text.lower()):
+                vectors[row] += self._word(word)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1.0, norms)
+        return vectors
+
+
+class InMemoryVectorStore(LocalVectorStore):
+    """:class:`LocalVectorStore` that never reads or writes its matrix files.
+
+    Only the manifest and BM25 index written by :func:`populate` live under
+    ``path``.
+    """
+
+    def _load(self, directory: Path | None) -> _Snapshot:
+        return _Snapshot(np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32), [], [])
+
+    def _persist(self, snapshot: _Snapshot) -> _Snapshot:
+        return self._build_snapshot(snapshot.ids, np.asarray(snapshot.vectors), snapshot.texts, snapshot.metadatas)
+
+
+_TOPICS = (
+    "điều kiện xét tốt nghiệp",
+    "cảnh báo học vụ",
+    "đăng ký học phần",
+    "học phí và miễn giảm học phí",
+    "bảo lưu kết quả học tập",
+    "chuyển ngành đào tạo",
+    "điểm rèn luyện",
+    "thi lại và cải thiện điểm",
+    "chuẩn đầu ra ngoại ngữ",
+    "buộc thôi học",
+)
+
+
+def synthetic_corpus(chunks: int, *, seed: int = 0) -> Iterator[Tuple[str, dict]]:
+    """Yield ``(text, metadata)`` regulation-like chunks spread over a few documents."""
+
+    rng = random.Random(seed)
+    for index in range(chunks):
+        topic = rng.choice(_TOPICS)
+        cohort = rng.choice(COHORTS)
+        level = rng.choice(("dai_hoc", "dai_hoc", "thac_si"))
+        article = rng.randint(1, 60)
+        text = (
+            f"Điều {article}. Quy định về {topic} áp dụng cho sinh viên khoá {cohort} trở về sau. "
+            f"Sinh viên phải tích luỹ tối thiểu {rng.randint(90, 150)} tín chỉ và đạt điểm trung bình "
+            f"tích luỹ từ {rng.choice(('1.5', '2.0', '2.5'))} trở lên. Trường hợp không đáp ứng, "
+            f"phòng Đào tạo xem xét {topic} theo học kỳ {rng.randint(1, 2)}."
+        )
+        metadata = {
+            "source": f"quy_che_{index % 12:02d}.pdf",
+            "page": index // 20 + 1,
+            "chunk": index,
+            "program_level": level,
+            "cohort_from": cohort,
+            "cohort_to": 9999,
+        }
+        yield text, metadata
+
+
+def populate(store: LocalVectorStore, embedder: HashEmbedder, corpus: Sequence[Tuple[str, dict]]) -> None:
+    """Index ``corpus`` into ``store`` and write its manifest and BM25 index."""
+
+    texts = [text for text, _ in corpus]
+    metadatas = [metadata for _, metadata in corpus]
+    for start in range(0, len(texts), 512):
+        batch = texts[start : start + 512]
+        store.add_embeddings(embedder.encode(batch), batch, metadatas[start : start + 512], flush=False)
+    store.flush()
+    manifest = {"synthetic": {"chunks": len(texts)}}
+    Path(store.manifest_path).write_text(json.dumps(manifest), encoding="utf-8")
+    build_sparse_index(store, bm25_index_path(store.manifest_path))
+
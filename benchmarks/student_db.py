@@ -0,0 +1,120 @@
+"""Generate a synthetic ``student_records.db`` for development and benchmarks.
+
+The real student database is not distributed with the repository.  This
+script writes a deterministic stand-in with the same kind of data the SQL
+tool is asked about: students with cohort, faculty, GPA and credits, and the
+academic warnings they received per semester.
+
+    python -m benchmarks.student_db --out data/student_records.db --students 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+from pathlib import Path
+from typing import List
+
+FACULTIES = (
+    "Công nghệ Thông tin",
+    "Kinh tế",
+    "Điện - Điện tử",
+    "Cơ khí",
+    "Ngoại ngữ",
+    "Khoa học Ứng dụng",
+)
+FAMILY_NAMES = ("Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng")
+MIDDLE_NAMES = ("Văn", "Thị", "Hữu", "Minh", "Ngọc", "Thanh", "Quốc", "Gia")
+GIVEN_NAMES = ("An", "Bình", "Chi", "Dũng", "Hà", "Khoa", "Linh", "Nam", "Phúc", "Quân", "Thảo", "Vy")
+WARNING_REASONS = (
+    "Điểm trung bình học kỳ dưới 1.0",
+    "Điểm trung bình tích luỹ dưới mức quy định",
+    "Không đăng ký học phần",
+    "Tổng số tín chỉ không đạt quá 50% số tín chỉ đăng ký",
+)
+COHORTS = range(2018, 2025)
+
+SCHEMA = """
+CREATE TABLE students (
+    student_id TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    cohort INTEGER NOT NULL,
+    faculty TEXT NOT NULL,
+    program_level TEXT NOT NULL,
+    gpa REAL NOT NULL,
+    credits INTEGER NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE academic_warnings (
+    id INTEGER PRIMARY KEY,
+    student_id TEXT NOT NULL REFERENCES students (student_id),
+    academic_year TEXT NOT NULL,
+    semester INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    reason TEXT NOT NULL
+);
+CREATE INDEX idx_students_cohort ON students (cohort);
+CREATE INDEX idx_warnings_student ON academic_warnings (student_id);
+"""
+
+
+def student_id(index: int) -> str:
+    return f"SV{index:05d}"
+
+
+def generate(path: Path, *, students: int = 5000, seed: int = 0) -> Path:
+    """Write a fresh database with ``students`` rows to ``path``."""
+
+    rng = random.Random(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    student_rows: List[tuple] = []
+    warning_rows: List[tuple] = []
+    for index in range(1, students + 1):
+        cohort = rng.choice(COHORTS)
+        gpa = round(min(4.0, max(0.0, rng.gauss(2.8, 0.6))), 2)
+        years = 2025 - cohort
+        credits = min(150, max(0, int(rng.gauss(32 * years, 8))))
+        status = "Đã tốt nghiệp" if years >= 5 and gpa >= 2.0 and rng.random() < 0.7 else "Đang học"
+        name = f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}"
+        level = "dai_hoc" if rng.random() < 0.9 else "thac_si"
+        student_rows.append((student_id(index), name, cohort, rng.choice(FACULTIES), level, gpa, credits, status))
+        if gpa < 2.0 or rng.random() < 0.05:
+            for _ in range(rng.randint(1, 3)):
+                year = rng.randint(cohort, min(cohort + years, 2024))
+                warning_rows.append(
+                    (
+                        student_id(index),
+                        f"{year}-{year + 1}",
+                        rng.randint(1, 2),
+                        rng.randint(1, 3),
+                        rng.choice(WARNING_REASONS),
+                    )
+                )
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO students VALUES (?, ?, ?, ?, ?, ?, ?, ?)", student_rows)
+        conn.executemany(
+            "INSERT INTO academic_warnings (student_id, academic_year, semester, level, reason)"
+            " VALUES (?, ?, ?, ?, ?)",
+            warning_rows,
+        )
+    conn.close()
+    return path
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", type=Path, default=Path("data/student_records.db"))
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate(args.out, students=args.students, seed=args.seed)
+    print(f"Wrote {args.students} students to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
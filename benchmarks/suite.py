@@ -0,0 +1,332 @@
+"""End-to-end latency, throughput and memory of the API without external services.
+
+Runs the real FastAPI app and :class:`AgentController` against local
+stand-ins: :class:`~benchmarks.fakes.ScriptedChatModel` for OpenRouter, an
+in-memory vector index over a synthetic corpus for Milvus, the Tavily stub
+server and a generated ``student_records.db``.  Every scenario fires
+``--requests`` requests with ``--concurrency`` in flight and reports
+p50/p95/p99 latency, requests per second, peak Python allocations and process
+RSS.  Endpoint scenarios go through HTTP routing and serialisation
+(``POST /chat``, ``/rag/query``, ``/sql/query``, ``/web/query``); tool
+scenarios call the agent's tools directly.
+
+Delays of the stand-ins are configurable so results can be compared across
+changes under the same simulated conditions::
+
+    python -m benchmarks.suite --requests 200 --concurrency 16 --llm-delay-ms 300
+    python -m benchmarks.suite --scenarios chat,tool:sql_tool --json results.json
+
+Caches (answer cache, SQL plan cache, embedding cache, web results) are off
+unless ``--with-caches`` is given, and every request uses a distinct question,
+so the numbers reflect the uncached path.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List, Tuple
+
+import httpx
+
+from app import main as api
+from app import utils
+from app.agents.controller import AgentController
+from app.config import settings
+
+from .fakes import HashEmbedder, InMemoryVectorStore, ScriptedChatModel, populate, synthetic_corpus
+from .student_db import COHORTS, generate, student_id
+from .tavily_stub import running_stub
+
+Call = Callable[[int], Awaitable[None]]
+
+WARMUP_REQUESTS = 5
+TRACED_REQUESTS = 20
+
+CHAT_QUESTIONS = (
+    "Điều kiện xét tốt nghiệp đối với sinh viên khoá {cohort} là gì? (#{index})",
+    "Có bao nhiêu sinh viên khoá {cohort} bị cảnh báo học vụ? (#{index})",
+    "Tin tức mới nhất của Bộ Giáo dục về tuyển sinh năm {cohort} (#{index})",
+    "Quy định học phí khoá {cohort} và tin tức mới nhất của Bộ Giáo dục về học phí (#{index})",
+)
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def max_rss_mib() -> float:
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    concurrency: int
+    errors: int
+    seconds: float
+    latencies_ms: List[float] = field(repr=False)
+    peak_alloc_kib: float = 0.0
+    max_rss_mib: float = 0.0
+    extra: Dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.latencies_ms)
+        return {
+            "scenario": self.name,
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+            "rps": self.requests / self.seconds if self.seconds else 0.0,
+            "mean_ms": statistics.mean(ordered) if ordered else 0.0,
+            "p50_ms": percentile(ordered, 50),
+            "p95_ms": percentile(ordered, 95),
+            "p99_ms": percentile(ordered, 99),
+            "peak_alloc_kib": self.peak_alloc_kib,
+            "max_rss_mib": self.max_rss_mib,
+            **self.extra,
+        }
+
+
+async def _fire(call: Call, indices: range, concurrency: int) -> Tuple[List[float], int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call(index)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(index) for index in indices))
+    return latencies, errors
+
+
+async def run_scenario(
+    name: str,
+    call: Call,
+    *,
+    requests: int,
+    concurrency: int,
+    warmup: int = WARMUP_REQUESTS,
+    traced: int = TRACED_REQUESTS,
+) -> ScenarioResult:
+    """Time ``requests`` calls, then trace allocations over a short second pass."""
+
+    await _fire(call, range(-warmup, 0), concurrency)
+    started = time.perf_counter()
+    latencies, errors = await _fire(call, range(requests), concurrency)
+    seconds = time.perf_counter() - started
+    # Allocations are traced in a separate pass so tracing does not skew timings.
+    tracemalloc.start()
+    await _fire(call, range(requests, requests + min(requests, traced)), concurrency)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ScenarioResult(
+        name=name,
+        requests=requests,
+        concurrency=concurrency,
+        errors=errors,
+        seconds=seconds,
+        latencies_ms=latencies,
+        peak_alloc_kib=peak / 1024,
+        max_rss_mib=max_rss_mib(),
+    )
+
+
+# ----------------------------------------------------------------------
+@contextlib.contextmanager
+def _overridden(**overrides) -> Iterator[None]:
+    previous = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+@contextlib.contextmanager
+def offline_environment(args: argparse.Namespace) -> Iterator[Tuple[AgentController, ScriptedChatModel]]:
+    """Wire an :class:`AgentController` to local stand-ins under a temp dir."""
+
+    with tempfile.TemporaryDirectory(prefix="edupolicy-bench-") as tmp, running_stub(
+        delay_ms=args.tavily_delay_ms
+    ) as (tavily_url, _):
+        workdir = Path(tmp)
+        caches = args.with_caches
+        overrides = dict(
+            sqlite_path=generate(workdir / "student_records.db", students=args.students),
+            session_store_path=workdir / "session_memory.sqlite",
+            session_memory_path=workdir / "session_memory.json",
+            embedding_cache_path=workdir / "embedding_cache.sqlite",
+            sql_plan_cache_path=workdir / "sql_plan_cache.sqlite",
+            local_index_dir=workdir / "local_index",
+            vector_store="local",
+            tavily_base_url=tavily_url,
+            tavily_api_key="stub",
+            agent_mode=args.agent_mode,
+            fast_path_enabled=args.fast_path,
+            embedding_cache_enabled=caches,
+            answer_cache_enabled=caches,
+            sql_plan_cache_enabled=caches,
+            tavily_cache_ttl_seconds=settings.tavily_cache_ttl_seconds if caches else 0,
+        )
+        embedder = HashEmbedder(settings.milvus_dim, delay_ms=args.embed_delay_ms)
+        saved = (utils._embedder, utils._embedding_cache, utils._query_batcher)
+        with _overridden(**overrides):
+            utils._embedder, utils._embedding_cache, utils._query_batcher = embedder, None, None
+            try:
+                llm = ScriptedChatModel(delay_ms=args.llm_delay_ms)
+                controller = AgentController(llm=llm)
+                store = InMemoryVectorStore(workdir / "memory_index", dim=settings.milvus_dim)
+                populate(store, embedder, list(synthetic_corpus(args.chunks)))
+                controller.rag_tool.vector_store = store
+                api.controller = controller
+                yield controller, llm
+            finally:
+                api.controller = None
+                utils._embedder, utils._embedding_cache, utils._query_batcher = saved
+
+
+def _question(index: int) -> str:
+    template = CHAT_QUESTIONS[index % len(CHAT_QUESTIONS)]
+    return template.format(cohort=COHORTS[index % len(COHORTS)], index=index)
+
+
+def _scenarios(controller: AgentController, client: httpx.AsyncClient, sessions: int) -> Dict[str, Call]:
+    async def post(path: str, payload: dict) -> None:
+        response = await client.post(path, json=payload)
+        response.raise_for_status()
+
+    tools = {tool.name: tool for tool in controller.tools}
+
+    def tool_call(name: str, question: Callable[[int], str]) -> Call:
+        async def call(index: int) -> None:
+            await tools[name].ainvoke(question(index))
+
+        return call
+
+    def sql_question(index: int) -> str:
+        if index % 2:
+            return f"Thông tin của mã sinh viên {student_id(abs(index) % 1000 + 1)}"
+        return f"Có bao nhiêu sinh viên khoá {COHORTS[index % len(COHORTS)]} bị cảnh báo học vụ? (#{index})"
+
+    def rag_question(index: int) -> str:
+        return f"Quy định về cảnh báo học vụ và học phí khoá {COHORTS[index % len(COHORTS)]} (#{index})"
+
+    def web_question(index: int) -> str:
+        return f"Tin tức mới nhất của Bộ Giáo dục số {index}"
+
+    return {
+        "chat": lambda index: post("/chat", {"session_id": f"bench-{index % sessions}", "message": _question(index)}),
+        "rag": lambda index: post("/rag/query", {"query": rag_question(index)}),
+        "sql": lambda index: post("/sql/query", {"question": sql_question(index)}),
+        "web": lambda index: post("/web/query", {"query": web_question(index)}),
+        "tool:rag_tool": tool_call("rag_tool", rag_question),
+        "tool:sql_tool": tool_call("sql_tool", sql_question),
+        "tool:web_tool": tool_call("web_tool", web_question),
+        "tool:summarizer": tool_call("summarizer", lambda index: f"Nội dung cần tóm tắt số {index}. " * 20),
+    }
+
+
+ENDPOINTS = {"chat": "POST /chat", "rag": "POST /rag/query", "sql": "POST /sql/query", "web": "POST /web/query"}
+
+
+async def run_suite(args: argparse.Namespace) -> List[dict]:
+    results: List[dict] = []
+    with offline_environment(args) as (controller, llm):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            scenarios = _scenarios(controller, client, args.sessions)
+            selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+            for name in selected:
+                if name not in scenarios:
+                    raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(scenarios)}")
+                calls_before, prompt_before, completion_before = llm.usage.snapshot()
+                result = await run_scenario(
+                    ENDPOINTS.get(name, name), scenarios[name], requests=args.requests, concurrency=args.concurrency
+                )
+                calls, prompt, completion = llm.usage.snapshot()
+                total = WARMUP_REQUESTS + args.requests + min(args.requests, TRACED_REQUESTS)
+                result.extra = {
+                    "llm_calls_per_request": (calls - calls_before) / total,
+                    "prompt_tokens_per_request": (prompt - prompt_before) / total,
+                    "completion_tokens_per_request": (completion - completion_before) / total,
+                }
+                summary = result.summary()
+                results.append(summary)
+                print(_format_row(summary), flush=True)
+        await asyncio.gather(*controller._background_tasks, return_exceptions=True)
+    return results
+
+
+_HEADER = (
+    f"{'scenario':<20} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+    f"{'err':>4} {'llm/req':>8} {'peak KiB':>9} {'rss MiB':>8}"
+)
+
+
+def _format_row(summary: dict) -> str:
+    return (
+        f"{summary['scenario']:<20} {summary['rps']:8.1f} {summary['p50_ms']:9.1f} {summary['p95_ms']:9.1f} "
+        f"{summary['p99_ms']:9.1f} {summary['errors']:4d} {summary['llm_calls_per_request']:8.2f} "
+        f"{summary['peak_alloc_kib']:9.1f} {summary['max_rss_mib']:8.1f}"
+    )
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", default="", help="Comma separated subset, e.g. chat,sql,tool:rag_tool.")
+    parser.add_argument("--sessions", type=int, default=20, help="Distinct chat sessions to spread /chat over.")
+    parser.add_argument("--llm-delay-ms", type=float, default=200.0)
+    parser.add_argument("--tavily-delay-ms", type=float, default=150.0)
+    parser.add_argument("--embed-delay-ms", type=float, default=5.0)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--agent-mode", choices=("react", "parallel"), default=settings.agent_mode)
+    parser.add_argument("--fast-path", action=argparse.BooleanOptionalAction, default=settings.fast_path_enabled)
+    parser.add_argument("--with-caches", action="store_true")
+    parser.add_argument("--json", type=Path, help="Also write the results and settings to this file.")
+    args = parser.parse_args(argv)
+
+    print(
+        f"{args.requests} requests x concurrency {args.concurrency}; LLM {args.llm_delay_ms:g} ms, "
+        f"Tavily {args.tavily_delay_ms:g} ms, embedding {args.embed_delay_ms:g} ms; "
+        f"agent {args.agent_mode}, fast path {'on' if args.fast_path else 'off'}, "
+        f"caches {'on' if args.with_caches else 'off'}"
+    )
+    print(_HEADER)
+    results = asyncio.run(run_suite(args))
+    if args.json:
+        config = {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+        args.json.write_text(json.dumps({"config": config, "results": results}, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
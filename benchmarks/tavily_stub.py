@@ -0,0 +1,124 @@
+"""Local stand-in for Tavily's ``/search`` endpoint.
+
+Returns deterministic results derived from the query after an optional delay,
+and can be told to fail a fraction of requests to exercise the circuit
+breaker.  Point the API at it with::
+
+    python -m benchmarks.tavily_stub --port 8765 --delay-ms 300
+    TAVILY_BASE_URL=http://127.0.0.1:8765 TAVILY_API_KEY=stub uvicorn app.main:app
+
+or start it in-process with :func:`running_stub`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+
+class StubState:
+    """Configuration and counters shared by the request handlers."""
+
+    def __init__(self, *, delay_ms: float = 0.0, failure_rate: float = 0.0, seed: int = 0) -> None:
+        self.delay_ms = delay_ms
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_request(self) -> bool:
+        """Count a request and decide whether it should fail."""
+
+        with self._lock:
+            self.requests += 1
+            return self._random.random() < self.failure_rate
+
+
+def stub_results(query: str, max_results: int) -> List[dict]:
+    return [
+        {
+            "title": f"Kết quả {idx + 1} cho: {query}",
+            "content": f"Nội dung mô phỏng số {idx + 1} liên quan tới '{query}' từ Bộ Giáo dục và Đào tạo.",
+            "url": f"https://moet.gov.vn/stub/{zlib.crc32(f'{query}#{idx}'.encode()) % 100000}",
+            "score": round(1.0 - idx * 0.1, 2),
+        }
+        for idx in range(max_results)
+    ]
+
+
+def _handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002 - signature from base class
+            pass
+
+        def _send(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server naming
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            fail = state.next_request()
+            if state.delay_ms:
+                time.sleep(state.delay_ms / 1000)
+            if self.path.rstrip("/") != "/search":
+                self._send(404, {"detail": "Not found"})
+            elif fail:
+                self._send(503, {"detail": "Stub failure"})
+            else:
+                query = request.get("query", "")
+                results = stub_results(query, int(request.get("max_results", 5)))
+                self._send(200, {"query": query, "results": results, "response_time": state.delay_ms / 1000})
+
+    return Handler
+
+
+@contextlib.contextmanager
+def running_stub(*, port: int = 0, delay_ms: float = 0.0, failure_rate: float = 0.0) -> Iterator[tuple]:
+    """Run the stub in a background thread; yields ``(base_url, state)``."""
+
+    state = StubState(delay_ms=delay_ms, failure_rate=failure_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    state = StubState(delay_ms=args.delay_ms, failure_rate=args.failure_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(state))
+    print(f"Tavily stub listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -36,22 +36,40 @@ with col2:
 with col1:
     user_input = st.chat_input("Nhập câu hỏi về quy chế, sinh viên hoặc quy định...")
 
-if user_input:
-    st.session_state.messages.append({"role": "user", "content": user_input})
-    try:
-        response = requests.post(
-            f"{API_URL}/chat",
-            json={"session_id": st.session_state.session_id, "message": user_input},
-            timeout=60,
-        )
-        response.raise_for_status()
-        payload = response.json()
-        answer = payload.get("answer", "")
-        reasoning = payload.get("reasoning", [])
-        tools = payload.get("tool_interactions", [])
-        st.session_state.messages.append({"role": "assistant", "content": answer, "reasoning": reasoning, "tools": tools})
-    except requests.RequestException as exc:
-        st.error(f"Không thể kết nối backend: {exc}")
+def iter_sse(response: requests.Response):
+    """Yield ``(event, data)`` pairs from a Server-Sent Events response."""
+
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:") :].strip())
+
+
+def render_details(reasoning, tools, timings=None) -> None:
+    if reasoning:
+        with st.expander("Hiển thị lập luận của agent"):
+            for item in reasoning:
+                st.write(item)
+    if tools:
+        with st.expander("Hiển thị tương tác công cụ"):
+            for item in tools:
+                st.write(item)
+    if timings:
+        with st.expander(f"Thời gian xử lý: {timings['total_ms'] / 1000:.2f} s"):
+            st.write(
+                f"{timings['llm_calls']} lần gọi LLM, {timings['prompt_tokens']} token đầu vào, "
+                f"{timings['completion_tokens']} token đầu ra"
+            )
+            st.table([{"Giai đoạn": stage, "ms": ms} for stage, ms in timings["stages"].items()])
+
 
 for message in st.session_state.messages:
     if message["role"] == "user":
@@ -60,11 +78,53 @@ for message in st.session_state.messages:
     else:
         with st.chat_message("assistant"):
             st.markdown(message["content"])
-            if message.get("reasoning"):
-                with st.expander("Hiển thị lập luận của agent"):
-                    for item in message["reasoning"]:
-                        st.write(item)
-            if message.get("tools"):
-                with st.expander("Hiển thị tương tác công cụ"):
-                    for item in message["tools"]:
-                        st.write(item)
+            render_details(message.get("reasoning"), message.get("tools"), message.get("timings"))
+
+if user_input:
+    st.session_state.messages.append({"role": "user", "content": user_input})
+    with st.chat_message("user"):
+        st.markdown(user_input)
+    with st.chat_message("assistant"):
+        status = st.status("Agent đang xử lý...", expanded=False)
+        placeholder = st.empty()
+        answer = ""
+        try:
+            with requests.post(
+                f"{API_URL}/chat/stream",
+                json={"session_id": st.session_state.session_id, "message": user_input, "include_timings": True},
+                stream=True,
+                # Connect timeout only; long multi-tool runs keep the stream open.
+                timeout=(10, None),
+            ) as response:
+                response.raise_for_status()
+                for event, data in iter_sse(response):
+                    if event == "tool_start":
+                        status.write(f"🔧 {data['tool']}: {data['input']}")
+                    elif event == "tool_end":
+                        status.write(data["observation"])
+                    elif event == "token":
+                        answer += data["text"]
+                        placeholder.markdown(answer + "▌")
+                    elif event == "final":
+                        answer = data.get("answer", answer)
+                        placeholder.markdown(answer)
+                        status.update(label="Hoàn tất", state="complete")
+                        reasoning = data.get("reasoning", [])
+                        tools = data.get("tool_interactions", [])
+                        timings = data.get("timings")
+                        render_details(reasoning, tools, timings)
+                        st.session_state.messages.append(
+                            {
+                                "role": "assistant",
+                                "content": answer,
+                                "reasoning": reasoning,
+                                "tools": tools,
+                                "timings": timings,
+                            }
+                        )
+                    elif event == "error":
+                        status.update(label="Lỗi", state="error")
+                        st.error(f"Agent gặp lỗi: {data.get('detail')}")
+        except requests.RequestException as exc:
+            status.update(label="Lỗi", state="error")
+            st.error(f"Không thể kết nối backend: {exc}")